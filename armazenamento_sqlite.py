@@ -0,0 +1,344 @@
+"""Armazenamento das coleções da biblioteca num banco SQLite.
+
+Cada coleção vira uma tabela com índices nos campos de busca, e cada
+alteração anotada pelas coleções (veja ``persistencia.Diario``) vira um
+único INSERT, UPDATE ou DELETE, sem regravar os demais registros.
+
+Também pode ser executado como script para migrar os arquivos JSON::
+
+    python armazenamento_sqlite.py --banco biblioteca.db
+"""
+
+import argparse
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from persistencia import (
+    TravaArquivo,
+    iterar_dados,
+    manter_ate_o_fim,
+    recarregar_colecao,
+    salvar_dados,
+)
+
+# Coleção -> colunas (campo no JSON, coluna na tabela, tipo) e índices
+TABELAS: Dict[str, Dict[str, Any]] = {
+    "usuarios": {
+        "colunas": (("nome", "nome", "TEXT"), ("cpf", "cpf", "TEXT")),
+        "indices": (("cpf",),),
+    },
+    "livros": {
+        "colunas": (
+            ("título", "titulo", "TEXT"),
+            ("autor", "autor", "TEXT"),
+            ("ano", "ano", "INTEGER"),
+            ("exemplares", "exemplares", "INTEGER"),
+        ),
+        "indices": (("titulo",),),
+    },
+    "emprestimos": {
+        "colunas": (
+            ("cpf_usuario", "cpf_usuario", "TEXT"),
+            ("titulo_livro", "titulo_livro", "TEXT"),
+            ("data_emprestimo", "data_emprestimo", "TEXT"),
+            ("data_vencimento", "data_vencimento", "TEXT"),
+        ),
+        "indices": (("cpf_usuario", "titulo_livro"),),
+    },
+    "estatisticas": {
+        "colunas": (
+            ("tipo", "tipo", "TEXT"),
+            ("chave", "chave", "TEXT"),
+            ("emprestimos", "emprestimos", "INTEGER"),
+            ("devolucoes", "devolucoes", "INTEGER"),
+        ),
+        "indices": (("tipo", "chave"),),
+    },
+}
+
+
+def nome_tabela(caminho_arquivo: str) -> str:
+    """Converte o nome do arquivo JSON da coleção no nome da tabela."""
+
+    return os.path.splitext(os.path.basename(caminho_arquivo))[0]
+
+
+class ArmazenamentoSqlite:
+    """Guarda todas as coleções em tabelas de um único banco SQLite."""
+
+    def __init__(self, caminho_banco: str) -> None:
+        # A conexão pode ser usada por outras threads, uma de cada vez
+        self.conexao = sqlite3.connect(caminho_banco, check_same_thread=False)
+        # Cada transação termina antes de outra thread (ou outro processo
+        # com a mesma trava) começar; a trava vale para o banco inteiro
+        self.trava = TravaArquivo(caminho_banco)
+        # O diário do próprio SQLite (WAL) deixa cada gravação curta
+        self.conexao.execute("PRAGMA journal_mode=WAL")
+        self.conexao.execute("PRAGMA synchronous=NORMAL")
+        self._criar_tabelas()
+
+    def _criar_tabelas(self) -> None:
+        """Cria as tabelas e os índices que ainda não existirem."""
+
+        with self.conexao:
+            for tabela, definicao in TABELAS.items():
+                colunas = ", ".join(
+                    f"{coluna} {tipo}" for _, coluna, tipo in definicao["colunas"]
+                )
+                self.conexao.execute(
+                    f"CREATE TABLE IF NOT EXISTS {tabela} "
+                    f"(id INTEGER PRIMARY KEY, {colunas})"
+                )
+                # Bancos criados por versões anteriores ganham as colunas novas
+                existentes = {
+                    linha[1]
+                    for linha in self.conexao.execute(f"PRAGMA table_info({tabela})")
+                }
+                for _, coluna, tipo in definicao["colunas"]:
+                    if coluna not in existentes:
+                        self.conexao.execute(
+                            f"ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}"
+                        )
+                for campos in definicao["indices"]:
+                    self.conexao.execute(
+                        f"CREATE INDEX IF NOT EXISTS {tabela}_{'_'.join(campos)} "
+                        f"ON {tabela} ({', '.join(campos)})"
+                    )
+
+    def carregar(self, caminho_arquivo: str) -> List[Dict[str, Any]]:
+        """Lê todos os registros da coleção, na ordem de inclusão."""
+
+        return list(self.iterar(caminho_arquivo))
+
+    def iterar(self, caminho_arquivo: str) -> Iterator[Dict[str, Any]]:
+        """Lê os registros da coleção um de cada vez, na ordem de inclusão."""
+
+        return _ler_tabela(self.conexao, nome_tabela(caminho_arquivo))
+
+    def salvar(self, dados: Iterable[Any], caminho_arquivo: str) -> None:
+        """Substitui todo o conteúdo da tabela pela coleção informada."""
+
+        tabela = nome_tabela(caminho_arquivo)
+        with self.trava, self.conexao:
+            self.conexao.execute(f"DELETE FROM {tabela}")
+            self.conexao.executemany(
+                _comando_inserir(tabela), (_valores(tabela, registro) for registro in dados)
+            )
+
+    def abrir_diario(
+        self, caminho_arquivo: str, campos_chave: Sequence[str]
+    ) -> "TabelaSqlite":
+        """Devolve o objeto que aplica as alterações da coleção na tabela."""
+
+        return TabelaSqlite(
+            self.conexao, nome_tabela(caminho_arquivo), campos_chave, self.trava
+        )
+
+    def travar(self, caminho_arquivo: str) -> TravaArquivo:
+        """Devolve a trava do banco (vale para todas as coleções)."""
+
+        return self.trava
+
+    def fechar(self) -> None:
+        """Fecha a conexão com o banco."""
+
+        self.conexao.close()
+
+
+class TabelaSqlite:
+    """Aplica cada alteração de uma coleção como um comando numa linha."""
+
+    def __init__(
+        self,
+        conexao: sqlite3.Connection,
+        tabela: str,
+        campos_chave: Sequence[str],
+        trava: TravaArquivo,
+    ) -> None:
+        self.conexao = conexao
+        self.trava = trava
+        self.marcar_sincronizado()
+        self.tabela = tabela
+        self.campos_chave = tuple(campos_chave)
+
+        # A chave é localizada pelas colunas correspondentes aos campos do JSON
+        colunas = {campo: coluna for campo, coluna, _ in TABELAS[tabela]["colunas"]}
+        filtro = " AND ".join(f"{colunas[campo]} = ?" for campo in self.campos_chave)
+        primeira_linha = f"SELECT id FROM {tabela} WHERE {filtro} ORDER BY id LIMIT 1"
+        atribuicoes = ", ".join(
+            f"{coluna} = ?" for _, coluna, _ in TABELAS[tabela]["colunas"]
+        )
+        self._inserir = _comando_inserir(tabela)
+        self._remover = f"DELETE FROM {tabela} WHERE id = ({primeira_linha})"
+        self._atualizar = f"UPDATE {tabela} SET {atribuicoes} WHERE id = ({primeira_linha})"
+
+    def anotar(self, operacao: str, registro: Dict[str, Any], colecao: Iterable[Any]) -> None:
+        """Grava uma alteração só na linha envolvida.
+
+        Dentro de ``adiar_gravacoes()``, as alterações do bloco (de todas as
+        tabelas do banco) entram numa única transação, confirmada no final.
+        """
+
+        # A transação do bloco é uma por conexão, com a trava já obtida
+        if manter_ate_o_fim(self.conexao, self._transacao):
+            self._executar(operacao, registro)
+            return
+        with self._transacao():
+            self._executar(operacao, registro)
+
+    @contextmanager
+    def _transacao(self) -> Iterator[None]:
+        """Trava o banco e confirma as alterações ao sair."""
+
+        with self.trava, self.conexao:
+            yield
+
+    def _executar(self, operacao: str, registro: Dict[str, Any]) -> None:
+        """Executa o comando de uma alteração, sem confirmar a transação."""
+
+        chave = tuple(registro[campo] for campo in self.campos_chave)
+        if operacao == "adicionar":
+            self.conexao.execute(self._inserir, _valores(self.tabela, registro))
+        elif operacao == "remover":
+            self.conexao.execute(self._remover, chave)
+        elif operacao == "atualizar":
+            self.conexao.execute(
+                self._atualizar, _valores(self.tabela, registro) + chave
+            )
+        else:
+            raise ValueError(f"Operação de diário desconhecida: {operacao}")
+
+    def compactar(self, colecao: Iterable[Any]) -> None:
+        """Nada a compactar: a tabela já reflete todas as alterações."""
+
+    def sincronizar(self, colecao: Any) -> bool:
+        """Relê a tabela se outro processo gravou no banco desde a última vez.
+
+        O SQLite só diz que o banco mudou (``data_version``), não o quê, então
+        a coleção é recarregada inteira. Diz se a coleção mudou.
+        """
+
+        with self.trava:
+            versao = self._versao_dados()
+            if versao == self._versao:
+                return False
+            recarregar_colecao(colecao, _ler_tabela(self.conexao, self.tabela))
+            self._versao = versao
+            return True
+
+    def marcar_sincronizado(self) -> None:
+        """Registra que a coleção já reflete o conteúdo atual do banco."""
+
+        self._versao = self._versao_dados()
+
+    def _versao_dados(self) -> int:
+        # Muda sempre que outra conexão grava no banco
+        return self.conexao.execute("PRAGMA data_version").fetchone()[0]
+
+
+def _ler_tabela(conexao: sqlite3.Connection, tabela: str) -> Iterator[Dict[str, Any]]:
+    """Lê as linhas da tabela como registros, na ordem de inclusão."""
+
+    colunas = TABELAS[tabela]["colunas"]
+    consulta = conexao.execute(
+        f"SELECT {', '.join(coluna for _, coluna, _ in colunas)} "
+        f"FROM {tabela} ORDER BY id"
+    )
+    campos = [campo for campo, _, _ in colunas]
+    return (dict(zip(campos, linha)) for linha in consulta)
+
+
+def _comando_inserir(tabela: str) -> str:
+    """Monta o INSERT de um registro da tabela."""
+
+    colunas = [coluna for _, coluna, _ in TABELAS[tabela]["colunas"]]
+    marcadores = ", ".join("?" for _ in colunas)
+    return f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({marcadores})"
+
+
+def _valores(tabela: str, registro: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Extrai os valores de um registro na ordem das colunas da tabela."""
+
+    return tuple(registro.get(campo) for campo, _, _ in TABELAS[tabela]["colunas"])
+
+
+def migrar_json_para_sqlite(
+    caminhos_arquivos: Sequence[str], caminho_banco: str
+) -> Dict[str, int]:
+    """Copia as coleções dos arquivos JSON para o banco e conta os registros.
+
+    Um arquivo corrompido levanta ``ValueError`` e interrompe a migração,
+    sem substituir a tabela dele por uma vazia.
+    """
+
+    armazenamento = ArmazenamentoSqlite(caminho_banco)
+    try:
+        contagem = {}
+        for caminho_arquivo in caminhos_arquivos:
+            # O JSON e o banco ficam travados da leitura até a gravação
+            with TravaArquivo(caminho_arquivo), armazenamento.travar(caminho_arquivo):
+                # iterar_dados já reaplica o diário, se houver
+                dados = list(iterar_dados(caminho_arquivo))
+                armazenamento.salvar(dados, caminho_arquivo)
+            contagem[caminho_arquivo] = len(dados)
+        return contagem
+    finally:
+        armazenamento.fechar()
+
+
+def exportar_sqlite_para_json(
+    caminho_banco: str, caminhos_arquivos: Sequence[str]
+) -> Dict[str, int]:
+    """Grava o conteúdo do banco de volta nos arquivos JSON."""
+
+    armazenamento = ArmazenamentoSqlite(caminho_banco)
+    try:
+        contagem = {}
+        for caminho_arquivo in caminhos_arquivos:
+            with TravaArquivo(caminho_arquivo), armazenamento.travar(caminho_arquivo):
+                dados = armazenamento.carregar(caminho_arquivo)
+                salvar_dados(dados, caminho_arquivo)
+            contagem[caminho_arquivo] = len(dados)
+        return contagem
+    finally:
+        armazenamento.fechar()
+
+
+def main() -> None:
+    """Migra os arquivos JSON para o banco SQLite (ou o contrário)."""
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--banco", default="biblioteca.db", help="arquivo do banco")
+    parser.add_argument(
+        "--exportar",
+        action="store_true",
+        help="copia do banco para os arquivos JSON em vez do contrário",
+    )
+    parser.add_argument(
+        "arquivos",
+        nargs="*",
+        default=[
+            "usuarios.json",
+            "livros.json",
+            "emprestimos.json",
+            "estatisticas.json",
+        ],
+        help="arquivos JSON das coleções",
+    )
+    argumentos = parser.parse_args()
+
+    if argumentos.exportar:
+        contagem = exportar_sqlite_para_json(argumentos.banco, argumentos.arquivos)
+    else:
+        try:
+            contagem = migrar_json_para_sqlite(argumentos.arquivos, argumentos.banco)
+        except ValueError as erro:
+            parser.exit(1, f" Arquivo corrompido ({erro}); migração interrompida.\n")
+    for caminho_arquivo, quantidade in contagem.items():
+        print(f" {caminho_arquivo}: {quantidade} registros copiados.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Medições de desempenho do sistema de biblioteca (rodar da raiz do projeto)."""
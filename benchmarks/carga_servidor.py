@@ -0,0 +1,200 @@
+"""Teste de carga do servidor HTTP: vários clientes simultâneos.
+
+Primeiro todos os clientes tentam pegar, ao mesmo tempo, um livro com
+poucos exemplares (e o script confere que não foram emprestados mais
+exemplares do que existiam); depois cada cliente faz uma sequência de
+empréstimos, devoluções e buscas, medindo a latência de cada requisição.
+
+Sem ``--porta``, sobe um servidor próprio numa pasta temporária, no mesmo
+processo; com ``--porta``, o servidor informado deve começar sem dados.
+Uso (da raiz do projeto)::
+
+    python -m benchmarks.carga_servidor --clientes 50 --requisicoes 200
+    python -m benchmarks.carga_servidor --porta 8080   # servidor já rodando
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.medicao import percentil
+from persistencia import ArmazenamentoJson
+from servicos import Biblioteca
+from servidor import ServidorBiblioteca
+
+LIVRO_DISPUTADO = "Livro Disputado"
+LIVRO_COMUM = "Livro Comum"
+
+
+class ClienteHttp:
+    """Cliente HTTP/1.1 mínimo que reaproveita a mesma conexão."""
+
+    def __init__(self, host: str, porta: int) -> None:
+        self.host = host
+        self.porta = porta
+        self._leitor: Optional[asyncio.StreamReader] = None
+        self._escritor: Optional[asyncio.StreamWriter] = None
+
+    async def requisitar(
+        self, metodo: str, caminho: str, dados: Optional[Dict[str, Any]] = None
+    ) -> Tuple[int, Any]:
+        """Envia uma requisição e devolve o status e o JSON da resposta."""
+
+        if self._escritor is None:
+            self._leitor, self._escritor = await asyncio.open_connection(
+                self.host, self.porta
+            )
+        corpo = json.dumps(dados).encode("utf-8") if dados is not None else b""
+        self._escritor.write(
+            f"{metodo} {caminho} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(corpo)}\r\n\r\n"
+            .encode("latin-1")
+            + corpo
+        )
+        await self._escritor.drain()
+
+        status = int((await self._leitor.readline()).split()[1])
+        tamanho = 0
+        while (linha := await self._leitor.readline()) not in (b"\r\n", b""):
+            nome, _, valor = linha.decode("latin-1").partition(":")
+            if nome.lower() == "content-length":
+                tamanho = int(valor)
+        return status, json.loads(await self._leitor.readexactly(tamanho))
+
+    async def fechar(self) -> None:
+        """Encerra a conexão."""
+
+        if self._escritor is not None:
+            self._escritor.close()
+            await self._escritor.wait_closed()
+
+
+async def preparar(cliente: ClienteHttp, clientes: int, exemplares: int) -> List[str]:
+    """Cadastra os usuários e os dois livros do teste; devolve os CPFs."""
+
+    cpfs = [f"{numero:011d}" for numero in range(1, clientes + 1)]
+    for cpf in cpfs:
+        await cliente.requisitar("POST", "/usuarios", {"nome": "Leitor Teste", "cpf": cpf})
+    for titulo, quantidade in ((LIVRO_DISPUTADO, exemplares), (LIVRO_COMUM, clientes)):
+        await cliente.requisitar(
+            "POST",
+            "/livros",
+            {"titulo": titulo, "autor": "Autor", "ano": 2020, "exemplares": quantidade},
+        )
+    return cpfs
+
+
+async def disputar(clientes: List[ClienteHttp], cpfs: List[str]) -> int:
+    """Todos pedem o livro disputado ao mesmo tempo; devolve quantos levaram."""
+
+    respostas = await asyncio.gather(
+        *(
+            cliente.requisitar("POST", "/emprestimos", {"cpf": cpf, "titulo": LIVRO_DISPUTADO})
+            for cliente, cpf in zip(clientes, cpfs)
+        )
+    )
+    return sum(1 for _, corpo in respostas if corpo["sucesso"])
+
+
+async def circular(cliente: ClienteHttp, cpf: str, requisicoes: int) -> List[float]:
+    """Alterna empréstimo, busca e devolução; devolve as latências (s)."""
+
+    latencias = []
+    operacoes = (
+        ("POST", "/emprestimos", {"cpf": cpf, "titulo": LIVRO_COMUM}),
+        ("GET", "/livros/busca?titulo=comum", None),
+        ("POST", "/devolucoes", {"cpf": cpf, "titulo": LIVRO_COMUM}),
+    )
+    for numero in range(requisicoes):
+        metodo, caminho, dados = operacoes[numero % len(operacoes)]
+        inicio = time.perf_counter()
+        await cliente.requisitar(metodo, caminho, dados)
+        latencias.append(time.perf_counter() - inicio)
+    return latencias
+
+
+async def executar(opcoes: argparse.Namespace) -> None:
+    """Roda as duas fases do teste e mostra os números."""
+
+    clientes = [ClienteHttp(opcoes.host, opcoes.porta) for _ in range(opcoes.clientes)]
+    try:
+        cpfs = await preparar(clientes[0], opcoes.clientes, opcoes.exemplares)
+
+        emprestados = await disputar(clientes, cpfs)
+        print(
+            f" Disputa: {opcoes.clientes} pedidos, {opcoes.exemplares} exemplares, "
+            f"{emprestados} empréstimos."
+        )
+        if emprestados != min(opcoes.exemplares, opcoes.clientes):
+            raise SystemExit(" ERRO: o estoque do livro disputado ficou inconsistente.")
+
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(
+            *(
+                circular(cliente, cpf, opcoes.requisicoes)
+                for cliente, cpf in zip(clientes, cpfs)
+            )
+        )
+        duracao = time.perf_counter() - inicio
+    finally:
+        for cliente in clientes:
+            await cliente.fechar()
+
+    latencias = sorted(latencia for lista in resultados for latencia in lista)
+    print(
+        f" Circulação: {len(latencias)} requisições em {duracao:.2f} s "
+        f"({len(latencias) / duracao:,.0f} por segundo)."
+    )
+    print(
+        f" Latência (ms): média {statistics.fmean(latencias) * 1000:.2f}, "
+        f"p50 {percentil(latencias, 0.50) * 1000:.2f}, "
+        f"p95 {percentil(latencias, 0.95) * 1000:.2f}, "
+        f"p99 {percentil(latencias, 0.99) * 1000:.2f}."
+    )
+
+
+async def executar_com_servidor_local(opcoes: argparse.Namespace) -> None:
+    """Sobe um servidor numa pasta temporária e roda o teste contra ele."""
+
+    pasta_original = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta)
+        biblioteca = Biblioteca(ArmazenamentoJson())
+        biblioteca.carregamento().carregar()
+        servidor = ServidorBiblioteca(biblioteca)
+        conexoes = await servidor.iniciar(opcoes.host, 0)
+        opcoes.porta = conexoes.sockets[0].getsockname()[1]
+        try:
+            await executar(opcoes)
+        finally:
+            conexoes.close()
+            await conexoes.wait_closed()
+            servidor.fechar()
+            biblioteca.fechar()
+            os.chdir(pasta_original)
+
+
+def main() -> None:
+    """Mede a vazão e a latência do servidor com clientes simultâneos."""
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, help="servidor já em execução")
+    parser.add_argument("--clientes", type=int, default=50)
+    parser.add_argument("--requisicoes", type=int, default=200)
+    parser.add_argument("--exemplares", type=int, default=5)
+    opcoes = parser.parse_args()
+
+    if opcoes.porta is None:
+        asyncio.run(executar_com_servidor_local(opcoes))
+    else:
+        asyncio.run(executar(opcoes))
+
+
+if __name__ == "__main__":
+    main()
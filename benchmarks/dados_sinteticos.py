@@ -0,0 +1,173 @@
+"""Gerador reproduzível de usuários, livros e empréstimos para os benchmarks.
+
+Os dados imitam os de uma biblioteca de verdade: nomes e sobrenomes
+brasileiros (com acentos), CPFs com dígitos verificadores válidos, títulos
+em português e uma popularidade bem desigual entre os livros (distribuição
+de Zipf: poucos títulos concentram a maior parte dos empréstimos). A mesma
+semente gera sempre os mesmos dados, no formato dos arquivos JSON.
+"""
+
+import itertools
+import random
+from bisect import bisect_right
+from typing import Any, Dict, List, Sequence
+
+from registros import PRAZO_EMPRESTIMO_DIAS, momento_para_texto, texto_para_momento
+
+NOMES = (
+    "Ana", "Maria", "João", "José", "Francisco", "Antônio", "Carlos", "Paulo",
+    "Pedro", "Lucas", "Luiz", "Marcos", "Gabriel", "Rafael", "Daniel", "Marcelo",
+    "Bruno", "Eduardo", "Felipe", "Raimundo", "Sebastião", "Thiago", "Gustavo",
+    "Juliana", "Mariana", "Fernanda", "Patrícia", "Aline", "Camila", "Letícia",
+    "Beatriz", "Larissa", "Luíza", "Júlia", "Conceição", "Vitória", "Clarice",
+)
+SOBRENOMES = (
+    "Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves",
+    "Pereira", "Lima", "Gomes", "Costa", "Ribeiro", "Martins", "Carvalho",
+    "Almeida", "Lopes", "Soares", "Fernandes", "Vieira", "Barbosa", "Rocha",
+    "Dias", "Nascimento", "Andrade", "Moreira", "Nunes", "Marques", "Machado",
+    "Mendes", "Freitas", "Cardoso", "Ramos", "Gonçalves", "Araújo", "Magalhães",
+)
+# Título: núcleo + ligação + complemento (e um número, se as combinações acabam)
+NUCLEOS_TITULO = (
+    "O Segredo", "A Casa", "As Memórias", "O Caminho", "A Noite", "O Livro",
+    "A Sombra", "O Jardim", "A Cidade", "O Tempo", "A Viagem", "O Silêncio",
+    "A Herança", "O Retrato", "A Canção", "O Último Verão", "A Promessa",
+    "O Guardião", "A Travessia", "Os Filhos",
+)
+LIGACOES = ("", "Além", "Perto", "Longe", "Dentro", "Antes", "Depois")
+COMPLEMENTOS = (
+    "Do Mar", "Do Sertão", "Do Vento", "Do Rio", "Do Coração", "Do Inverno",
+    "Do Sol", "Da Estrela", "Do Deserto", "Do Farol", "Do Pântano", "Da Serra",
+    "Do Horizonte", "Do Açude", "Do Quilombo", "Do Cerrado", "Da Chuva",
+    "Do Navegante", "Do Imperador", "Do Cais", "Do Luar",
+)
+# Expoente da distribuição de Zipf usada na popularidade dos títulos
+EXPOENTE_POPULARIDADE = 1.1
+
+
+def digitos_verificadores(base: str) -> str:
+    """Calcula os dois dígitos verificadores de um CPF de nove dígitos."""
+
+    digitos = [int(digito) for digito in base]
+    for _ in range(2):
+        pesos = range(len(digitos) + 1, 1, -1)
+        soma = sum(digito * peso for digito, peso in zip(digitos, pesos))
+        resto = soma * 10 % 11
+        digitos.append(0 if resto == 10 else resto)
+    return "".join(str(digito) for digito in digitos[-2:])
+
+
+def cpf_valido(cpf: str) -> bool:
+    """Confere o formato e os dígitos verificadores de um CPF."""
+
+    return (
+        len(cpf) == 11
+        and cpf.isdigit()
+        and len(set(cpf)) > 1
+        and digitos_verificadores(cpf[:9]) == cpf[9:]
+    )
+
+
+def gerar_usuarios(quantidade: int, semente: int = 42) -> List[Dict[str, str]]:
+    """Gera usuários com nomes brasileiros e CPFs válidos e distintos."""
+
+    aleatorio = random.Random(semente)
+    # Bases distintas garantem CPFs distintos; 000000000 e afins são inválidos
+    bases = aleatorio.sample(range(1, 10**9), quantidade)
+    usuarios = []
+    for numero in bases:
+        base = f"{numero:09d}"
+        if len(set(base)) == 1:
+            base = f"{numero + 1:09d}"
+        sobrenomes = aleatorio.sample(SOBRENOMES, aleatorio.randint(1, 2))
+        nome = " ".join([aleatorio.choice(NOMES), *sobrenomes])
+        usuarios.append({"nome": nome, "cpf": base + digitos_verificadores(base)})
+    return usuarios
+
+
+def gerar_livros(quantidade: int, semente: int = 42) -> List[Dict[str, Any]]:
+    """Gera livros de títulos distintos, autores brasileiros e 1 a 5 exemplares."""
+
+    aleatorio = random.Random(semente)
+    combinacoes = [
+        " ".join(parte for parte in partes if parte)
+        for partes in itertools.product(NUCLEOS_TITULO, LIGACOES, COMPLEMENTOS)
+    ]
+    aleatorio.shuffle(combinacoes)
+    # Cerca de vinte livros por autor
+    autores = [
+        f"{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)}"
+        for _ in range(max(1, quantidade // 20))
+    ]
+    livros = []
+    for numero in range(quantidade):
+        rodada, posicao = divmod(numero, len(combinacoes))
+        titulo = combinacoes[posicao]
+        if rodada:
+            titulo = f"{titulo} {rodada + 1}"
+        livros.append(
+            {
+                "título": titulo,
+                "autor": aleatorio.choice(autores),
+                "ano": aleatorio.randint(1850, 2025),
+                "exemplares": aleatorio.randint(1, 5),
+            }
+        )
+    return livros
+
+
+class Popularidade:
+    """Sorteia títulos com popularidade de Zipf (o 1º é o mais procurado).
+
+    A ordem de popularidade é embaralhada pela semente, para que os
+    títulos mais procurados não sejam sempre os primeiros cadastrados.
+    """
+
+    def __init__(
+        self,
+        titulos: Sequence[str],
+        semente: int = 42,
+        expoente: float = EXPOENTE_POPULARIDADE,
+    ) -> None:
+        self._aleatorio = random.Random(semente)
+        self.titulos = list(titulos)
+        self._aleatorio.shuffle(self.titulos)
+        self._acumulados = list(
+            itertools.accumulate(
+                1 / posicao**expoente for posicao in range(1, len(self.titulos) + 1)
+            )
+        )
+
+    def sortear(self) -> str:
+        """Devolve um título, respeitando a popularidade."""
+
+        alvo = self._aleatorio.random() * self._acumulados[-1]
+        return self.titulos[bisect_right(self._acumulados, alvo)]
+
+
+def gerar_emprestimos(
+    usuarios: Sequence[Dict[str, str]],
+    livros: Sequence[Dict[str, Any]],
+    quantidade: int,
+    semente: int = 42,
+    inicio: str = "2025-01-01",
+) -> List[Dict[str, str]]:
+    """Gera empréstimos nos 90 dias seguintes ao início, com títulos populares."""
+
+    aleatorio = random.Random(semente)
+    popularidade = Popularidade([livro["título"] for livro in livros], semente)
+    momento_inicial = texto_para_momento(inicio)
+    prazo = PRAZO_EMPRESTIMO_DIAS * 24 * 60 * 60
+    emprestimos = []
+    for _ in range(quantidade):
+        momento = momento_inicial + aleatorio.randrange(90 * 24 * 60 * 60)
+        emprestimos.append(
+            {
+                "cpf_usuario": aleatorio.choice(usuarios)["cpf"],
+                "titulo_livro": popularidade.sortear(),
+                "data_emprestimo": momento_para_texto(momento),
+                "data_vencimento": momento_para_texto(momento + prazo),
+            }
+        )
+    return emprestimos
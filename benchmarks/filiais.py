@@ -0,0 +1,182 @@
+"""Escalabilidade da busca federada com 1 a N processos de busca.
+
+Monta ``--filiais`` filiais com ``--livros`` livros sintéticos cada (veja
+``benchmarks.dados_sinteticos``), cada uma na sua pasta, e mede a mesma
+sequência de buscas por título e por autor no ``CatalogoFederado`` com
+cada quantidade de processos. A primeira busca (que carrega os acervos)
+fica de fora das latências e é informada à parte. O ganho é a vazão em
+relação à rodada com um processo.
+
+Uso (da raiz do projeto)::
+
+    python -m benchmarks.filiais --filiais 8 --livros 50000 --processos 1 2 4 8
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from benchmarks.dados_sinteticos import COMPLEMENTOS, SOBRENOMES, gerar_livros
+from benchmarks.medicao import resumir_latencias, salvar_resultados
+from filiais import CatalogoFederado, Filial
+from normalizacao import normalizar
+from persistencia import salvar_dados
+from servicos import ARQUIVO_LIVROS
+
+PASTA_RESULTADOS = os.path.join(os.path.dirname(__file__), "resultados")
+
+# (campo, termo) de cada busca
+Buscas = List[Tuple[str, str]]
+
+
+def montar_filiais(
+    pasta: str, quantidade: int, livros: int, semente: int = 42
+) -> List[Filial]:
+    """Grava o acervo sintético de cada filial numa subpasta."""
+
+    filiais = []
+    for numero in range(quantidade):
+        pasta_filial = os.path.join(pasta, f"filial{numero + 1}")
+        os.makedirs(pasta_filial)
+        salvar_dados(
+            gerar_livros(livros, semente + numero),
+            os.path.join(pasta_filial, ARQUIVO_LIVROS),
+        )
+        filiais.append(Filial(f"Filial {numero + 1}", pasta_filial))
+    return filiais
+
+
+def sortear_buscas(quantidade: int, semente: int = 42) -> Buscas:
+    """Sorteia buscas por uma palavra do título ou por um sobrenome de autor."""
+
+    aleatorio = random.Random(semente)
+    buscas = []
+    for _ in range(quantidade):
+        if aleatorio.random() < 0.5:
+            palavra = aleatorio.choice(COMPLEMENTOS).split()[-1]
+            buscas.append(("titulo", normalizar(palavra)))
+        else:
+            buscas.append(("autor", normalizar(aleatorio.choice(SOBRENOMES))))
+    return buscas
+
+
+def medir_processos(
+    filiais: Sequence[Filial], processos: int, buscas: Buscas
+) -> Dict[str, Any]:
+    """Mede as buscas com a quantidade de processos informada."""
+
+    with CatalogoFederado(filiais, processos) as catalogo:
+        buscar = {
+            "titulo": catalogo.buscar_por_titulo,
+            "autor": catalogo.buscar_por_autor,
+        }
+        # A primeira busca carrega os acervos em cada processo
+        inicio = time.perf_counter()
+        buscar["titulo"]("a")
+        carga = time.perf_counter() - inicio
+
+        latencias = []
+        encontrados = 0
+        relogio = time.perf_counter
+        inicio = relogio()
+        for campo, termo in buscas:
+            antes = relogio()
+            encontrados += len(buscar[campo](termo))
+            latencias.append(relogio() - antes)
+        duracao = relogio() - inicio
+
+    return {
+        "processos": processos,
+        "carga_s": carga,
+        "resultados_por_busca": encontrados / len(buscas),
+        **resumir_latencias(latencias, duracao),
+    }
+
+
+def executar(
+    quantidade_filiais: int,
+    livros: int,
+    processos: Sequence[int],
+    consultas: int = 200,
+    semente: int = 42,
+    mostrar: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> List[Dict[str, Any]]:
+    """Roda as mesmas buscas com cada quantidade de processos."""
+
+    buscas = sortear_buscas(consultas, semente)
+    resultados: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as pasta:
+        filiais = montar_filiais(pasta, quantidade_filiais, livros, semente)
+        for quantidade in processos:
+            resultado = medir_processos(filiais, quantidade, buscas)
+            resultado["operacao"] = "busca_federada"
+            resultado["tamanho"] = quantidade_filiais * livros
+            # O ganho é sempre em relação à primeira rodada (normalmente 1 processo)
+            base = resultados[0] if resultados else resultado
+            resultado["ganho"] = resultado["vazao_por_s"] / base["vazao_por_s"]
+            resultados.append(resultado)
+            if mostrar is not None:
+                mostrar(resultado)
+    return resultados
+
+
+def mostrar_resultado(resultado: Dict[str, Any]) -> None:
+    """Mostra uma linha da tabela de resultados."""
+
+    print(
+        f"{resultado['processos']:>9} {resultado['carga_s']:>9.2f} "
+        f"{resultado['p50_ms']:>9.2f} {resultado['p95_ms']:>9.2f} "
+        f"{resultado['p99_ms']:>9.2f} {resultado['vazao_por_s']:>10,.1f} "
+        f"{resultado['ganho']:>7.2f}x",
+        flush=True,
+    )
+
+
+def main(argumentos: Optional[List[str]] = None) -> None:
+    """Mede a busca federada nas filiais com 1 a N processos de busca."""
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--filiais", type=int, default=8)
+    parser.add_argument("--livros", type=int, default=50_000, help="por filial")
+    parser.add_argument(
+        "--processos",
+        type=int,
+        nargs="+",
+        default=sorted({1, 2, 4, os.cpu_count() or 1}),
+    )
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--pasta", default=PASTA_RESULTADOS, help="onde gravar")
+    opcoes = parser.parse_args(argumentos)
+
+    print(
+        f"{'processos':>9} {'carga (s)':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} "
+        f"{'p99 (ms)':>9} {'buscas/s':>10} {'ganho':>8}"
+    )
+    resultados = executar(
+        opcoes.filiais,
+        opcoes.livros,
+        opcoes.processos,
+        opcoes.consultas,
+        opcoes.semente,
+        mostrar_resultado,
+    )
+    caminho = salvar_resultados(
+        resultados,
+        opcoes.pasta,
+        "filiais",
+        {
+            "filiais": opcoes.filiais,
+            "livros": opcoes.livros,
+            "consultas": opcoes.consultas,
+            "semente": opcoes.semente,
+        },
+    )
+    print(f"\n Resultados gravados em {caminho}")
+
+
+if __name__ == "__main__":
+    main()
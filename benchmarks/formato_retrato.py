@@ -0,0 +1,67 @@
+"""Compara o retrato JSON com o retrato binário: tempo de carga e tamanho.
+
+Uso (da raiz do projeto)::
+
+    python -m benchmarks.formato_retrato --quantidade 200000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from typing import Callable
+
+from benchmarks.dados_sinteticos import gerar_emprestimos, gerar_livros, gerar_usuarios
+from persistencia import carregar_dados, salvar_dados
+from snapshot_binario import carregar_snapshot, salvar_snapshot
+
+
+def melhor_tempo(funcao: Callable[[], object], repeticoes: int) -> float:
+    """Executa a função algumas vezes e devolve o menor tempo, em segundos."""
+
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def main() -> None:
+    """Mede carga e tamanho dos dois formatos para livros e empréstimos."""
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--quantidade", type=int, default=200_000)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    opcoes = parser.parse_args()
+
+    # Os mesmos dados sintéticos dos outros benchmarks (um usuário a cada dez)
+    livros = gerar_livros(opcoes.quantidade)
+    usuarios = gerar_usuarios(max(1, opcoes.quantidade // 10))
+    colecoes = {
+        "livros": livros,
+        "emprestimos": gerar_emprestimos(usuarios, livros, opcoes.quantidade),
+    }
+
+    print(f"{'coleção':<12} {'formato':<8} {'tamanho (MB)':>13} {'carga (s)':>10}")
+    with tempfile.TemporaryDirectory() as pasta:
+        for nome, dados in colecoes.items():
+            caminho_json = os.path.join(pasta, f"{nome}.json")
+            caminho_binario = caminho_json + ".bin"
+            salvar_dados(dados, caminho_json)
+            salvar_snapshot(dados, caminho_binario)
+
+            # Confere que os dois formatos devolvem exatamente os mesmos dados
+            assert carregar_snapshot(caminho_binario) == dados
+
+            for formato, caminho, carregar in (
+                ("json", caminho_json, carregar_dados),
+                ("binario", caminho_binario, carregar_snapshot),
+            ):
+                tempo = melhor_tempo(lambda: carregar(caminho), opcoes.repeticoes)
+                tamanho = os.path.getsize(caminho) / 2**20
+                print(f"{nome:<12} {formato:<8} {tamanho:>13.2f} {tempo:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Estatísticas e registro dos resultados usados pelos benchmarks."""
+
+import json
+import os
+import platform
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+
+def percentil(valores: List[float], fracao: float) -> float:
+    """Devolve o percentil de uma lista já ordenada."""
+
+    return valores[min(len(valores) - 1, int(fracao * len(valores)))]
+
+
+def resumir_latencias(latencias: Sequence[float], duracao: float) -> Dict[str, float]:
+    """Resume latências (s) de uma operação: média, percentis e vazão."""
+
+    ordenadas = sorted(latencias)
+    return {
+        "quantidade": len(ordenadas),
+        "media_ms": sum(ordenadas) / len(ordenadas) * 1000,
+        "p50_ms": percentil(ordenadas, 0.50) * 1000,
+        "p95_ms": percentil(ordenadas, 0.95) * 1000,
+        "p99_ms": percentil(ordenadas, 0.99) * 1000,
+        "vazao_por_s": len(ordenadas) / duracao if duracao else 0.0,
+    }
+
+
+def medir_pico_memoria(funcao: Callable[[], Any]) -> float:
+    """Executa a função com o ``tracemalloc`` ligado e devolve o pico (MB).
+
+    O pico conta só o que foi alocado durante a chamada. O ``tracemalloc``
+    deixa tudo bem mais lento, então os tempos são medidos em outra rodada.
+    """
+
+    ja_ligado = tracemalloc.is_tracing()
+    if not ja_ligado:
+        tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        antes, _ = tracemalloc.get_traced_memory()
+        funcao()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        if not ja_ligado:
+            tracemalloc.stop()
+    return max(0, pico - antes) / 2**20
+
+
+def salvar_resultados(
+    resultados: List[Dict[str, Any]],
+    pasta: str,
+    prefixo: str,
+    parametros: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Grava os resultados num JSON com data no nome e devolve o caminho."""
+
+    os.makedirs(pasta, exist_ok=True)
+    caminho = os.path.join(pasta, f"{prefixo}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(
+            {
+                "data": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "python": platform.python_version(),
+                "plataforma": platform.platform(),
+                "parametros": parametros or {},
+                "resultados": resultados,
+            },
+            arquivo,
+            ensure_ascii=False,
+            indent=2,
+        )
+    return caminho
+
+
+def carregar_resultados(caminho: str) -> List[Dict[str, Any]]:
+    """Lê os resultados gravados por ``salvar_resultados``."""
+
+    with open(caminho, encoding="utf-8") as arquivo:
+        return json.load(arquivo)["resultados"]
+
+
+def comparar_resultados(
+    atuais: List[Dict[str, Any]],
+    anteriores: List[Dict[str, Any]],
+    chaves: Sequence[str] = ("tamanho", "operacao"),
+    metricas: Sequence[str] = ("p50_ms", "p99_ms", "vazao_por_s", "memoria_pico_mb"),
+) -> List[str]:
+    """Descreve a variação de cada métrica em relação a uma rodada anterior."""
+
+    por_chave = {tuple(item[chave] for chave in chaves): item for item in anteriores}
+    linhas = []
+    for item in atuais:
+        anterior = por_chave.get(tuple(item[chave] for chave in chaves))
+        if anterior is None:
+            continue
+        variacoes = []
+        for metrica in metricas:
+            antes, agora = anterior.get(metrica), item.get(metrica)
+            if antes and agora is not None:
+                variacoes.append(f"{metrica} {(agora - antes) / antes * 100:+.1f}%")
+        rotulo = " ".join(str(item[chave]) for chave in chaves)
+        linhas.append(f"{rotulo}: {', '.join(variacoes)}")
+    return linhas
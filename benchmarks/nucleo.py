@@ -0,0 +1,323 @@
+"""Benchmarks das operações centrais da biblioteca, com dados sintéticos.
+
+Para cada tamanho N o cenário tem N usuários, N livros e N/2 empréstimos
+ativos (veja ``benchmarks.dados_sinteticos``). Cada operação é medida
+chamada a chamada: latência média e percentis (p50, p95, p99), vazão e
+pico de memória alocada (numa segunda rodada, com ``tracemalloc``). Os
+resultados são gravados em JSON para comparar uma rodada com a outra.
+
+Uso (da raiz do projeto)::
+
+    python -m benchmarks.nucleo --tamanhos 10000 100000 1000000
+    python -m benchmarks.nucleo --comparar benchmarks/resultados/nucleo-....json
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from benchmarks.dados_sinteticos import (
+    Popularidade,
+    gerar_emprestimos,
+    gerar_livros,
+    gerar_usuarios,
+)
+from benchmarks.medicao import (
+    carregar_resultados,
+    comparar_resultados,
+    medir_pico_memoria,
+    resumir_latencias,
+    salvar_resultados,
+)
+from emprestimos import RegistroEmprestimos, realizar_devolucao, realizar_emprestimo
+from livros import (
+    Acervo,
+    buscar_livros_por_autor,
+    buscar_livros_por_titulo,
+    sugerir_titulos,
+)
+from persistencia import carregar_dados, salvar_dados
+from usuarios import CadastroUsuarios
+
+PASTA_RESULTADOS = os.path.join(os.path.dirname(__file__), "resultados")
+# Chamadas repetidas na rodada de memória (a de tempo usa --quantidade)
+CHAMADAS_MEMORIA = 100
+# Operações que tratam a coleção inteira de uma vez são repetidas poucas vezes
+# e também informam a vazão em registros por segundo
+REPETICOES_COLECAO = 3
+OPERACOES_COLECAO = ("indexar", "salvar_dados", "carregar_dados")
+
+Chamadas = List[Callable[[], Any]]
+
+
+class Cenario:
+    """Dados sintéticos de um tamanho, já carregados nas coleções indexadas."""
+
+    def __init__(self, tamanho: int, semente: int, pasta: str) -> None:
+        self.tamanho = tamanho
+        self.pasta = pasta
+        self.aleatorio = random.Random(semente)
+        self.dados_usuarios = gerar_usuarios(tamanho, semente)
+        self.dados_livros = gerar_livros(tamanho, semente)
+        dados_emprestimos = gerar_emprestimos(
+            self.dados_usuarios, self.dados_livros, tamanho // 2, semente
+        )
+        self.popularidade = Popularidade(
+            [livro["título"] for livro in self.dados_livros], semente + 1
+        )
+        self.usuarios = CadastroUsuarios(
+            map(CadastroUsuarios.TIPO_REGISTRO.de_dict, self.dados_usuarios)
+        )
+        self.livros = montar_acervo(self.dados_livros)
+        self.emprestimos = RegistroEmprestimos(
+            map(RegistroEmprestimos.TIPO_REGISTRO.de_dict, dados_emprestimos)
+        )
+        self.caminho_livros = os.path.join(pasta, "livros.json")
+        salvar_dados(self.livros, self.caminho_livros)
+
+    def cpf_qualquer(self) -> str:
+        """O CPF de um usuário sorteado."""
+
+        return self.aleatorio.choice(self.dados_usuarios)["cpf"]
+
+    def trecho_de_titulo(self) -> str:
+        """Um pedaço (4 a 10 letras) de um título popular, como o operador digita."""
+
+        titulo = self.popularidade.sortear()
+        tamanho = self.aleatorio.randint(4, min(10, len(titulo)))
+        inicio = self.aleatorio.randrange(len(titulo) - tamanho + 1)
+        return titulo[inicio : inicio + tamanho].lower()
+
+    def titulo_com_erro(self) -> str:
+        """Um título popular com uma letra a menos."""
+
+        titulo = self.popularidade.sortear()
+        posicao = self.aleatorio.randrange(len(titulo))
+        return titulo[:posicao] + titulo[posicao + 1 :]
+
+
+def montar_acervo(dados_livros: Sequence[Dict[str, Any]]) -> Acervo:
+    """Converte os livros em registros e monta o acervo com todos os índices."""
+
+    return Acervo(map(Acervo.TIPO_REGISTRO.de_dict, dados_livros))
+
+
+def _emprestar(cenario: Cenario, quantidade: int) -> Chamadas:
+    return [
+        partial(
+            realizar_emprestimo,
+            cenario.usuarios,
+            cenario.livros,
+            cenario.emprestimos,
+            cenario.cpf_qualquer(),
+            cenario.popularidade.sortear(),
+        )
+        for _ in range(quantidade)
+    ]
+
+
+def _devolver(cenario: Cenario, quantidade: int) -> Chamadas:
+    ativos = list(cenario.emprestimos)
+    escolhidos = cenario.aleatorio.sample(ativos, min(quantidade, len(ativos)))
+    return [
+        partial(
+            realizar_devolucao,
+            cenario.livros,
+            cenario.emprestimos,
+            emprestimo["cpf_usuario"],
+            emprestimo["titulo_livro"],
+        )
+        for emprestimo in escolhidos
+    ]
+
+
+def _buscar_titulo(cenario: Cenario, quantidade: int) -> Chamadas:
+    return [
+        partial(buscar_livros_por_titulo, cenario.livros, cenario.trecho_de_titulo())
+        for _ in range(quantidade)
+    ]
+
+
+def _buscar_autor(cenario: Cenario, quantidade: int) -> Chamadas:
+    return [
+        partial(
+            buscar_livros_por_autor,
+            cenario.livros,
+            cenario.aleatorio.choice(cenario.dados_livros)["autor"].split()[-1],
+        )
+        for _ in range(quantidade)
+    ]
+
+
+def _sugerir_titulos(cenario: Cenario, quantidade: int) -> Chamadas:
+    return [
+        partial(sugerir_titulos, cenario.livros, cenario.titulo_com_erro())
+        for _ in range(quantidade)
+    ]
+
+
+def _salvar_dados(cenario: Cenario, quantidade: int) -> Chamadas:
+    return [
+        partial(salvar_dados, cenario.livros, cenario.caminho_livros)
+        for _ in range(min(quantidade, REPETICOES_COLECAO))
+    ]
+
+
+def _carregar_dados(cenario: Cenario, quantidade: int) -> Chamadas:
+    return [
+        partial(carregar_dados, cenario.caminho_livros)
+        for _ in range(min(quantidade, REPETICOES_COLECAO))
+    ]
+
+
+def _indexar(cenario: Cenario, quantidade: int) -> Chamadas:
+    return [
+        partial(montar_acervo, cenario.dados_livros)
+        for _ in range(min(quantidade, REPETICOES_COLECAO))
+    ]
+
+
+# Nome da operação -> função que prepara as chamadas (os argumentos são
+# sorteados antes, fora da medição)
+OPERACOES: Dict[str, Callable[[Cenario, int], Chamadas]] = {
+    "indexar": _indexar,
+    "salvar_dados": _salvar_dados,
+    "carregar_dados": _carregar_dados,
+    "emprestar": _emprestar,
+    "devolver": _devolver,
+    "buscar_titulo": _buscar_titulo,
+    "buscar_autor": _buscar_autor,
+    "sugerir_titulos": _sugerir_titulos,
+}
+
+
+def medir(
+    chamadas: Chamadas, preparar_memoria: Callable[[], Chamadas]
+) -> Dict[str, float]:
+    """Mede as chamadas uma a uma e o pico de memória da segunda rodada.
+
+    As chamadas da segunda rodada só são preparadas depois da primeira:
+    assim elas veem o estado que a rodada de tempo deixou (uma devolução
+    não tenta devolver de novo um empréstimo que já foi devolvido).
+    """
+
+    latencias = []
+    relogio = time.perf_counter
+    inicio = relogio()
+    for chamada in chamadas:
+        antes = relogio()
+        chamada()
+        latencias.append(relogio() - antes)
+    duracao = relogio() - inicio
+
+    resumo = resumir_latencias(latencias, duracao)
+    chamadas_memoria = preparar_memoria()
+    resumo["memoria_pico_mb"] = medir_pico_memoria(
+        lambda: [chamada() for chamada in chamadas_memoria]
+    )
+    return resumo
+
+
+def executar(
+    tamanhos: Sequence[int],
+    quantidade: int = 1000,
+    semente: int = 42,
+    operacoes: Sequence[str] = tuple(OPERACOES),
+    mostrar: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> List[Dict[str, Any]]:
+    """Roda as operações escolhidas em cada tamanho e devolve os resultados."""
+
+    resultados = []
+    for tamanho in tamanhos:
+        with tempfile.TemporaryDirectory() as pasta:
+            cenario = Cenario(tamanho, semente, pasta)
+            for operacao in operacoes:
+                preparar = OPERACOES[operacao]
+                resultado = {
+                    "tamanho": tamanho,
+                    "operacao": operacao,
+                    **medir(
+                        preparar(cenario, quantidade),
+                        partial(
+                            preparar, cenario, min(quantidade, CHAMADAS_MEMORIA)
+                        ),
+                    ),
+                }
+                if operacao in OPERACOES_COLECAO:
+                    segundos = resultado["media_ms"] / 1000
+                    resultado["registros_por_s"] = tamanho / segundos
+                resultados.append(resultado)
+                if mostrar is not None:
+                    mostrar(resultado)
+    return resultados
+
+
+def mostrar_resultado(resultado: Dict[str, Any]) -> None:
+    """Mostra uma linha da tabela de resultados."""
+
+    linha = (
+        f"{resultado['tamanho']:>9} {resultado['operacao']:<16} "
+        f"{resultado['quantidade']:>6} {resultado['p50_ms']:>9.3f} "
+        f"{resultado['p95_ms']:>9.3f} {resultado['p99_ms']:>9.3f} "
+        f"{resultado['vazao_por_s']:>12,.1f} {resultado['memoria_pico_mb']:>9.1f}"
+    )
+    if "registros_por_s" in resultado:
+        linha += f"  ({resultado['registros_por_s']:,.0f} registros/s)"
+    print(linha, flush=True)
+
+
+def main(argumentos: Optional[List[str]] = None) -> None:
+    """Mede latência, vazão e memória das operações centrais da biblioteca."""
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--tamanhos", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument(
+        "--quantidade", type=int, default=1000, help="chamadas por operação"
+    )
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument(
+        "--operacoes", nargs="+", choices=tuple(OPERACOES), default=tuple(OPERACOES)
+    )
+    parser.add_argument("--pasta", default=PASTA_RESULTADOS, help="onde gravar")
+    parser.add_argument("--comparar", help="resultado anterior para comparação")
+    opcoes = parser.parse_args(argumentos)
+
+    print(
+        f"{'tamanho':>9} {'operação':<16} {'vezes':>6} {'p50 (ms)':>9} "
+        f"{'p95 (ms)':>9} {'p99 (ms)':>9} {'ops/s':>12} {'pico (MB)':>9}"
+    )
+    resultados = executar(
+        opcoes.tamanhos,
+        opcoes.quantidade,
+        opcoes.semente,
+        opcoes.operacoes,
+        mostrar_resultado,
+    )
+    caminho = salvar_resultados(
+        resultados,
+        opcoes.pasta,
+        "nucleo",
+        {
+            "tamanhos": opcoes.tamanhos,
+            "quantidade": opcoes.quantidade,
+            "semente": opcoes.semente,
+        },
+    )
+    print(f"\n Resultados gravados em {caminho}")
+
+    if opcoes.comparar:
+        print(f"\n Comparação com {opcoes.comparar}:")
+        for linha in comparar_resultados(
+            resultados, carregar_resultados(opcoes.comparar)
+        ):
+            print(f" {linha}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,275 @@
 """Operações de empréstimo e devolução de livros."""
 
-from datetime import datetime
-from typing import Dict, List
+import threading
+from itertools import chain, islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
+from indices import FilaPrioridade, IndiceOrdenado
+from instrumentacao import medido
 from livros import (
-    decrementar_exemplares_livro,
+    Acervo,
     encontrar_livro_por_titulo,
     incrementar_exemplares_livro,
+    repor_exemplar,
+    retirar_exemplar,
+    sugerir_titulos,
 )
-from usuarios import encontrar_usuario_por_cpf
+from paginacao import escrever_linhas, pagina
+from persistencia import adiar_gravacoes, trava_do_diario
+from registros import Emprestimo, agora, momento_para_texto, momento_vencimento
+from resultados import Resultado
+from usuarios import CadastroUsuarios, encontrar_usuario_por_cpf
 
+MENSAGEM_USUARIO_NAO_ENCONTRADO = "Usuário não encontrado! Cadastre o usuário primeiro."
+MENSAGEM_LIVRO_NAO_ENCONTRADO = "Livro não encontrado! Cadastre o livro primeiro."
+MENSAGEM_SEM_EXEMPLARES = "Não há exemplares disponíveis para empréstimo!"
+MENSAGEM_EMPRESTIMO_NAO_ENCONTRADO = (
+    "Não encontramos esse empréstimo. Confira os dados digitados."
+)
+MENSAGEM_DEVOLUCAO = "Livro devolvido com sucesso!"
+
+
+class RegistroEmprestimos:
+    """Empréstimos ativos indexados por CPF e por par (CPF, título).
+
+    Os registros ficam num dicionário ordenado pela identidade de cada
+    empréstimo, então a iteração segue a ordem de inclusão e a remoção na
+    devolução é O(1), sem deslocar os demais itens como ``list.pop``.
+    Com um ``diario`` associado, cada inclusão e remoção é anotada nele.
+    Inclusões e remoções podem vir de várias threads ao mesmo tempo.
+    A listagem pode sair ordenada pela data do empréstimo, e um heap pelo
+    vencimento responde quais estão atrasados sem olhar os demais.
+    """
+
+    TIPO_REGISTRO = Emprestimo
+    # A data fica no formato "AAAA-MM-DD HH:MM:SS", que já ordena como texto
+    ORDENACOES = {"data": lambda emprestimo: emprestimo["data_emprestimo"]}
+
+    def __init__(self, emprestimos: Iterable[Dict[str, str]] = ()) -> None:
+        # Só anota no diário o que acontecer depois da carga inicial
+        self.diario = None
+        # Os três índices (e a linha do diário) mudam juntos, sob esta trava;
+        # quem anota no diário entra antes na trava dele
+        self._trava = threading.Lock()
+        # id do registro -> empréstimo, na ordem em que foram feitos
+        self._todos: Dict[int, Dict[str, str]] = {}
+        # CPF -> empréstimos desse usuário, também em ordem de inclusão
+        self._por_cpf: Dict[str, Dict[int, Dict[str, str]]] = {}
+        # (CPF, título normalizado) -> empréstimos desse livro com o usuário
+        self._por_cpf_titulo: Dict[Tuple[str, str], Dict[int, Dict[str, str]]] = {}
+        # Ordens de listagem, montadas só quando alguém pede
+        self._ordenacoes = {
+            nome: IndiceOrdenado(chave) for nome, chave in self.ORDENACOES.items()
+        }
+        # Empréstimos pelo vencimento, o mais próximo no topo
+        self._vencimentos = FilaPrioridade(momento_vencimento, self._ativo)
+        self.extend(emprestimos)
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        return iter(self._todos.values())
+
+    def __len__(self) -> int:
+        return len(self._todos)
+
+    def append(self, emprestimo: Dict[str, str]) -> None:
+        """Inclui um novo empréstimo em todos os índices."""
+
+        with trava_do_diario(self.diario), self._trava:
+            chave = id(emprestimo)
+            self._todos[chave] = emprestimo
+            self._por_cpf.setdefault(emprestimo["cpf_usuario"], {})[
+                chave
+            ] = emprestimo
+            self._por_cpf_titulo.setdefault(_chave_emprestimo(emprestimo), {})[
+                chave
+            ] = emprestimo
+            for indice in self._ordenacoes.values():
+                indice.adicionar(emprestimo)
+            self._vencimentos.adicionar(emprestimo)
+            if self.diario is not None:
+                self.diario.anotar("adicionar", emprestimo, self)
+
+    def extend(self, emprestimos: Iterable[Dict[str, str]]) -> None:
+        """Inclui vários empréstimos, na ordem informada."""
+
+        for emprestimo in emprestimos:
+            self.append(emprestimo)
+
+    def remover(self, emprestimo: Dict[str, str]) -> None:
+        """Retira um empréstimo de todos os índices."""
+
+        with trava_do_diario(self.diario), self._trava:
+            self._remover(emprestimo)
+
+    def remove(self, emprestimo: Dict[str, str]) -> None:
+        """O mesmo que ``remover``, com o nome usado pelas listas."""
+
+        self.remover(emprestimo)
+
+    def clear(self) -> None:
+        """Esvazia o registro; com diário, grava o retrato (vazio)."""
+
+        with trava_do_diario(self.diario), self._trava:
+            self._todos.clear()
+            self._por_cpf.clear()
+            self._por_cpf_titulo.clear()
+            for indice in self._ordenacoes.values():
+                indice.construir(())
+            self._vencimentos.limpar()
+            if self.diario is not None:
+                self.diario.compactar(self)
+
+    def retirar(self, cpf: str, titulo: str) -> Optional[Dict[str, str]]:
+        """Busca e remove o empréstimo do livro com o usuário, se existir.
+
+        A busca e a remoção acontecem juntas: se duas threads devolvem o
+        mesmo empréstimo ao mesmo tempo, só uma delas o recebe.
+        """
+
+        with trava_do_diario(self.diario), self._trava:
+            emprestimo = self.buscar(cpf, titulo)
+            if emprestimo is not None:
+                self._remover(emprestimo)
+            return emprestimo
+
+    def _remover(self, emprestimo: Dict[str, str]) -> None:
+        # Quem chama já está com a trava
+        chave = id(emprestimo)
+        del self._todos[chave]
+        _descartar(self._por_cpf, emprestimo["cpf_usuario"], chave)
+        _descartar(self._por_cpf_titulo, _chave_emprestimo(emprestimo), chave)
+        for indice in self._ordenacoes.values():
+            indice.remover(emprestimo)
+        self._vencimentos.remover(emprestimo)
+        if self.diario is not None:
+            self.diario.anotar("remover", emprestimo, self)
+
+    def pagina(
+        self, inicio: int = 0, quantidade: Optional[int] = None
+    ) -> List[Dict[str, str]]:
+        """Devolve uma página dos empréstimos, na ordem em que foram feitos."""
+
+        fim = None if quantidade is None else inicio + quantidade
+        with self._trava:
+            return list(islice(self._todos.values(), inicio, fim))
+
+    def ordenados(
+        self,
+        ordem: str,
+        inicio: int = 0,
+        quantidade: Optional[int] = None,
+        decrescente: bool = False,
+    ) -> List[Dict[str, str]]:
+        """Devolve uma página dos empréstimos na ordem pedida.
+
+        Funciona como ``ListaIndexada.ordenados``.
+        """
+
+        try:
+            indice = self._ordenacoes[ordem]
+        except KeyError:
+            raise ValueError(f"Ordenação desconhecida: {ordem}") from None
+        with self._trava:
+            if not indice.pronto:
+                indice.construir(self._todos.values())
+            return indice.fatia(inicio, quantidade, decrescente)
+
+    def vencidos(self, momento: Optional[int] = None) -> List[Dict[str, str]]:
+        """Devolve os empréstimos vencidos no momento (padrão: agora).
+
+        Saem do vencimento mais antigo para o mais recente.
+        """
+
+        limite = agora() if momento is None else momento
+        with self._trava:
+            return self._vencimentos.antes_de(limite)
+
+    def proximo_vencimento(self) -> Optional[Dict[str, str]]:
+        """Devolve o empréstimo que vence primeiro, se houver algum."""
 
-def listar_emprestimos(lista_emprestimos: List[Dict[str, str]]) -> None:
-    """Mostra os empréstimos correntes no console."""
+        with self._trava:
+            return self._vencimentos.primeiro()
+
+    def _ativo(self, emprestimo: Dict[str, str]) -> bool:
+        # Diz se o empréstimo ainda está no registro (e não foi devolvido)
+        return self._todos.get(id(emprestimo)) is emprestimo
+
+    def do_usuario(self, cpf: str) -> List[Dict[str, str]]:
+        """Devolve os empréstimos ativos de um CPF."""
+
+        return list(self._por_cpf.get(cpf, {}).values())
+
+    def localizar(self, emprestimo: Dict[str, str]) -> Optional[Dict[str, str]]:
+        """Devolve o empréstimo de mesmo CPF, título e data (a chave no diário)."""
+
+        with self._trava:
+            for atual in self._por_cpf_titulo.get(
+                _chave_emprestimo(emprestimo), {}
+            ).values():
+                if (
+                    atual["titulo_livro"] == emprestimo["titulo_livro"]
+                    and atual["data_emprestimo"] == emprestimo["data_emprestimo"]
+                ):
+                    return atual
+            return None
+
+    def buscar(self, cpf: str, titulo: str) -> Optional[Dict[str, str]]:
+        """Devolve o primeiro empréstimo do livro com o usuário, se existir."""
+
+        emprestimos = self._por_cpf_titulo.get((cpf, titulo.lower()))
+        if not emprestimos:
+            return None
+        return next(iter(emprestimos.values()))
+
+
+def _chave_emprestimo(emprestimo: Dict[str, str]) -> Tuple[str, str]:
+    """Monta a chave (CPF, título normalizado) de um empréstimo."""
+
+    return emprestimo["cpf_usuario"], emprestimo["titulo_livro"].lower()
+
+
+def _descartar(indice: Dict, chave_grupo: object, chave: int) -> None:
+    """Remove um empréstimo de um grupo do índice, apagando grupos vazios."""
+
+    grupo = indice[chave_grupo]
+    del grupo[chave]
+    if not grupo:
+        del indice[chave_grupo]
+
+
+@medido("emprestimos.listar_emprestimos")
+def listar_emprestimos(
+    lista_emprestimos: List[Dict[str, str]],
+    inicio: int = 0,
+    quantidade: Optional[int] = None,
+    ordem: Optional[str] = None,
+    decrescente: bool = False,
+) -> None:
+    """Mostra os empréstimos correntes no console (todos ou uma página).
+
+    ``ordem`` pode ser ``"data"``; sem ela, saem na ordem em que foram feitos.
+    """
 
     # Se não tem empréstimos, mostra mensagem e para
     if not lista_emprestimos:
         print(" Nenhum empréstimo registrado no momento.\n")
         return
 
-    # Mostra o cabeçalho
-    print("\n=== Empréstimos Atuais ===")
-    # Percorre e mostra cada empréstimo
-    for indice, emprestimo in enumerate(lista_emprestimos, start=1):
-        print(
-            f"{indice}. CPF: {emprestimo['cpf_usuario']} | Livro: {emprestimo['titulo_livro']} | "
-            f"Data: {emprestimo['data_emprestimo']}"
+    # Pega só a página pedida e escreve as linhas em blocos, não uma a uma
+    emprestimos = pagina(lista_emprestimos, inicio, quantidade, ordem, decrescente)
+    escrever_linhas(
+        chain(
+            ["\n=== Empréstimos Atuais ==="],
+            (
+                f"{indice}. CPF: {emprestimo['cpf_usuario']} | "
+                f"Livro: {emprestimo['titulo_livro']} | "
+                f"Data: {emprestimo['data_emprestimo']} | "
+                f"Vence: {momento_para_texto(momento_vencimento(emprestimo))}"
+                for indice, emprestimo in enumerate(emprestimos, start=inicio + 1)
+            ),
+            ["==========================\n"],
         )
-    print("==========================\n")
+    )
 
 
 def emprestar_livro(
@@ -37,42 +279,91 @@ def emprestar_livro(
 ) -> bool:
     """Registra o empréstimo de um livro se dados válidos forem informados."""
 
-    # Pede o CPF do usuário que quer pegar o livro
+    # Pede CPF e título, faz o empréstimo e mostra o resultado
+    cpf, titulo = ler_dados_emprestimo("Digite o título do livro: ")
+    resultado = realizar_emprestimo(
+        lista_usuarios, lista_livros, lista_emprestimos, cpf, titulo
+    )
+    print(f" {resultado.mensagem}\n")
+    return resultado.sucesso
+
+
+def ler_dados_emprestimo(pergunta_titulo: str) -> Tuple[str, str]:
+    """Pede pelo console o CPF do usuário e o título do livro."""
+
+    # Pede o CPF do usuário
     cpf = input("Digite o CPF do usuário: ").strip()
-    # Pede o título do livro que vai ser emprestado
-    titulo = input("Digite o título do livro: ").strip().title()
+    # Pede o título do livro
+    titulo = input(pergunta_titulo).strip()
+    return cpf, titulo
 
-    # Procura se o usuário existe na lista
+
+def realizar_emprestimo(
+    lista_usuarios: List[Dict[str, str]],
+    lista_livros: List[Dict[str, int | str]],
+    lista_emprestimos: List[Dict[str, str]],
+    cpf: str,
+    titulo: str,
+) -> Resultado:
+    """Registra o empréstimo de um livro, sem usar o console."""
+
+    cpf = cpf.strip()
+    titulo = titulo.strip().title()
+    # Procura o usuário e o livro e faz o empréstimo, se der
     usuario = encontrar_usuario_por_cpf(lista_usuarios, cpf)
+    livro = encontrar_livro_por_titulo(lista_livros, titulo)
+    resultado = _realizar_emprestimo(
+        usuario, livro, cpf, titulo, lista_livros, lista_emprestimos
+    )
+    # Se o título não existe, sugere os parecidos (erro de digitação)
+    if usuario is not None and livro is None:
+        mensagem = _com_sugestoes(resultado.mensagem, lista_livros, titulo)
+        return Resultado(False, mensagem)
+    return resultado
+
+
+def _realizar_emprestimo(
+    usuario: Optional[Dict[str, str]],
+    livro: Optional[Dict[str, int | str]],
+    cpf: str,
+    titulo: str,
+    lista_livros: List[Dict[str, int | str]],
+    lista_emprestimos: List[Dict[str, str]],
+) -> Resultado:
+    """Confere usuário e livro já procurados e registra o empréstimo."""
+
+    # Verifica se o usuário existe
     if usuario is None:
-        print(" Usuário não encontrado! Cadastre o usuário primeiro.\n")
-        return False
+        return Resultado(False, MENSAGEM_USUARIO_NAO_ENCONTRADO)
 
-    # Procura se o livro existe na lista
-    livro = encontrar_livro_por_titulo(lista_livros, titulo)
+    # Verifica se o livro existe
     if livro is None:
-        print(" Livro não encontrado! Cadastre o livro primeiro.\n")
-        return False
-
-    # Verifica se tem exemplares disponíveis
-    if livro["exemplares"] <= 0:
-        print(" Não há exemplares disponíveis para empréstimo!\n")
-        return False
+        return Resultado(False, MENSAGEM_LIVRO_NAO_ENCONTRADO)
 
-    # Diminui 1 exemplar do livro
-    decrementar_exemplares_livro(titulo, lista_livros)
+    # Diminui 1 exemplar do livro, se tiver exemplares disponíveis
+    if not retirar_exemplar(livro, lista_livros):
+        return Resultado(False, MENSAGEM_SEM_EXEMPLARES)
 
     # Cria um novo registro de empréstimo com data e hora atual
-    emprestimo = {
-        "cpf_usuario": cpf,
-        "titulo_livro": titulo,
-        "data_emprestimo": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-    }
+    emprestimo = Emprestimo(cpf, titulo, agora())
 
     # Adiciona o empréstimo na lista
     lista_emprestimos.append(emprestimo)
-    print(f" Empréstimo realizado com sucesso para {usuario['nome']}!\n")
-    return True
+    return Resultado(
+        True, f"Empréstimo realizado com sucesso para {usuario['nome']}!", emprestimo
+    )
+
+
+def _com_sugestoes(
+    mensagem: str, lista_livros: List[Dict[str, int | str]], titulo: str
+) -> str:
+    """Acrescenta à mensagem os títulos parecidos com o digitado, se houver."""
+
+    sugestoes = sugerir_titulos(lista_livros, titulo)
+    if not sugestoes:
+        return mensagem
+    titulos = ", ".join(f"'{sugestao}'" for sugestao in sugestoes)
+    return f"{mensagem} Você quis dizer: {titulos}?"
 
 
 def devolver_livro(
@@ -81,10 +372,32 @@ def devolver_livro(
 ) -> bool:
     """Remove o empréstimo e devolve o exemplar ao acervo."""
 
-    # Pede o CPF do usuário que está devolvendo
-    cpf = input("Digite o CPF do usuário: ").strip()
-    # Pede o título do livro que está sendo devolvido
-    titulo = input("Digite o título do livro devolvido: ").strip().title()
+    # Pede CPF e título, faz a devolução e mostra o resultado
+    cpf, titulo = ler_dados_emprestimo("Digite o título do livro devolvido: ")
+    resultado = realizar_devolucao(lista_livros, lista_emprestimos, cpf, titulo)
+    print(f" {resultado.mensagem}\n")
+    return resultado.sucesso
+
+
+def realizar_devolucao(
+    lista_livros: List[Dict[str, int | str]],
+    lista_emprestimos: List[Dict[str, str]],
+    cpf: str,
+    titulo: str,
+) -> Resultado:
+    """Remove o empréstimo e devolve o exemplar ao acervo, sem usar o console."""
+
+    cpf = cpf.strip()
+    titulo = titulo.strip().title()
+
+    # Se for um registro indexado, encontra e remove o empréstimo direto;
+    # só quem conseguiu retirar o empréstimo devolve o exemplar ao estoque
+    if isinstance(lista_emprestimos, RegistroEmprestimos):
+        emprestimo = lista_emprestimos.retirar(cpf, titulo)
+        if emprestimo is not None:
+            incrementar_exemplares_livro(emprestimo["titulo_livro"], lista_livros)
+            return Resultado(True, MENSAGEM_DEVOLUCAO, emprestimo)
+        return _devolucao_nao_encontrada(lista_livros, titulo)
 
     # Procura o empréstimo na lista
     for indice, emprestimo in enumerate(lista_emprestimos):
@@ -99,14 +412,192 @@ def devolver_livro(
             incrementar_exemplares_livro(emprestimo["titulo_livro"], lista_livros)
             # Remove o empréstimo da lista
             lista_emprestimos.pop(indice)
-            print(" Livro devolvido com sucesso!\n")
-            return True
+            return Resultado(True, MENSAGEM_DEVOLUCAO, emprestimo)
 
     # Se não encontrou o empréstimo
-    print(" Não encontramos esse empréstimo. Confira os dados digitados.\n")
-    return False
+    return _devolucao_nao_encontrada(lista_livros, titulo)
+
+
+def _devolucao_nao_encontrada(
+    lista_livros: List[Dict[str, int | str]], titulo: str
+) -> Resultado:
+    """Recusa a devolução, sugerindo títulos se o digitado não existe."""
+
+    if encontrar_livro_por_titulo(lista_livros, titulo) is None:
+        return Resultado(
+            False,
+            _com_sugestoes(MENSAGEM_EMPRESTIMO_NAO_ENCONTRADO, lista_livros, titulo),
+        )
+    return Resultado(False, MENSAGEM_EMPRESTIMO_NAO_ENCONTRADO)
+
+
+def emprestar_lote(
+    lista_usuarios: List[Dict[str, str]],
+    lista_livros: List[Dict[str, int | str]],
+    lista_emprestimos: List[Dict[str, str]],
+    pedidos: Iterable[Tuple[str, str]],
+) -> List[Resultado]:
+    """Faz vários empréstimos de uma vez, a partir de pares (CPF, título).
+
+    Cada pedido é conferido como em ``emprestar_livro``; um pedido recusado
+    não interrompe os demais. As alterações vão para o armazenamento numa
+    única gravação. Devolve um resultado por pedido, na mesma ordem.
+    """
+
+    # Índices de busca montados com uma única passada pelas listas
+    usuario_do_cpf = _indice_usuarios(lista_usuarios)
+    livro_do_titulo = _indice_livros(lista_livros)
+
+    resultados = []
+    with adiar_gravacoes():
+        for cpf, titulo in pedidos:
+            cpf = cpf.strip()
+            titulo = titulo.strip().title()
+            resultados.append(
+                _realizar_emprestimo(
+                    usuario_do_cpf(cpf),
+                    livro_do_titulo(titulo),
+                    cpf,
+                    titulo,
+                    lista_livros,
+                    lista_emprestimos,
+                )
+            )
+    return resultados
+
+
+def devolver_lote(
+    lista_livros: List[Dict[str, int | str]],
+    lista_emprestimos: List[Dict[str, str]],
+    pedidos: Iterable[Tuple[str, str]],
+) -> List[Resultado]:
+    """Faz várias devoluções de uma vez, a partir de pares (CPF, título).
+
+    Um pedido sem empréstimo correspondente não interrompe os demais, e as
+    alterações vão para o armazenamento numa única gravação. Devolve um
+    resultado por pedido, na mesma ordem.
+    """
+
+    livro_do_titulo = _indice_livros(lista_livros)
 
+    # Com uma lista comum, indexa os empréstimos uma vez e remove no final
+    registro = lista_emprestimos
+    if not isinstance(lista_emprestimos, RegistroEmprestimos):
+        registro = RegistroEmprestimos(lista_emprestimos)
 
+    resultados = []
+    with adiar_gravacoes():
+        for cpf, titulo in pedidos:
+            emprestimo = registro.retirar(cpf.strip(), titulo.strip().title())
+            if emprestimo is None:
+                resultados.append(Resultado(False, MENSAGEM_EMPRESTIMO_NAO_ENCONTRADO))
+                continue
+            # Empréstimo encerrado: devolve o exemplar pro acervo
+            livro = livro_do_titulo(emprestimo["titulo_livro"])
+            if livro is not None:
+                repor_exemplar(livro, lista_livros)
+            resultados.append(Resultado(True, MENSAGEM_DEVOLUCAO, emprestimo))
+
+        # Reconstrói a lista comum só com os empréstimos que continuam ativos
+        if registro is not lista_emprestimos:
+            lista_emprestimos[:] = list(registro)
+    return resultados
+
+
+def _indice_usuarios(
+    lista_usuarios: List[Dict[str, str]],
+) -> Callable[[str], Optional[Dict[str, str]]]:
+    """Devolve uma função de busca por CPF, indexando a lista se preciso."""
+
+    if isinstance(lista_usuarios, CadastroUsuarios):
+        return lista_usuarios.buscar_por_cpf
+    return CadastroUsuarios(lista_usuarios).buscar_por_cpf
+
+
+def _indice_livros(
+    lista_livros: List[Dict[str, int | str]],
+) -> Callable[[str], Optional[Dict[str, int | str]]]:
+    """Devolve uma função de busca por título, indexando a lista se preciso."""
+
+    if isinstance(lista_livros, Acervo):
+        return lista_livros.buscar_por_titulo
+    # Só o índice por título interessa aqui (sem os índices de trechos)
+    por_titulo: Dict[str, Dict[str, int | str]] = {}
+    for livro in lista_livros:
+        por_titulo.setdefault(livro["título"].lower(), livro)
+    return lambda titulo: por_titulo.get(titulo.lower())
+
+
+@medido("emprestimos.emprestimos_atrasados")
+def emprestimos_atrasados(
+    lista_emprestimos: Iterable[Dict[str, str]], momento: Optional[int] = None
+) -> List[Dict[str, str]]:
+    """Retorna os empréstimos vencidos (padrão: agora), do mais atrasado.
+
+    ``momento`` é em segundos, como ``registros.agora``.
+    """
+
+    # Se for um registro indexado, usa o heap de vencimentos
+    if isinstance(lista_emprestimos, RegistroEmprestimos):
+        return lista_emprestimos.vencidos(momento)
+
+    # Senão, confere o vencimento de cada empréstimo
+    limite = agora() if momento is None else momento
+    atrasados = [
+        emprestimo
+        for emprestimo in lista_emprestimos
+        if momento_vencimento(emprestimo) < limite
+    ]
+    atrasados.sort(key=momento_vencimento)
+    return atrasados
+
+
+def proximo_vencimento(
+    lista_emprestimos: Iterable[Dict[str, str]],
+) -> Optional[Dict[str, str]]:
+    """Retorna o empréstimo que vence primeiro, se houver algum."""
+
+    if isinstance(lista_emprestimos, RegistroEmprestimos):
+        return lista_emprestimos.proximo_vencimento()
+    return min(lista_emprestimos, key=momento_vencimento, default=None)
+
+
+def listar_emprestimos_atrasados(lista_emprestimos: Iterable[Dict[str, str]]) -> None:
+    """Mostra no console os empréstimos atrasados e o próximo vencimento."""
+
+    momento = agora()
+    atrasados = emprestimos_atrasados(lista_emprestimos, momento)
+
+    # Se ninguém está atrasado, diz quando vence o próximo
+    if not atrasados:
+        print(" Nenhum empréstimo atrasado.")
+        proximo = proximo_vencimento(lista_emprestimos)
+        if proximo is not None:
+            print(
+                f" Próximo vencimento: {proximo['titulo_livro']} "
+                f"(CPF {proximo['cpf_usuario']}), em "
+                f"{momento_para_texto(momento_vencimento(proximo))}."
+            )
+        print()
+        return
+
+    # Um dia tem 86400 segundos; conta os dias completos de atraso
+    escrever_linhas(
+        chain(
+            ["\n=== Empréstimos Atrasados ==="],
+            (
+                f"{indice}. CPF: {emprestimo['cpf_usuario']} | "
+                f"Livro: {emprestimo['titulo_livro']} | "
+                f"Venceu: {momento_para_texto(momento_vencimento(emprestimo))} | "
+                f"Atraso: {(momento - momento_vencimento(emprestimo)) // 86400} dia(s)"
+                for indice, emprestimo in enumerate(atrasados, start=1)
+            ),
+            ["=============================\n"],
+        )
+    )
+
+
+@medido("emprestimos.emprestimos_por_usuario")
 def emprestimos_por_usuario(
     lista_emprestimos: List[Dict[str, str]], cpf: str
 ) -> List[Dict[str, str]]:
@@ -118,6 +609,10 @@ def emprestimos_por_usuario(
     if not cpf_normalizado:
         return []
 
+    # Se for um registro indexado, usa o índice por CPF
+    if isinstance(lista_emprestimos, RegistroEmprestimos):
+        return lista_emprestimos.do_usuario(cpf_normalizado)
+
     # Cria uma lista só com os empréstimos desse CPF
     return [
         emprestimo
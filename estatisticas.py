@@ -0,0 +1,181 @@
+"""Estatísticas de circulação mantidas a cada empréstimo e devolução.
+
+Os empréstimos devolvidos saem do registro, então o histórico não pode ser
+recontado depois. Em vez disso, cada empréstimo e cada devolução somam um
+nos contadores do título, do usuário, do autor e do ano de publicação do
+livro, e num contador geral. Os contadores são registros comuns de uma
+coleção gravada como as outras (com diário e sincronização entre
+processos), e o topo de cada tipo é mantido a cada soma, então o relatório
+sai na hora, qualquer que seja o tamanho do histórico.
+"""
+
+import threading
+from itertools import chain
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from indices import ListaIndexada, MaisFrequentes
+from instrumentacao import medido
+from paginacao import escrever_linhas
+from persistencia import trava_do_diario
+from usuarios import encontrar_usuario_por_cpf
+
+# Tipos de contador com ranking (o contador geral fica de fora)
+TIPOS_RANKING = ("titulo", "usuario", "autor", "ano")
+TIPO_GERAL = "geral"
+# Quantos itens de cada tipo ficam no topo mantido
+TAMANHO_RANKING = 10
+
+TITULOS_RANKING = {
+    "titulo": "Títulos mais emprestados",
+    "usuario": "Usuários mais ativos",
+    "autor": "Empréstimos por autor",
+    "ano": "Empréstimos por ano de publicação",
+}
+
+
+class EstatisticasCirculacao(ListaIndexada):
+    """Contadores de empréstimos e devoluções, um registro por (tipo, chave).
+
+    Cada registro tem ``tipo``, ``chave`` (sempre texto), ``emprestimos`` e
+    ``devolucoes``. Um índice localiza o contador de cada chave, e um
+    ``MaisFrequentes`` por tipo guarda os de mais empréstimos.
+    """
+
+    def __init__(self, contadores: Iterable[Dict[str, Any]] = ()) -> None:
+        # Empréstimos de várias threads somam nos mesmos contadores
+        self._trava = threading.Lock()
+        super().__init__(contadores)
+
+    def _limpar_indices(self) -> None:
+        # (tipo, chave) -> contador
+        self._por_chave: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._rankings = {
+            tipo: MaisFrequentes(TAMANHO_RANKING) for tipo in TIPOS_RANKING
+        }
+
+    def _indexar(self, contador: Dict[str, Any]) -> None:
+        self._por_chave[(contador["tipo"], contador["chave"])] = contador
+        self.reindexar_registro(contador)
+
+    def reindexar_registro(self, contador: Dict[str, Any]) -> None:
+        """Leva ao ranking a contagem atual de um contador."""
+
+        ranking = self._rankings.get(contador["tipo"])
+        if ranking is not None:
+            ranking.atualizar(contador["chave"], contador["emprestimos"])
+
+    def registrar_emprestimo(
+        self, emprestimo: Dict[str, Any], livro: Optional[Dict[str, Any]]
+    ) -> None:
+        """Soma um empréstimo nos contadores do livro, do usuário e no geral."""
+
+        self._somar(emprestimo, livro, "emprestimos")
+
+    def registrar_devolucao(
+        self, emprestimo: Dict[str, Any], livro: Optional[Dict[str, Any]]
+    ) -> None:
+        """Soma uma devolução nos contadores do livro, do usuário e no geral."""
+
+        self._somar(emprestimo, livro, "devolucoes")
+
+    def localizar(self, contador: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Devolve o contador com o mesmo tipo e chave (a chave no diário)."""
+
+        return self._por_chave.get((contador["tipo"], contador["chave"]))
+
+    def contador(self, tipo: str, chave: Any) -> Optional[Dict[str, Any]]:
+        """Devolve o contador de uma chave (o ano pode vir como número)."""
+
+        return self._por_chave.get((tipo, str(chave)))
+
+    def geral(self) -> Dict[str, Any]:
+        """Devolve o total de empréstimos e devoluções já registrados."""
+
+        return self._por_chave.get((TIPO_GERAL, "")) or _novo_contador(TIPO_GERAL, "")
+
+    def mais_emprestados(self, tipo: str) -> List[Dict[str, Any]]:
+        """Devolve os contadores do topo do tipo, do mais emprestado ao menos."""
+
+        try:
+            ranking = self._rankings[tipo]
+        except KeyError:
+            raise ValueError(f"Tipo de estatística desconhecido: {tipo}") from None
+        return [self._por_chave[(tipo, chave)] for chave, _ in ranking.itens()]
+
+    def _somar(
+        self, emprestimo: Dict[str, Any], livro: Optional[Dict[str, Any]], campo: str
+    ) -> None:
+        # Sem o livro (apagado do acervo), conta só o título e o usuário
+        chaves = [
+            (TIPO_GERAL, ""),
+            ("titulo", livro["título"] if livro else emprestimo["titulo_livro"]),
+            ("usuario", emprestimo["cpf_usuario"]),
+        ]
+        if livro is not None:
+            chaves += [("autor", livro["autor"]), ("ano", str(livro["ano"]))]
+
+        # A trava do diário vem antes da dos contadores
+        with trava_do_diario(self.diario), self._trava:
+            for tipo, chave in chaves:
+                contador = self._por_chave.get((tipo, chave))
+                if contador is None:
+                    contador = _novo_contador(tipo, chave)
+                    contador[campo] = 1
+                    self.append(contador)
+                else:
+                    contador[campo] += 1
+                    self.registrar_alteracao(contador)
+
+
+def _novo_contador(tipo: str, chave: str) -> Dict[str, Any]:
+    """Cria um contador zerado."""
+
+    return {"tipo": tipo, "chave": chave, "emprestimos": 0, "devolucoes": 0}
+
+
+@medido("estatisticas.mostrar_estatisticas")
+def mostrar_estatisticas(
+    estatisticas: EstatisticasCirculacao, lista_usuarios: List[Dict[str, str]]
+) -> None:
+    """Mostra no console os totais e o topo de cada tipo de contador."""
+
+    geral = estatisticas.geral()
+    # Sem nenhum empréstimo registrado, não há o que mostrar
+    if not geral["emprestimos"]:
+        print(" Nenhum empréstimo registrado ainda.\n")
+        return
+
+    def descrever(tipo: str, chave: str) -> str:
+        # Usuários aparecem pelo nome, quando ainda estão cadastrados
+        if tipo == "usuario":
+            usuario = encontrar_usuario_por_cpf(lista_usuarios, chave)
+            if usuario is not None:
+                return f"{usuario['nome']} (CPF {chave})"
+        return chave
+
+    em_andamento = geral["emprestimos"] - geral["devolucoes"]
+    escrever_linhas(
+        chain(
+            [
+                "\n=== Estatísticas de Circulação ===",
+                f"Empréstimos: {geral['emprestimos']} | "
+                f"Devoluções: {geral['devolucoes']} | "
+                f"Em andamento: {em_andamento}",
+            ],
+            chain.from_iterable(
+                chain(
+                    [f"\n{TITULOS_RANKING[tipo]}:"],
+                    (
+                        f"{indice}. {descrever(tipo, contador['chave'])} | "
+                        f"Empréstimos: {contador['emprestimos']} | "
+                        f"Devoluções: {contador['devolucoes']}"
+                        for indice, contador in enumerate(
+                            estatisticas.mais_emprestados(tipo), start=1
+                        )
+                    ),
+                )
+                for tipo in TIPOS_RANKING
+            ),
+            ["==================================\n"],
+        )
+    )
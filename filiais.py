@@ -0,0 +1,207 @@
+"""Catálogo federado: busca de livros em várias filiais ao mesmo tempo.
+
+Cada filial roda o sistema na sua própria pasta (``livros.json`` e diário).
+O ``CatalogoFederado`` reparte as filiais entre processos de busca: cada
+processo carrega uma vez o acervo das filiais que lhe cabem e, antes de
+cada busca, só traz o que os terminais da filial gravaram desde a última
+(veja ``persistencia.Diario.sincronizar``). Uma busca é enviada a todas as
+filiais de uma vez e os resultados voltam juntos, com o nome da filial e
+a disponibilidade de cada livro.
+"""
+
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import chain
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from instrumentacao import medido
+from livros import Acervo, buscar_livros_por_autor, buscar_livros_por_titulo
+from normalizacao import normalizar
+from paginacao import escrever_linhas
+from persistencia import CarregamentoEmSegundoPlano
+from servicos import ARQUIVO_LIVROS, CAMPOS_CHAVE, criar_armazenamento
+
+# Campo da busca -> função que busca no acervo de uma filial
+BUSCAS = {"titulo": buscar_livros_por_titulo, "autor": buscar_livros_por_autor}
+# Banco usado por filiais com o armazenamento ``sqlite``
+ARQUIVO_BANCO = "biblioteca.db"
+
+
+@dataclass(frozen=True)
+class Filial:
+    """Uma filial da biblioteca e a pasta onde ficam os dados dela."""
+
+    nome: str
+    pasta: str
+
+
+def ler_filial(texto: str) -> Filial:
+    """Converte ``NOME=PASTA`` (da linha de comando) numa ``Filial``."""
+
+    nome, separador, pasta = texto.partition("=")
+    if not separador or not nome.strip() or not pasta.strip():
+        raise ValueError(f"Filial inválida: {texto!r}. Use NOME=PASTA.")
+    return Filial(nome.strip(), pasta.strip())
+
+
+# Estado de cada processo de busca: nome da filial -> acervo carregado
+_acervos: Dict[str, Acervo] = {}
+_tipo_armazenamento = "diario"
+
+
+def _iniciar_processo(tipo_armazenamento: str) -> None:
+    """Prepara um processo de busca (o acervo só é carregado no primeiro uso)."""
+
+    global _tipo_armazenamento
+    _tipo_armazenamento = tipo_armazenamento
+
+
+def _acervo_da_filial(filial: Filial) -> Acervo:
+    """Devolve o acervo da filial, carregando na primeira vez e depois só
+    trazendo o que os terminais da filial gravaram desde a última busca."""
+
+    acervo = _acervos.get(filial.nome)
+    if acervo is None:
+        acervo = _acervos[filial.nome] = Acervo()
+        armazenamento = criar_armazenamento(
+            _tipo_armazenamento, os.path.join(filial.pasta, ARQUIVO_BANCO)
+        )
+        caminho_livros = os.path.join(filial.pasta, ARQUIVO_LIVROS)
+        CarregamentoEmSegundoPlano(
+            armazenamento,
+            {caminho_livros: acervo},
+            {caminho_livros: CAMPOS_CHAVE[ARQUIVO_LIVROS]},
+        ).carregar()
+    elif acervo.diario is not None:
+        with acervo.diario.trava:
+            acervo.diario.sincronizar(acervo)
+    return acervo
+
+
+def _buscar_na_filial(
+    filial: Filial, campo: str, termo: str
+) -> List[Tuple[str, Dict[str, Any]]]:
+    """Busca no acervo de uma filial (roda num processo de busca).
+
+    Devolve pares (título normalizado, livro) já ordenados pelo título, para
+    o processo principal só intercalar as listas das filiais.
+    """
+
+    resultados = [
+        (
+            normalizar(livro["título"]),
+            {
+                "filial": filial.nome,
+                **livro.para_dict(),
+                "disponivel": livro["exemplares"] > 0,
+            },
+        )
+        for livro in BUSCAS[campo](_acervo_da_filial(filial), termo)
+    ]
+    resultados.sort(key=itemgetter(0))
+    return resultados
+
+
+class CatalogoFederado:
+    """Busca nos acervos de várias filiais, em paralelo, em vários processos.
+
+    Cada filial fica sempre no mesmo processo (há um executor de um
+    processo para cada ``processos``), então o acervo dela é carregado uma
+    vez só e fica na memória de um único processo. Sem ``processos``, usa
+    um por filial, até o número de núcleos. Como no resto do sistema, só as
+    filiais com diário (o armazenamento padrão) recebem as alterações feitas
+    depois da primeira carga.
+    """
+
+    def __init__(
+        self,
+        filiais: Sequence[Filial],
+        processos: Optional[int] = None,
+        tipo_armazenamento: str = "diario",
+    ) -> None:
+        if not filiais:
+            raise ValueError("Informe pelo menos uma filial.")
+        # O nome identifica a filial no processo de busca e nos resultados
+        if len({filial.nome for filial in filiais}) != len(filiais):
+            raise ValueError("Cada filial precisa de um nome diferente.")
+        self.filiais = list(filiais)
+        quantidade = processos or min(len(self.filiais), os.cpu_count() or 1)
+        self._executores = [
+            ProcessPoolExecutor(
+                max_workers=1,
+                initializer=_iniciar_processo,
+                initargs=(tipo_armazenamento,),
+            )
+            for _ in range(quantidade)
+        ]
+
+    def __enter__(self) -> "CatalogoFederado":
+        return self
+
+    def __exit__(self, *erro: Any) -> None:
+        self.fechar()
+
+    @medido("filiais.buscar_por_titulo")
+    def buscar_por_titulo(self, termo: str) -> List[Dict[str, Any]]:
+        """Livros de todas as filiais cujo título contém o termo."""
+
+        return self._buscar("titulo", termo)
+
+    @medido("filiais.buscar_por_autor")
+    def buscar_por_autor(self, termo: str) -> List[Dict[str, Any]]:
+        """Livros de todas as filiais cujo autor contém o termo."""
+
+        return self._buscar("autor", termo)
+
+    def fechar(self) -> None:
+        """Encerra os processos de busca."""
+
+        for executor in self._executores:
+            executor.shutdown(wait=True)
+
+    def _buscar(self, campo: str, termo: str) -> List[Dict[str, Any]]:
+        """Envia a busca a todas as filiais e junta os resultados.
+
+        Os livros saem pelo título (sem diferenciar acentos) e, com o mesmo
+        título, na ordem em que as filiais foram informadas.
+        """
+
+        # Termo vazio não encontra nada em filial nenhuma
+        if not normalizar(termo.strip()):
+            return []
+
+        futuros = [
+            self._executores[posicao % len(self._executores)].submit(
+                _buscar_na_filial, filial, campo, termo
+            )
+            for posicao, filial in enumerate(self.filiais)
+        ]
+        # Cada filial já devolve a lista ordenada; aqui só se intercalam
+        # (com o mesmo título, vem antes a filial informada antes)
+        listas = [futuro.result() for futuro in futuros]
+        return [livro for _, livro in heapq.merge(*listas, key=itemgetter(0))]
+
+
+def listar_resultados_federados(resultados: List[Dict[str, Any]]) -> None:
+    """Mostra no console os livros encontrados nas filiais."""
+
+    # Se não achou nada em nenhuma filial, mostra mensagem e para
+    if not resultados:
+        print(" Nenhum livro encontrado nas filiais para o termo informado.\n")
+        return
+
+    escrever_linhas(
+        chain(
+            ["\n=== Livros nas Filiais ==="],
+            (
+                f"{indice}. {livro['título']} | Autor: {livro['autor']} | "
+                f"Ano: {livro['ano']} | Filial: {livro['filial']} | "
+                f"Exemplares disponíveis: {livro['exemplares']}"
+                for indice, livro in enumerate(resultados, start=1)
+            ),
+            ["==========================\n"],
+        )
+    )
@@ -0,0 +1,177 @@
+"""Histórico dos empréstimos devolvidos, separado por mês da devolução.
+
+Na devolução o empréstimo sai do registro ativo (e do ``emprestimos.json``
+que é regravado a cada compactação). Para a auditoria, ele é acrescentado,
+com a data da devolução, ao arquivo do mês em que foi devolvido. Dentro de
+``adiar_gravacoes`` essa linha vai para o disco antes da remoção no diário
+ou no retrato dos empréstimos, então uma queda no meio nunca perde a
+devolução::
+
+    historico/emprestimos-2025-03.jsonl
+
+Cada arquivo é só acrescentado (JSON Lines), nunca regravado, e a consulta
+por período abre apenas os meses do intervalo pedido.
+"""
+
+import json
+import os
+import re
+from datetime import datetime
+from itertools import chain
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from instrumentacao import medido
+from paginacao import escrever_linhas
+from persistencia import acrescentar_linhas
+from registros import Registro, agora, momento_para_texto
+
+PASTA_HISTORICO = "historico"
+PREFIXO_PARTICAO = "emprestimos-"
+EXTENSAO_PARTICAO = ".jsonl"
+# Datas aceitas na consulta: mês ("AAAA-MM"), dia ou data e hora completas
+_DATA_CONSULTA = re.compile(r"\d{4}-\d{2}(-\d{2}( \d{2}:\d{2}:\d{2})?)?")
+# Tamanho da data -> formato, para conferir mês, dia e hora de verdade
+_FORMATOS_CONSULTA = {7: "%Y-%m", 10: "%Y-%m-%d", 19: "%Y-%m-%d %H:%M:%S"}
+
+
+class HistoricoEmprestimos:
+    """Arquivo dos empréstimos devolvidos, um arquivo por mês."""
+
+    def __init__(self, pasta: str = PASTA_HISTORICO) -> None:
+        self.pasta = pasta
+        # A pasta só é criada na primeira devolução
+        self._pasta_criada = False
+
+    def caminho_particao(self, mes: str) -> str:
+        """Devolve o arquivo do mês informado ("AAAA-MM")."""
+
+        return os.path.join(self.pasta, f"{PREFIXO_PARTICAO}{mes}{EXTENSAO_PARTICAO}")
+
+    def arquivar(
+        self, emprestimo: Dict[str, Any], momento_devolucao: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Acrescenta o empréstimo devolvido ao arquivo do mês da devolução.
+
+        Sem momento informado, a devolução é agora. Devolve o registro
+        arquivado (o empréstimo mais ``data_devolucao``).
+        """
+
+        if not self._pasta_criada:
+            os.makedirs(self.pasta, exist_ok=True)
+            self._pasta_criada = True
+
+        if isinstance(emprestimo, Registro):
+            registro = emprestimo.para_dict()
+        else:
+            registro = dict(emprestimo)
+        devolucao = agora() if momento_devolucao is None else momento_devolucao
+        registro["data_devolucao"] = momento_para_texto(devolucao)
+        linha = json.dumps(registro, ensure_ascii=False)
+        # Dentro de uma sessão, vai para o disco junto com o resto da operação
+        mes = registro["data_devolucao"][:7]
+        acrescentar_linhas(self.caminho_particao(mes), [linha])
+        return registro
+
+    def particoes(self, inicio: str, fim: str) -> List[str]:
+        """Devolve os arquivos existentes dos meses entre as duas datas."""
+
+        ano, mes = _ano_mes(inicio)
+        ultimo = _ano_mes(fim)
+        caminhos = []
+        while (ano, mes) <= ultimo:
+            caminho = self.caminho_particao(f"{ano:04d}-{mes:02d}")
+            if os.path.exists(caminho):
+                caminhos.append(caminho)
+            ano, mes = divmod(ano * 12 + mes, 12)
+            mes += 1
+        return caminhos
+
+    @medido("historico.consultar")
+    def consultar(
+        self, inicio: str, fim: str, cpf: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Devolve os empréstimos devolvidos entre as duas datas, inclusive.
+
+        As datas podem ser um mês ("2025-03"), um dia ("2025-03-15") ou data
+        e hora; o fim vale até o último instante do mês ou do dia. Com
+        ``cpf``, só os daquele usuário. Saem na ordem das devoluções.
+        """
+
+        inicio, fim = inicio.strip(), fim.strip()
+        for data in (inicio, fim):
+            if not _data_valida(data):
+                raise ValueError(
+                    f"Data inválida: {data!r}. Use AAAA-MM ou AAAA-MM-DD."
+                )
+        if fim < inicio:
+            raise ValueError("A data final não pode ser anterior à inicial.")
+
+        return [
+            registro
+            for caminho in self.particoes(inicio, fim)
+            for registro in _ler_particao(caminho)
+            # Compara só o começo da data, na precisão de cada limite
+            if registro["data_devolucao"][: len(inicio)] >= inicio
+            and registro["data_devolucao"][: len(fim)] <= fim
+            and (cpf is None or registro["cpf_usuario"] == cpf)
+        ]
+
+
+def _data_valida(data: str) -> bool:
+    """Confere o formato da data e se mês, dia e hora existem."""
+
+    if not _DATA_CONSULTA.fullmatch(data):
+        return False
+    try:
+        datetime.strptime(data, _FORMATOS_CONSULTA[len(data)])
+    except ValueError:
+        return False
+    return True
+
+
+def _ano_mes(data: str) -> Tuple[int, int]:
+    """Extrai o ano e o mês de uma data no formato dos arquivos."""
+
+    return int(data[:4]), int(data[5:7])
+
+
+def _ler_particao(caminho: str) -> Iterator[Dict[str, Any]]:
+    """Lê os registros de um arquivo do histórico, um por linha.
+
+    Linhas incompletas (de uma queda no meio da escrita) são ignoradas.
+    """
+
+    with open(caminho, "r", encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            try:
+                yield json.loads(linha)
+            except json.JSONDecodeError:
+                continue
+
+
+@medido("historico.listar_historico")
+def listar_historico(
+    registros: List[Dict[str, Any]], inicio: int = 0, quantidade: Optional[int] = None
+) -> None:
+    """Mostra no console os empréstimos devolvidos (todos ou uma página)."""
+
+    # Se o período não teve devoluções, mostra mensagem e para
+    if not registros:
+        print(" Nenhuma devolução registrada no período.\n")
+        return
+
+    fim = None if quantidade is None else inicio + quantidade
+    pagina = registros[inicio:fim]
+    escrever_linhas(
+        chain(
+            ["\n=== Histórico de Devoluções ==="],
+            (
+                f"{indice}. CPF: {registro['cpf_usuario']} | "
+                f"Livro: {registro['titulo_livro']} | "
+                f"Emprestado: {registro['data_emprestimo']} | "
+                f"Devolvido: {registro['data_devolucao']}"
+                for indice, registro in enumerate(pagina, start=inicio + 1)
+            ),
+            ["===============================\n"],
+        )
+    )
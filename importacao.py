@@ -0,0 +1,224 @@
+"""Importação em lote de livros e usuários a partir de CSV ou JSON Lines.
+
+Os arquivos são lidos em fluxo, registro por registro, e validados pelas
+mesmas regras do cadastro pelo menu (``montar_livro`` e ``montar_usuario``).
+Livros com título já existente somam seus exemplares ao livro cadastrado;
+usuários com CPF repetido são recusados. Ao final, a coleção é gravada uma
+única vez no armazenamento escolhido.
+
+Uso::
+
+    python importacao.py livros catalogo.csv
+    python importacao.py usuarios alunos.jsonl --armazenamento sqlite
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from livros import montar_livro
+from servicos import ARQUIVO_LIVROS, ARQUIVO_USUARIOS, criar_armazenamento
+from usuarios import montar_usuario
+
+# Quantos erros guardar no resumo (o total continua sendo contado)
+LIMITE_ERROS_GUARDADOS = 20
+
+
+@dataclass
+class ResumoImportacao:
+    """Contagens e tempo de uma importação."""
+
+    incluidos: int = 0
+    mesclados: int = 0
+    recusados: int = 0
+    segundos: float = 0.0
+    erros: List[str] = field(default_factory=list)
+
+    @property
+    def lidos(self) -> int:
+        """Total de registros lidos do arquivo."""
+
+        return self.incluidos + self.mesclados + self.recusados
+
+    @property
+    def registros_por_segundo(self) -> float:
+        """Vazão da importação."""
+
+        return self.lidos / self.segundos if self.segundos else 0.0
+
+    def recusar(self, linha: int, motivo: str) -> None:
+        """Conta um registro recusado e guarda o motivo (até o limite)."""
+
+        self.recusados += 1
+        if len(self.erros) < LIMITE_ERROS_GUARDADOS:
+            self.erros.append(f"Registro {linha}: {motivo}")
+
+
+def ler_registros(
+    caminho_arquivo: str, formato: Optional[str] = None
+) -> Iterator[Dict[str, Any]]:
+    """Lê um arquivo CSV (com cabeçalho) ou JSON Lines, um registro por vez.
+
+    Sem formato informado, usa a extensão do arquivo (``.csv`` ou outra).
+    """
+
+    if formato is None:
+        formato = "csv" if caminho_arquivo.lower().endswith(".csv") else "jsonl"
+
+    with open(caminho_arquivo, "r", encoding="utf-8", newline="") as arquivo:
+        if formato == "csv":
+            yield from csv.DictReader(arquivo)
+            return
+        for linha in arquivo:
+            # Linhas em branco são ignoradas
+            if linha.strip():
+                yield json.loads(linha)
+
+
+def _campo(registro: Dict[str, Any], *nomes: str) -> str:
+    """Devolve como texto o primeiro campo presente entre os nomes aceitos."""
+
+    for nome in nomes:
+        if registro.get(nome) is not None:
+            return str(registro[nome])
+    return ""
+
+
+def importar_livros(
+    lista_livros: List[Any], registros: Iterable[Dict[str, Any]]
+) -> ResumoImportacao:
+    """Valida e inclui os livros na lista, somando exemplares de títulos iguais."""
+
+    resumo = ResumoImportacao()
+    inicio = time.perf_counter()
+
+    # Índice dos títulos já presentes (no acervo e no próprio lote)
+    por_titulo = {}
+    for livro in lista_livros:
+        por_titulo.setdefault(livro["título"].lower(), livro)
+
+    for linha, registro in enumerate(registros, start=1):
+        try:
+            livro = montar_livro(
+                _campo(registro, "título", "titulo"),
+                _campo(registro, "autor"),
+                _campo(registro, "ano"),
+                _campo(registro, "exemplares"),
+            )
+        except ValueError as erro:
+            resumo.recusar(linha, str(erro))
+            continue
+
+        existente = por_titulo.get(livro["título"].lower())
+        if existente is not None:
+            # Título repetido: só soma os exemplares
+            existente["exemplares"] += livro["exemplares"]
+            resumo.mesclados += 1
+        else:
+            lista_livros.append(livro)
+            por_titulo[livro["título"].lower()] = livro
+            resumo.incluidos += 1
+
+    resumo.segundos = time.perf_counter() - inicio
+    return resumo
+
+
+def importar_usuarios(
+    lista_usuarios: List[Any], registros: Iterable[Dict[str, Any]]
+) -> ResumoImportacao:
+    """Valida e inclui os usuários na lista, recusando CPFs repetidos."""
+
+    resumo = ResumoImportacao()
+    inicio = time.perf_counter()
+
+    # CPFs já presentes (no cadastro e no próprio lote)
+    cpfs = {usuario["cpf"] for usuario in lista_usuarios}
+
+    for linha, registro in enumerate(registros, start=1):
+        try:
+            usuario = montar_usuario(
+                _campo(registro, "nome"), _campo(registro, "cpf")
+            )
+        except ValueError as erro:
+            resumo.recusar(linha, str(erro))
+            continue
+
+        if usuario["cpf"] in cpfs:
+            resumo.recusar(
+                linha, "CPF já cadastrado! Cada usuário deve ter um CPF único."
+            )
+            continue
+        lista_usuarios.append(usuario)
+        cpfs.add(usuario["cpf"])
+        resumo.incluidos += 1
+
+    resumo.segundos = time.perf_counter() - inicio
+    return resumo
+
+
+def main(argumentos: Optional[List[str]] = None) -> None:
+    """Importa livros ou usuários de um arquivo e grava tudo de uma vez."""
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("colecao", choices=("livros", "usuarios"))
+    parser.add_argument("arquivo", help="arquivo CSV ou JSON Lines")
+    parser.add_argument("--formato", choices=("csv", "jsonl"))
+    parser.add_argument(
+        "--armazenamento",
+        choices=("diario", "json", "sqlite", "binario"),
+        default="diario",
+    )
+    parser.add_argument("--banco", default="biblioteca.db")
+    opcoes = parser.parse_args(argumentos)
+
+    if not os.path.exists(opcoes.arquivo):
+        parser.error(f"arquivo não encontrado: {opcoes.arquivo}")
+
+    armazenamento = criar_armazenamento(opcoes.armazenamento, opcoes.banco)
+    try:
+        if opcoes.colecao == "livros":
+            caminho_colecao, importar = ARQUIVO_LIVROS, importar_livros
+        else:
+            caminho_colecao, importar = ARQUIVO_USUARIOS, importar_usuarios
+
+        # Da leitura até a gravação, terminais abertos esperam: o que
+        # anotassem no diário nesse meio tempo se perderia com o retrato novo
+        # (e o que anotaram antes já vem na leitura, junto com o retrato)
+        with armazenamento.travar(caminho_colecao):
+            # Com a coleção corrompida, para: gravar só o importado apagaria
+            # os registros que já existiam
+            try:
+                dados = list(armazenamento.iterar(caminho_colecao))
+            except ValueError as erro:
+                parser.exit(
+                    1,
+                    f" {caminho_colecao} está corrompido ({erro}); "
+                    "nada foi importado.\n",
+                )
+            resumo = importar(dados, ler_registros(opcoes.arquivo, opcoes.formato))
+
+            # Uma única gravação para o lote inteiro
+            inicio = time.perf_counter()
+            armazenamento.salvar(dados, caminho_colecao)
+            resumo.segundos += time.perf_counter() - inicio
+    finally:
+        armazenamento.fechar()
+
+    for erro in resumo.erros:
+        print(f" {erro}")
+    print(
+        f" {resumo.lidos} registros lidos: {resumo.incluidos} incluídos, "
+        f"{resumo.mesclados} mesclados, {resumo.recusados} recusados."
+    )
+    print(
+        f" Tempo: {resumo.segundos:.2f} s "
+        f"({resumo.registros_por_segundo:,.0f} registros por segundo)."
+    )
+
+
+if __name__ == "__main__":
+    main()
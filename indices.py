@@ -0,0 +1,557 @@
+"""Listas de registros que mantêm índices auxiliares sempre sincronizados."""
+
+import heapq
+from array import array
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+
+class ListaIndexada(list):
+    """Lista comum que avisa as subclasses sempre que o conteúdo muda.
+
+    As subclasses implementam ``_indexar`` (chamado para cada registro novo no
+    fim da lista) e ``_limpar_indices``. Operações que reordenam registros
+    reconstroem os índices do zero, pois são raras no sistema. Remoções
+    também, a menos que a subclasse saiba tirar um registro dos seus índices
+    (``_desindexar``): elas chegam a cada sincronização com outro terminal.
+
+    Se um ``diario`` (veja ``persistencia.Diario``) for associado à lista,
+    inclusões, remoções e alterações são anotadas nele; operações que mudam
+    posições sem equivalente no diário gravam o retrato completo.
+
+    ``TIPO_REGISTRO`` é o tipo (veja ``registros``) em que os dicionários
+    lidos do armazenamento são convertidos na carga. As subclasses gravadas
+    com diário também oferecem ``localizar``, que acha pelos índices o
+    registro com a chave de uma linha do diário (veja
+    ``persistencia.aplicar_alteracoes``).
+
+    ``ORDENACOES`` liga o nome de cada ordem de listagem à função que tira
+    do registro a chave dessa ordem (veja ``ordenados``).
+    """
+
+    TIPO_REGISTRO: Optional[type] = None
+    ORDENACOES: Dict[str, Callable[[Any], Any]] = {}
+
+    def __init__(self, registros: Iterable[Any] = ()) -> None:
+        super().__init__()
+        # Só anota no diário o que acontecer depois da carga inicial
+        self.diario = None
+        # Começa com os índices vazios e adiciona os registros um por um
+        self._limpar_todos_indices()
+        self.extend(registros)
+
+    def _indexar(self, registro: Any) -> None:
+        """Adiciona um registro recém-inserido no fim da lista aos índices."""
+
+        raise NotImplementedError
+
+    def _limpar_indices(self) -> None:
+        """Esvazia todos os índices da lista."""
+
+        raise NotImplementedError
+
+    def _limpar_todos_indices(self) -> None:
+        """Esvazia os índices da subclasse e as ordenações prontas."""
+
+        self._limpar_indices()
+        self._ordenacoes = {
+            nome: IndiceOrdenado(chave) for nome, chave in self.ORDENACOES.items()
+        }
+
+    def _desindexar(self, registro: Any, posicao: int) -> None:
+        """Tira dos índices um registro que saiu da posição informada.
+
+        Por padrão, reconstrói os índices do zero.
+        """
+
+        self._reindexar()
+
+    def _posicao(self, registro: Any) -> int:
+        """Devolve a posição do primeiro registro igual ao informado."""
+
+        return self.index(registro)
+
+    def _reindexar(self) -> None:
+        """Reconstrói os índices a partir do conteúdo atual da lista."""
+
+        self._limpar_todos_indices()
+        for registro in self:
+            self._indexar(registro)
+
+    def ordenados(
+        self,
+        ordem: str,
+        inicio: int = 0,
+        quantidade: Optional[int] = None,
+        decrescente: bool = False,
+    ) -> List[Any]:
+        """Devolve uma página dos registros na ordem pedida.
+
+        A ordem é montada na primeira consulta e depois só recebe os
+        registros novos; remoções e reordenações a descartam.
+        """
+
+        try:
+            indice = self._ordenacoes[ordem]
+        except KeyError:
+            raise ValueError(f"Ordenação desconhecida: {ordem}") from None
+        if not indice.pronto:
+            indice.construir(self)
+        return indice.fatia(inicio, quantidade, decrescente)
+
+    def registrar_alteracao(self, registro: Any) -> None:
+        """Avisa que um registro da lista foi alterado no lugar."""
+
+        self.reindexar_registro(registro)
+        self._anotar("atualizar", registro)
+
+    def reindexar_registro(self, registro: Any) -> None:
+        """Atualiza os índices de um registro alterado no lugar.
+
+        Os índices das subclasses usam campos que não mudam, então por
+        padrão não há nada a fazer.
+        """
+
+    def _anotar(self, operacao: str, registro: Any) -> None:
+        """Anota uma operação no diário, se houver um associado."""
+
+        if self.diario is not None:
+            self.diario.anotar(operacao, registro, self)
+
+    def _gravar_retrato(self) -> None:
+        """Grava a lista inteira quando a mudança não cabe no diário."""
+
+        if self.diario is not None:
+            self.diario.compactar(self)
+
+    def append(self, registro: Any) -> None:
+        super().append(registro)
+        self._indexar(registro)
+        for indice in self._ordenacoes.values():
+            indice.adicionar(registro)
+        self._anotar("adicionar", registro)
+
+    def extend(self, registros: Iterable[Any]) -> None:
+        for registro in registros:
+            self.append(registro)
+
+    def __iadd__(self, registros: Iterable[Any]) -> "ListaIndexada":
+        self.extend(registros)
+        return self
+
+    def insert(self, posicao: int, registro: Any) -> None:
+        super().insert(posicao, registro)
+        self._reindexar()
+        self._gravar_retrato()
+
+    def remove(self, registro: Any) -> None:
+        self.pop(self._posicao(registro))
+
+    def pop(self, posicao: int = -1) -> Any:
+        if posicao < 0:
+            posicao += len(self)
+        registro = super().pop(posicao)
+        for indice in self._ordenacoes.values():
+            indice.remover(registro)
+        self._desindexar(registro, posicao)
+        self._anotar("remover", registro)
+        return registro
+
+    def clear(self) -> None:
+        super().clear()
+        self._limpar_todos_indices()
+        self._gravar_retrato()
+
+    def sort(self, *args: Any, **kwargs: Any) -> None:
+        super().sort(*args, **kwargs)
+        self._reindexar()
+        self._gravar_retrato()
+
+    def reverse(self) -> None:
+        super().reverse()
+        self._reindexar()
+        self._gravar_retrato()
+
+    def __setitem__(self, posicao: Any, valor: Any) -> None:
+        super().__setitem__(posicao, valor)
+        self._reindexar()
+        self._gravar_retrato()
+
+    def __delitem__(self, posicao: Any) -> None:
+        super().__delitem__(posicao)
+        self._reindexar()
+        self._gravar_retrato()
+
+
+class IndiceOrdenado:
+    """Registros ordenados por uma chave, prontos para listar em páginas.
+
+    Só é montado na primeira consulta (a carga não paga por ordens que
+    ninguém pede). Depois disso, inclusões ficam numa fila e remoções num
+    contador; a consulta seguinte junta tudo de uma vez. Como a parte já
+    ordenada e a fila formam duas sequências, o ``sort`` do Python as
+    intercala em tempo quase linear, sem reordenar tudo do zero.
+    """
+
+    def __init__(self, chave: Callable[[Any], Any]) -> None:
+        self._chave = chave
+        # (chave, número de chegada, registro); o número desempata pela ordem
+        # de inclusão e evita comparar registros
+        self._ordem: Optional[List[Tuple[Any, int, Any]]] = None
+        self._novos: List[Tuple[Any, int, Any]] = []
+        # id do registro -> quantas entradas dele ainda precisam sair
+        self._removidos: Dict[int, int] = {}
+        self._chegadas = 0
+
+    @property
+    def pronto(self) -> bool:
+        """Diz se a ordem já foi montada e está sendo mantida."""
+
+        return self._ordem is not None
+
+    def construir(self, registros: Iterable[Any]) -> None:
+        """Monta a ordem a partir de todos os registros atuais."""
+
+        self._ordem = []
+        self._novos = []
+        self._removidos = {}
+        for registro in registros:
+            self.adicionar(registro)
+
+    def adicionar(self, registro: Any) -> None:
+        """Inclui um registro novo (se a ordem já estiver montada)."""
+
+        if self._ordem is not None:
+            self._novos.append((self._chave(registro), self._chegadas, registro))
+            self._chegadas += 1
+
+    def remover(self, registro: Any) -> None:
+        """Tira um registro (se a ordem já estiver montada)."""
+
+        if self._ordem is not None:
+            chave = id(registro)
+            self._removidos[chave] = self._removidos.get(chave, 0) + 1
+
+    def fatia(
+        self,
+        inicio: int = 0,
+        quantidade: Optional[int] = None,
+        decrescente: bool = False,
+    ) -> List[Any]:
+        """Devolve os registros de uma página da ordem (já montada)."""
+
+        ordem = self._atualizar()
+        total = len(ordem)
+        inicio = min(inicio, total)
+        fim = total if quantidade is None else min(total, inicio + quantidade)
+        if decrescente:
+            # A página do fim para o começo, sem inverter a lista inteira
+            entradas = ordem[total - fim : total - inicio][::-1]
+        else:
+            entradas = ordem[inicio:fim]
+        return [registro for _, _, registro in entradas]
+
+    def _atualizar(self) -> List[Tuple[Any, int, Any]]:
+        """Junta as inclusões e remoções pendentes na ordem."""
+
+        ordem = self._ordem
+        if not self._novos and not self._removidos:
+            return ordem
+        ordem.extend(self._novos)
+        self._novos = []
+        if self._removidos:
+            ordem = self._ordem = self._sem_removidos(ordem)
+        # Quase sempre são duas sequências já ordenadas: o sort só as intercala.
+        # O número de chegada nunca se repete, então registros não são comparados
+        ordem.sort()
+        return ordem
+
+    def _sem_removidos(
+        self, ordem: List[Tuple[Any, int, Any]]
+    ) -> List[Tuple[Any, int, Any]]:
+        """Filtra as entradas removidas, das mais antigas para as mais novas.
+
+        As entradas de um mesmo registro têm a mesma chave, então na parte
+        já ordenada (e na fila, que vem depois) a mais antiga aparece antes.
+        """
+
+        removidos = self._removidos
+        restantes = []
+        for entrada in ordem:
+            chave = id(entrada[2])
+            if chave in removidos:
+                removidos[chave] -= 1
+                if not removidos[chave]:
+                    del removidos[chave]
+            else:
+                restantes.append(entrada)
+        return restantes
+
+
+class FilaPrioridade:
+    """Heap mínimo de registros pela chave, com remoção preguiçosa.
+
+    Remover só conta a entrada como morta (quem é dono da fila diz, por
+    ``ativo``, se um registro ainda vale); as mortas saem quando chegam ao
+    topo ou quando passam da metade do heap, que então é refeito. Assim o
+    primeiro registro sai em O(1) e os k menores que um limite em
+    O(k log k), sem percorrer a coleção.
+    """
+
+    # Abaixo disso não compensa refazer o heap
+    MINIMO_COMPACTACAO = 64
+
+    def __init__(
+        self, chave: Callable[[Any], Any], ativo: Callable[[Any], bool]
+    ) -> None:
+        self._chave = chave
+        self._ativo = ativo
+        # (chave, número de chegada, registro); o número desempata e evita
+        # comparar registros
+        self._heap: List[Tuple[Any, int, Any]] = []
+        self._chegadas = 0
+        self._mortas = 0
+
+    def adicionar(self, registro: Any) -> None:
+        """Inclui um registro na fila."""
+
+        heapq.heappush(self._heap, (self._chave(registro), self._chegadas, registro))
+        self._chegadas += 1
+
+    def remover(self, registro: Any) -> None:
+        """Marca que um registro saiu (``ativo`` já deve dizer que não vale)."""
+
+        self._mortas += 1
+        mortas = self._mortas
+        if mortas > self.MINIMO_COMPACTACAO and mortas * 2 > len(self._heap):
+            self._heap = [entrada for entrada in self._heap if self._ativo(entrada[2])]
+            heapq.heapify(self._heap)
+            self._mortas = 0
+
+    def limpar(self) -> None:
+        """Esvazia a fila."""
+
+        self._heap = []
+        self._mortas = 0
+
+    def primeiro(self) -> Optional[Any]:
+        """Devolve o registro de menor chave, se houver."""
+
+        heap = self._heap
+        # Descarta as entradas mortas que chegaram ao topo
+        while heap and not self._ativo(heap[0][2]):
+            heapq.heappop(heap)
+            self._mortas -= 1
+        return heap[0][2] if heap else None
+
+    def antes_de(self, limite: Any) -> List[Any]:
+        """Devolve, em ordem, os registros com chave menor que o limite.
+
+        Percorre o heap sem alterá-lo: uma segunda fila guarda as posições
+        candidatas, e os filhos de uma posição só entram nela quando a
+        posição é visitada (no heap, filhos nunca têm chave menor).
+        """
+
+        heap = self._heap
+        resultado = []
+        candidatas = [(heap[0], 0)] if heap else []
+        while candidatas:
+            entrada, posicao = heapq.heappop(candidatas)
+            if not entrada[0] < limite:
+                break
+            if self._ativo(entrada[2]):
+                resultado.append(entrada[2])
+            for filho in (2 * posicao + 1, 2 * posicao + 2):
+                if filho < len(heap):
+                    heapq.heappush(candidatas, (heap[filho], filho))
+        return resultado
+
+
+class MaisFrequentes:
+    """Os ``quantidade`` itens de maior contagem, atualizados a cada aumento.
+
+    Um heap mínimo guarda os que estão no topo, com o menor deles na raiz:
+    um item de fora só entra quando passa desse menor. Como as contagens
+    nunca diminuem, isso basta para o topo ser exato. Entradas antigas de
+    um item que aumentou ficam no heap até chegarem à raiz (ou até o heap
+    ficar com o dobro do tamanho, quando é refeito).
+    """
+
+    def __init__(self, quantidade: int) -> None:
+        self.quantidade = quantidade
+        # Item -> contagem, só dos que estão no topo
+        self._topo: Dict[Any, int] = {}
+        # (contagem, item); vale só se a contagem ainda é a do item no topo
+        self._heap: List[Tuple[int, Any]] = []
+
+    def atualizar(self, item: Any, contagem: int) -> None:
+        """Informa a contagem atual de um item (nunca menor que a anterior)."""
+
+        topo = self._topo
+        if item in topo or len(topo) < self.quantidade:
+            topo[item] = contagem
+            heapq.heappush(self._heap, (contagem, item))
+            if len(self._heap) > 2 * self.quantidade:
+                self._heap = [(valor, chave) for chave, valor in topo.items()]
+                heapq.heapify(self._heap)
+            return
+
+        menor, menor_item = self._menor()
+        if contagem > menor:
+            # O novo item toma o lugar do menor do topo
+            heapq.heapreplace(self._heap, (contagem, item))
+            del topo[menor_item]
+            topo[item] = contagem
+
+    def limpar(self) -> None:
+        """Esvazia o topo."""
+
+        self._topo = {}
+        self._heap = []
+
+    def itens(self) -> List[Tuple[Any, int]]:
+        """Devolve os pares (item, contagem) do topo, da maior contagem à menor."""
+
+        return sorted(self._topo.items(), key=lambda par: (-par[1], par[0]))
+
+    def _menor(self) -> Tuple[int, Any]:
+        # Descarta as entradas antigas que chegaram à raiz
+        heap = self._heap
+        while self._topo.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0]
+
+
+class IndiceSubstring:
+    """Índice invertido de trigramas para busca de trechos dentro de textos.
+
+    Cada texto recebe uma posição sequencial e cada trigrama aponta para as
+    posições dos textos que o contêm. Na busca, o trigrama mais raro do termo
+    seleciona os candidatos, que depois são confirmados com o operador ``in``
+    para manter exatamente a semântica de substring. Termos com menos de três
+    caracteres são resolvidos direto na lista de textos já normalizados.
+    """
+
+    TAMANHO = 3
+    # Na busca aproximada, trigramas presentes em mais textos que isto (ou
+    # que um décimo do índice, se for maior) quase não distinguem os textos
+    # e são ignorados, a menos que o termo só tenha trigramas comuns
+    LIMITE_POSTAGEM = 5000
+    # Textos com mais trigramas em comum que têm a similaridade calculada
+    CANDIDATOS_PARECIDOS = 50
+
+    def __init__(self) -> None:
+        # Textos já normalizados, na ordem em que foram adicionados
+        self._textos: List[str] = []
+        # trigrama -> posições (em ordem crescente) dos textos que o contêm
+        self._postagens: Dict[str, array] = _Postagens()
+        # Quantos textos foram removidos (as posições deles ficam vazias)
+        self._removidos = 0
+
+    def __len__(self) -> int:
+        return len(self._textos)
+
+    def adicionar(self, texto: str) -> None:
+        """Indexa um texto normalizado na próxima posição livre."""
+
+        posicao = len(self._textos)
+        self._textos.append(texto)
+        postagens = self._postagens
+        # Cada trigrama distinto do texto recebe a posição uma única vez
+        for ngrama in _trigramas(texto):
+            postagens[ngrama].append(posicao)
+
+    def remover(self, posicao: int) -> None:
+        """Tira o texto da posição das buscas, sem mudar as demais posições.
+
+        O texto vira vazio: não contém nenhum termo e não parece com nenhum.
+        As postagens antigas continuam apontando para a posição e são
+        descartadas na confirmação de cada busca.
+        """
+
+        if self._textos[posicao]:
+            self._textos[posicao] = ""
+            self._removidos += 1
+
+    def buscar(self, termo: str) -> List[int]:
+        """Devolve, em ordem crescente, as posições cujo texto contém o termo."""
+
+        if not termo:
+            return []
+
+        textos = self._textos
+        # Termos curtos não têm trigramas: compara direto nos textos normalizados
+        if len(termo) < self.TAMANHO:
+            return [posicao for posicao, texto in enumerate(textos) if termo in texto]
+
+        # Escolhe o trigrama do termo com menos ocorrências
+        menor = None
+        for inicio in range(len(termo) - 2):
+            postagem = self._postagens.get(termo[inicio : inicio + 3])
+            # Se algum trigrama não existe, nenhum texto contém o termo
+            if postagem is None:
+                return []
+            if menor is None or len(postagem) < len(menor):
+                menor = postagem
+
+        # Se o termo é o próprio trigrama (e nada foi removido), o resultado
+        # já está pronto
+        if len(termo) == self.TAMANHO and not self._removidos:
+            return list(menor)
+        # Confirma cada candidato com a comparação de substring original
+        return [posicao for posicao in menor if termo in textos[posicao]]
+
+    def parecidos(
+        self, texto: str, quantidade: int = 3, similaridade_minima: float = 0.3
+    ) -> List[int]:
+        """Devolve as posições dos textos mais parecidos com o informado.
+
+        Serve para sugerir o que o usuário quis digitar: os textos que
+        dividem mais trigramas com o termo viram candidatos e são
+        ordenados pelo coeficiente de Dice dos trigramas (do mais parecido
+        para o menos), descartando os abaixo da similaridade mínima.
+        """
+
+        trigramas = _trigramas(texto)
+        if not trigramas:
+            return []
+
+        # Conta, para cada texto, quantos trigramas do termo ele tem,
+        # usando só as postagens raras o bastante para diferenciar textos
+        existentes = self._postagens
+        postagens = sorted(
+            (existentes[ngrama] for ngrama in trigramas if ngrama in existentes),
+            key=len,
+        )
+        if not postagens:
+            return []
+        limite = max(self.LIMITE_POSTAGEM, len(self._textos) // 10)
+        raras = [postagem for postagem in postagens if len(postagem) <= limite]
+        contagem: Counter = Counter()
+        for postagem in raras or postagens[:1]:
+            contagem.update(postagem)
+
+        # Só os melhores candidatos têm a similaridade calculada
+        pontuados = []
+        for posicao, _ in contagem.most_common(self.CANDIDATOS_PARECIDOS):
+            do_texto = _trigramas(self._textos[posicao])
+            comuns = len(trigramas & do_texto)
+            similaridade = 2 * comuns / (len(trigramas) + len(do_texto))
+            if similaridade >= similaridade_minima:
+                pontuados.append((-similaridade, posicao))
+        pontuados.sort()
+        return [posicao for _, posicao in pontuados[:quantidade]]
+
+
+def _trigramas(texto: str) -> Set[str]:
+    """Devolve o conjunto de trigramas distintos de um texto."""
+
+    return {texto[inicio : inicio + 3] for inicio in range(len(texto) - 2)}
+
+
+class _Postagens(dict):
+    """Dicionário de postagens que cria a lista de posições na primeira vez."""
+
+    def __missing__(self, ngrama: str) -> array:
+        postagem = self[ngrama] = array("I")
+        return postagem
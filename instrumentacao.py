@@ -0,0 +1,245 @@
+"""Instrumentação opcional: contagens, latências e bytes lidos e gravados.
+
+Fica desligada por padrão. As funções medidas são marcadas com
+``@medido("nome")`` e, enquanto nada foi ativado, cada chamada custa só a
+consulta de uma variável global. Com ``ativar()`` (opção ``--instrumentar``
+de ``main.py``), cada operação passa a somar chamadas e um histograma de
+latências, e a persistência soma os bytes lidos e gravados por arquivo;
+``relatorio()`` resume tudo em linhas de texto.
+
+``perfilar`` grava, para uma sessão inteira, o perfil do ``cProfile`` e as
+linhas que mais alocaram memória segundo o ``tracemalloc``.
+"""
+
+import cProfile
+import functools
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+# Limites superiores (em milissegundos) das faixas do histograma de latências
+LIMITES_LATENCIA_MS = (
+    0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000
+)
+# Funções mostradas no perfil e linhas mostradas no relatório de memória
+LINHAS_PERFIL = 40
+LINHAS_MEMORIA = 25
+
+Funcao = TypeVar("Funcao", bound=Callable[..., Any])
+
+
+class Histograma:
+    """Latências de uma operação, contadas em faixas fixas de tempo."""
+
+    def __init__(self) -> None:
+        # Uma faixa a mais para o que passar do último limite
+        self.contagens = [0] * (len(LIMITES_LATENCIA_MS) + 1)
+        self.chamadas = 0
+        self.total = 0.0
+        self.maximo = 0.0
+
+    def registrar(self, milissegundos: float) -> None:
+        """Soma uma chamada que levou o tempo informado."""
+
+        self.contagens[bisect_left(LIMITES_LATENCIA_MS, milissegundos)] += 1
+        self.chamadas += 1
+        self.total += milissegundos
+        if milissegundos > self.maximo:
+            self.maximo = milissegundos
+
+    def percentil(self, fracao: float) -> float:
+        """Estima o percentil (0 a 1) pelo limite da faixa onde ele cai."""
+
+        alvo = fracao * self.chamadas
+        acumulado = 0
+        for faixa, contagem in enumerate(self.contagens):
+            acumulado += contagem
+            if contagem and acumulado >= alvo:
+                if faixa == len(LIMITES_LATENCIA_MS):
+                    return self.maximo
+                # O limite da faixa nunca passa do maior tempo visto
+                return min(LIMITES_LATENCIA_MS[faixa], self.maximo)
+        return 0.0
+
+
+class Metricas:
+    """Contagens, histogramas de latência e bytes de E/S de uma sessão."""
+
+    def __init__(self) -> None:
+        self.latencias: Dict[str, Histograma] = {}
+        self.eventos: Counter = Counter()
+        self.bytes_lidos: Counter = Counter()
+        self.bytes_gravados: Counter = Counter()
+        # O servidor e a carga em segundo plano registram de outras threads
+        self._trava = threading.Lock()
+
+    def registrar(self, nome: str, segundos: float) -> None:
+        """Soma uma chamada da operação ao histograma dela."""
+
+        with self._trava:
+            histograma = self.latencias.get(nome)
+            if histograma is None:
+                histograma = self.latencias[nome] = Histograma()
+            histograma.registrar(segundos * 1000)
+
+    def contar(self, nome: str) -> None:
+        """Soma uma ocorrência de um evento sem tempo (uma opção do menu)."""
+
+        with self._trava:
+            self.eventos[nome] += 1
+
+    def contar_bytes(self, arquivo: str, lidos: int = 0, gravados: int = 0) -> None:
+        """Soma os bytes lidos e gravados num arquivo."""
+
+        with self._trava:
+            if lidos:
+                self.bytes_lidos[arquivo] += lidos
+            if gravados:
+                self.bytes_gravados[arquivo] += gravados
+
+    def relatorio(self) -> List[str]:
+        """Resume as métricas em linhas de texto, as operações mais lentas antes."""
+
+        with self._trava:
+            linhas = ["=== Relatório de desempenho ===\n"]
+            if self.eventos:
+                linhas.append("Opções do menu:\n")
+                for nome, quantidade in sorted(self.eventos.items()):
+                    linhas.append(f"  {nome:<40}{quantidade:>10}\n")
+            if self.latencias:
+                linhas.append(
+                    f"{'Operação':<40}{'Chamadas':>10}{'Média ms':>10}"
+                    f"{'p50':>9}{'p95':>9}{'p99':>9}{'Máx':>10}\n"
+                )
+                por_tempo = sorted(
+                    self.latencias.items(), key=lambda item: item[1].total, reverse=True
+                )
+                for nome, histograma in por_tempo:
+                    media = histograma.total / histograma.chamadas
+                    linhas.append(
+                        f"{nome:<40}{histograma.chamadas:>10}{media:>10.3f}"
+                        f"{histograma.percentil(0.5):>9.2f}"
+                        f"{histograma.percentil(0.95):>9.2f}"
+                        f"{histograma.percentil(0.99):>9.2f}"
+                        f"{histograma.maximo:>10.2f}\n"
+                    )
+            arquivos = sorted(set(self.bytes_lidos) | set(self.bytes_gravados))
+            if arquivos:
+                linhas.append(f"{'Arquivo':<40}{'Lidos':>14}{'Gravados':>14}\n")
+                for arquivo in arquivos:
+                    linhas.append(
+                        f"{arquivo:<40}{self.bytes_lidos[arquivo]:>14}"
+                        f"{self.bytes_gravados[arquivo]:>14}\n"
+                    )
+            if len(linhas) == 1:
+                linhas.append(" Nenhuma operação medida ainda.\n")
+            return linhas
+
+
+# Métricas da sessão; None enquanto a instrumentação estiver desligada
+_metricas: Optional[Metricas] = None
+
+
+def ativar() -> Metricas:
+    """Liga a instrumentação (mantendo as métricas, se já estiver ligada)."""
+
+    global _metricas
+    if _metricas is None:
+        _metricas = Metricas()
+    return _metricas
+
+
+def desativar() -> Optional[Metricas]:
+    """Desliga a instrumentação e devolve as métricas juntadas até aqui."""
+
+    global _metricas
+    metricas, _metricas = _metricas, None
+    return metricas
+
+
+def metricas_ativas() -> Optional[Metricas]:
+    """Devolve as métricas em andamento, ou None se estiver desligada."""
+
+    return _metricas
+
+
+def medido(nome: str) -> Callable[[Funcao], Funcao]:
+    """Decorador que mede cada chamada da função sob o nome informado."""
+
+    def decorar(funcao: Funcao) -> Funcao:
+        @functools.wraps(funcao)
+        def medida(*args: Any, **kwargs: Any) -> Any:
+            metricas = _metricas
+            # Desligada: só repassa a chamada
+            if metricas is None:
+                return funcao(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                metricas.registrar(nome, time.perf_counter() - inicio)
+
+        return medida  # type: ignore[return-value]
+
+    return decorar
+
+
+def contar(nome: str) -> None:
+    """Soma uma ocorrência do evento, se a instrumentação estiver ligada."""
+
+    if _metricas is not None:
+        _metricas.contar(nome)
+
+
+def contar_bytes(arquivo: str, lidos: int = 0, gravados: int = 0) -> None:
+    """Soma bytes de E/S do arquivo, se a instrumentação estiver ligada."""
+
+    if _metricas is not None:
+        _metricas.contar_bytes(arquivo, lidos, gravados)
+
+
+def relatorio() -> List[str]:
+    """Linhas do relatório de desempenho (ou um aviso, se estiver desligada)."""
+
+    if _metricas is None:
+        return [" Instrumentação desligada; use --instrumentar para medir.\n"]
+    return _metricas.relatorio()
+
+
+@contextmanager
+def perfilar(prefixo: str) -> Iterator[None]:
+    """Perfila o bloco com ``cProfile`` e ``tracemalloc`` e grava os resultados.
+
+    Gera ``<prefixo>.prof`` (para ``pstats`` ou visualizadores),
+    ``<prefixo>.perfil.txt`` (funções por tempo acumulado) e
+    ``<prefixo>.memoria.txt`` (linhas que mais alocaram memória).
+    """
+
+    perfil = cProfile.Profile()
+    tracemalloc.start()
+    perfil.enable()
+    try:
+        yield
+    finally:
+        perfil.disable()
+        retrato = tracemalloc.take_snapshot()
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        perfil.dump_stats(prefixo + ".prof")
+        texto = io.StringIO()
+        estatisticas = pstats.Stats(perfil, stream=texto)
+        estatisticas.sort_stats("cumulative").print_stats(LINHAS_PERFIL)
+        with open(prefixo + ".perfil.txt", "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto.getvalue())
+
+        with open(prefixo + ".memoria.txt", "w", encoding="utf-8") as arquivo:
+            arquivo.write(f"Pico de memória rastreada: {pico} bytes\n")
+            for estatistica in retrato.statistics("lineno")[:LINHAS_MEMORIA]:
+                arquivo.write(f"{estatistica}\n")
@@ -1,126 +1,383 @@
 """Operações relacionadas aos livros cadastrados."""
 
-from typing import Dict, List, Optional
+import threading
+from bisect import bisect_left, bisect_right, insort
+from itertools import chain
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+from indices import IndiceSubstring, ListaIndexada
+from instrumentacao import medido
+from normalizacao import normalizar
+from paginacao import escrever_linhas, pagina
+from registros import Livro
+from resultados import Resultado
 
-def cadastrar_livro() -> Optional[Dict[str, int | str]]:
+
+# Conferir e tirar um exemplar precisa ser uma coisa só: sem trava, duas
+# threads podiam ver o último exemplar disponível e as duas emprestarem.
+# Cada título usa uma entre várias travas, escolhida pelo hash do título,
+# então empréstimos de livros diferentes quase nunca esperam uns pelos outros
+QUANTIDADE_TRAVAS_ESTOQUE = 64
+_travas_estoque = [threading.Lock() for _ in range(QUANTIDADE_TRAVAS_ESTOQUE)]
+
+
+def _chave_titulo(titulo: str) -> str:
+    """Normaliza um título para comparação sem diferenciar maiúsculas."""
+
+    return titulo.lower()
+
+
+def trava_do_titulo(titulo: str) -> threading.Lock:
+    """Devolve a trava que protege o estoque do título informado."""
+
+    return _travas_estoque[hash(_chave_titulo(titulo)) % QUANTIDADE_TRAVAS_ESTOQUE]
+
+
+class Acervo(ListaIndexada):
+    """Lista de livros com índices por título e por trechos de título/autor.
+
+    O índice por título resolve a busca exata em O(1) e os índices de
+    n-gramas atendem as buscas por trecho sem percorrer o acervo inteiro.
+    Os trechos são indexados já normalizados (sem acentos nem maiúsculas),
+    guardados junto com a posição de cada livro, então a busca só
+    normaliza o termo. A listagem pode sair ordenada por título, autor ou
+    ano (títulos e autores na ordem dos textos normalizados).
+
+    Um livro removido deixa um buraco na sua posição dos índices de trechos
+    (as posições dos outros não mudam); os índices só são refeitos do zero
+    quando os buracos passam da metade.
+    """
+
+    # Abaixo disso não compensa refazer os índices por causa dos buracos
+    MINIMO_REINDEXACAO = 64
+
+    TIPO_REGISTRO = Livro
+    ORDENACOES = {
+        "titulo": lambda livro: normalizar(livro["título"]),
+        "autor": lambda livro: normalizar(livro["autor"]),
+        "ano": lambda livro: livro["ano"],
+    }
+
+    def __init__(self, livros: Iterable[Dict[str, int | str]] = ()) -> None:
+        super().__init__(livros)
+
+    def _limpar_indices(self) -> None:
+        # Índice: título normalizado -> primeiro livro com esse título
+        self._por_titulo: Dict[str, Dict[str, int | str]] = {}
+        # Título normalizado -> quantos livros a mais têm esse título
+        self._repetidos: Dict[str, int] = {}
+        # Índices de trechos: as posições acompanham a ordem de inclusão
+        self._trechos_titulo = IndiceSubstring()
+        self._trechos_autor = IndiceSubstring()
+        # Livro de cada posição dos índices de trechos (None nos removidos)
+        self._indexados: List[Optional[Dict[str, int | str]]] = []
+        # Posições removidas, em ordem crescente
+        self._buracos: List[int] = []
+
+    def _indexar(self, livro: Dict[str, int | str]) -> None:
+        # Mantém o primeiro livro cadastrado, igual à busca linear
+        chave = _chave_titulo(livro["título"])
+        if self._por_titulo.setdefault(chave, livro) is not livro:
+            self._repetidos[chave] = self._repetidos.get(chave, 0) + 1
+        self._trechos_titulo.adicionar(normalizar(livro["título"]))
+        self._trechos_autor.adicionar(normalizar(livro["autor"]))
+        self._indexados.append(livro)
+
+    def _desindexar(self, livro: Dict[str, int | str], posicao: int) -> None:
+        # Muitos buracos: sai mais barato refazer os índices do zero
+        if len(self._buracos) >= max(self.MINIMO_REINDEXACAO, len(self) // 2):
+            self._reindexar()
+            return
+
+        indexada = self._posicao_indexada(posicao)
+        self._indexados[indexada] = None
+        insort(self._buracos, indexada)
+        self._trechos_titulo.remover(indexada)
+        self._trechos_autor.remover(indexada)
+
+        chave = _chave_titulo(livro["título"])
+        repetidos = self._repetidos.get(chave, 0)
+        if repetidos:
+            self._repetidos[chave] = repetidos - 1
+            if not self._repetidos[chave]:
+                del self._repetidos[chave]
+            # Saiu o primeiro com esse título: o seguinte passa a ser achado
+            if self._por_titulo[chave] is livro:
+                self._por_titulo[chave] = next(
+                    outro for outro in self if _chave_titulo(outro["título"]) == chave
+                )
+        else:
+            del self._por_titulo[chave]
+
+    def _posicao_indexada(self, posicao: int) -> int:
+        """Converte a posição na lista na posição dos índices de trechos."""
+
+        # Avança a posição pelos buracos que ficam antes dela
+        indexada = posicao
+        while True:
+            seguinte = posicao + bisect_right(self._buracos, indexada)
+            if seguinte == indexada:
+                return indexada
+            indexada = seguinte
+
+    def _posicao(self, livro: Any) -> int:
+        # Os livros iguais têm o mesmo título: o índice de trechos dá os
+        # candidatos, na ordem da lista, sem comparar o acervo inteiro
+        try:
+            termo = normalizar(livro["título"])
+        except (KeyError, TypeError):
+            termo = ""
+        indexados = self._indexados
+        for indexada in self._trechos_titulo.buscar(termo):
+            if indexados[indexada] == livro:
+                return indexada - bisect_left(self._buracos, indexada)
+        return super()._posicao(livro)
+
+    def localizar(self, livro: Dict[str, int | str]) -> Optional[Dict[str, int | str]]:
+        """Devolve o livro do acervo com o mesmo título (a chave no diário)."""
+
+        titulo = livro["título"]
+        encontrado = self._por_titulo.get(_chave_titulo(titulo))
+        if encontrado is None or encontrado["título"] == titulo:
+            return encontrado
+        # Títulos que só diferem nas maiúsculas dividem a mesma entrada
+        return next((outro for outro in self if outro["título"] == titulo), None)
+
+    def buscar_por_titulo(self, titulo: str) -> Optional[Dict[str, int | str]]:
+        """Devolve o livro com o título informado, se existir."""
+
+        return self._por_titulo.get(_chave_titulo(titulo))
+
+    def buscar_trecho_titulo(self, termo: str) -> List[Dict[str, int | str]]:
+        """Devolve os livros cujo título contém o termo já normalizado."""
+
+        indexados = self._indexados
+        return [indexados[posicao] for posicao in self._trechos_titulo.buscar(termo)]
+
+    def buscar_trecho_autor(self, termo: str) -> List[Dict[str, int | str]]:
+        """Devolve os livros cujo autor contém o termo já normalizado."""
+
+        indexados = self._indexados
+        return [indexados[posicao] for posicao in self._trechos_autor.buscar(termo)]
+
+    def titulos_parecidos(
+        self, termo: str, quantidade: int
+    ) -> List[Dict[str, int | str]]:
+        """Devolve os livros de título mais parecido com o termo normalizado."""
+
+        return [
+            self._indexados[posicao]
+            for posicao in self._trechos_titulo.parecidos(termo, quantidade)
+        ]
+
+
+def cadastrar_livro() -> Optional[Livro]:
     """Solicita dados de um livro e devolve o registro formatado."""
 
+    # Valida e formata os dados digitados
+    try:
+        livro = montar_livro(*ler_dados_livro())
+    except ValueError as erro:
+        print(f" {erro}")
+        return None
+
+    print(f" Livro '{livro['título']}' cadastrado com sucesso!\n")
+    return livro
+
+
+def ler_dados_livro() -> Tuple[str, str, str, str]:
+    """Pede pelo console título, autor, ano e exemplares de um livro."""
+
     # Pede os dados do livro pro usuário
     titulo = input("Digite o título do livro: ").strip()
     autor = input("Digite o primeiro autor do livro: ").strip()
     ano = input("Digite o ano de publicação: ").strip()
     exemplares = input("Digite o número de exemplares: ").strip()
+    return titulo, autor, ano, exemplares
+
+
+def registrar_livro(
+    lista_livros: List[Dict[str, int | str]],
+    titulo: str,
+    autor: str,
+    ano: str,
+    exemplares: str,
+) -> Resultado:
+    """Valida e inclui um livro na lista, sem usar o console."""
+
+    try:
+        livro = montar_livro(titulo, autor, ano, exemplares)
+    except ValueError as erro:
+        return Resultado(False, str(erro))
+
+    lista_livros.append(livro)
+    return Resultado(True, f"Livro '{livro['título']}' cadastrado com sucesso!", livro)
+
+
+def montar_livro(titulo: str, autor: str, ano: str, exemplares: str) -> Livro:
+    """Valida e formata os dados de um livro, sem usar o console.
+
+    Levanta ``ValueError`` com a mensagem para o usuário se algo for inválido.
+    """
+
+    ano = ano.strip()
+    exemplares = exemplares.strip()
 
     # Verifica se o ano é um número válido
     if not ano.isdigit():
-        print(" Ano inválido! Digite apenas números.")
-        return None
+        raise ValueError("Ano inválido! Digite apenas números.")
 
     # Verifica se o número de exemplares é válido
     if not exemplares.isdigit():
-        print(" Número de exemplares inválido! Digite apenas números.")
-        return None
+        raise ValueError("Número de exemplares inválido! Digite apenas números.")
 
     # Formata o título com primeiras letras maiúsculas
-    titulo_formatado = titulo.title()
+    titulo_formatado = titulo.strip().title()
     # Formata o nome do autor
     autor_formatado = " ".join(parte.capitalize() for parte in autor.split())
 
-    # Cria um dicionário com as informações do livro
-    livro = {
-        "título": titulo_formatado,
-        "autor": autor_formatado,
-        "ano": int(ano),
-        "exemplares": int(exemplares),
-    }
+    # Cria o registro com as informações do livro
+    return Livro(titulo_formatado, autor_formatado, int(ano), int(exemplares))
 
-    print(f" Livro '{titulo_formatado}' cadastrado com sucesso!\n")
-    return livro
 
+@medido("livros.listar_livros")
+def listar_livros(
+    lista_livros: List[Dict[str, int | str]],
+    inicio: int = 0,
+    quantidade: Optional[int] = None,
+    ordem: Optional[str] = None,
+    decrescente: bool = False,
+) -> None:
+    """Mostra a listagem de livros cadastrados (toda ou uma página).
 
-def listar_livros(lista_livros: List[Dict[str, int | str]]) -> None:
-    """Mostra a listagem atual de livros cadastrados."""
+    ``ordem`` pode ser ``"titulo"``, ``"autor"`` ou ``"ano"``; sem ela, os
+    livros saem na ordem de cadastro.
+    """
 
     # Se não tem nenhum livro, mostra mensagem e para
     if not lista_livros:
         print(" Nenhum livro cadastrado ainda.\n")
         return
 
-    # Mostra o cabeçalho
-    print("\n=== Lista de Livros Cadastrados ===")
-    # Percorre todos os livros e mostra as informações
-    for indice, livro in enumerate(lista_livros, start=1):
-        print(
-            f"{indice}. Título: {livro['título']} | Autor: {livro['autor']} | "
-            f"Ano: {livro['ano']} | Exemplares: {livro['exemplares']}"
+    # Pega só a página pedida e escreve as linhas em blocos, não uma a uma
+    livros = pagina(lista_livros, inicio, quantidade, ordem, decrescente)
+    escrever_linhas(
+        chain(
+            ["\n=== Lista de Livros Cadastrados ==="],
+            (
+                f"{indice}. Título: {livro['título']} | Autor: {livro['autor']} | "
+                f"Ano: {livro['ano']} | Exemplares: {livro['exemplares']}"
+                for indice, livro in enumerate(livros, start=inicio + 1)
+            ),
+            ["===================================\n"],
         )
-    print("===================================\n")
+    )
 
 
+@medido("livros.encontrar_livro_por_titulo")
 def encontrar_livro_por_titulo(
     lista_livros: List[Dict[str, int | str]], titulo: str
 ) -> Optional[Dict[str, int | str]]:
     """Procura um livro pelo título (case-insensitive)."""
 
+    # Se for um acervo indexado, a busca é direta no índice
+    if isinstance(lista_livros, Acervo):
+        return lista_livros.buscar_por_titulo(titulo)
+
     # Percorre todos os livros
+    chave = _chave_titulo(titulo)
     for livro in lista_livros:
         # Compara os títulos sem diferenciar maiúsculas/minúsculas
-        if livro["título"].lower() == titulo.lower():
+        if _chave_titulo(livro["título"]) == chave:
             return livro
     # Se não encontrar, retorna None
     return None
 
 
+@medido("livros.sugerir_titulos")
+def sugerir_titulos(
+    lista_livros: List[Dict[str, int | str]], titulo: str, quantidade: int = 3
+) -> List[str]:
+    """Sugere os títulos do acervo mais parecidos com o digitado.
+
+    Tolera erros de digitação, acentos e maiúsculas; usada quando o título
+    exato não é encontrado.
+    """
+
+    termo = normalizar(titulo.strip())
+    # Se for um acervo indexado, usa os trigramas já indexados dos títulos
+    if isinstance(lista_livros, Acervo):
+        livros = lista_livros.titulos_parecidos(termo, quantidade)
+    else:
+        # Monta um índice só para esta consulta
+        indice = IndiceSubstring()
+        for livro in lista_livros:
+            indice.adicionar(normalizar(livro["título"]))
+        posicoes = indice.parecidos(termo, quantidade)
+        livros = [lista_livros[posicao] for posicao in posicoes]
+    return [livro["título"] for livro in livros]
+
+
+@medido("livros.buscar_livros_por_titulo")
 def buscar_livros_por_titulo(
     lista_livros: List[Dict[str, int | str]], termo: str
 ) -> List[Dict[str, int | str]]:
-    """Retorna livros cujo título contém o termo informado."""
+    """Retorna livros cujo título contém o termo (sem diferenciar acentos)."""
 
-    # Arruma o termo de busca (remove espaços e deixa minúsculo)
-    termo_normalizado = termo.strip().lower()
+    # Arruma o termo de busca (remove espaços, acentos e maiúsculas)
+    termo_normalizado = normalizar(termo.strip())
     # Se o termo estiver vazio, não procura nada
     if not termo_normalizado:
         return []
 
+    # Se for um acervo indexado, usa o índice de trechos do título
+    if isinstance(lista_livros, Acervo):
+        return lista_livros.buscar_trecho_titulo(termo_normalizado)
+
     # Cria uma lista com os livros que contêm o termo no título
     return [
         livro
         for livro in lista_livros
-        if termo_normalizado in livro["título"].lower()
+        if termo_normalizado in normalizar(livro["título"])
     ]
 
 
+@medido("livros.buscar_livros_por_autor")
 def buscar_livros_por_autor(
     lista_livros: List[Dict[str, int | str]], termo: str
 ) -> List[Dict[str, int | str]]:
-    """Retorna livros cujo autor contém o termo informado."""
+    """Retorna livros cujo autor contém o termo (sem diferenciar acentos)."""
 
-    # Arruma o termo de busca (remove espaços e deixa minúsculo)
-    termo_normalizado = termo.strip().lower()
+    # Arruma o termo de busca (remove espaços, acentos e maiúsculas)
+    termo_normalizado = normalizar(termo.strip())
     # Se o termo estiver vazio, não procura nada
     if not termo_normalizado:
         return []
 
+    # Se for um acervo indexado, usa o índice de trechos do autor
+    if isinstance(lista_livros, Acervo):
+        return lista_livros.buscar_trecho_autor(termo_normalizado)
+
     # Cria uma lista com os livros que contêm o termo no nome do autor
     return [
         livro
         for livro in lista_livros
-        if termo_normalizado in livro["autor"].lower()
+        if termo_normalizado in normalizar(livro["autor"])
     ]
 
 
 def decrementar_exemplares_livro(
     titulo: str, lista_livros: List[Dict[str, int | str]]
-) -> None:
-    """Reduz em uma unidade o número de exemplares, se disponível."""
+) -> bool:
+    """Reduz em uma unidade o número de exemplares, se disponível.
+
+    Devolve se conseguiu; é seguro chamar de várias threads ao mesmo tempo.
+    """
 
     # Procura o livro pelo título
     livro = encontrar_livro_por_titulo(lista_livros, titulo)
-    # Se encontrou o livro E ele tem exemplares disponíveis
-    if livro and livro["exemplares"] > 0:
-        # Diminui 1 exemplar
-        livro["exemplares"] -= 1
+    # Se encontrou o livro, tenta tirar um exemplar dele
+    return livro is not None and retirar_exemplar(livro, lista_livros)
 
 
 def incrementar_exemplares_livro(
@@ -132,5 +389,41 @@ def incrementar_exemplares_livro(
     livro = encontrar_livro_por_titulo(lista_livros, titulo)
     # Se encontrou o livro
     if livro:
-        # Aumenta 1 exemplar
-        livro["exemplares"] += 1
\ No newline at end of file
+        repor_exemplar(livro, lista_livros)
+
+
+def retirar_exemplar(
+    livro: Dict[str, int | str], lista_livros: List[Dict[str, int | str]]
+) -> bool:
+    """Tira um exemplar de um livro já encontrado, se houver disponível."""
+
+    # Confere e diminui sem que outra thread mexa no estoque do livro no meio
+    with trava_do_titulo(livro["título"]):
+        # Se não tem exemplares disponíveis, não mexe em nada
+        if livro["exemplares"] <= 0:
+            return False
+        # Diminui 1 exemplar
+        livro["exemplares"] -= 1
+    # Anota fora da trava do estoque, que vem depois da do diário
+    _registrar_alteracao(lista_livros, livro)
+    return True
+
+
+def repor_exemplar(
+    livro: Dict[str, int | str], lista_livros: List[Dict[str, int | str]]
+) -> None:
+    """Devolve um exemplar a um livro já encontrado."""
+
+    # Aumenta 1 exemplar (com a mesma trava de quem retira)
+    with trava_do_titulo(livro["título"]):
+        livro["exemplares"] += 1
+    _registrar_alteracao(lista_livros, livro)
+
+
+def _registrar_alteracao(
+    lista_livros: List[Dict[str, int | str]], livro: Dict[str, int | str]
+) -> None:
+    """Avisa o acervo (e o diário dele, se houver) que o livro mudou."""
+
+    if isinstance(lista_livros, Acervo):
+        lista_livros.registrar_alteracao(livro)
\ No newline at end of file
@@ -1,25 +1,51 @@
 """Ponto de entrada do sistema de biblioteca usando módulos dedicados."""
 
-from typing import Dict, List
+import argparse
+import os
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
+import instrumentacao
 from emprestimos import (
-    devolver_livro,
-    emprestar_livro,
     emprestimos_por_usuario,
+    ler_dados_emprestimo,
     listar_emprestimos,
+    listar_emprestimos_atrasados,
 )
+from estatisticas import mostrar_estatisticas
+from filiais import (
+    CatalogoFederado,
+    Filial,
+    ler_filial,
+    listar_resultados_federados,
+)
+from historico import listar_historico
 from livros import (
     buscar_livros_por_autor,
     buscar_livros_por_titulo,
-    cadastrar_livro,
+    ler_dados_livro,
     listar_livros,
 )
-from persistencia import carregar_dados, salvar_dados
-from usuarios import cadastrar_usuario, listar_usuarios
+from paginacao import navegar
+from resultados import Resultado
+from servicos import Biblioteca, criar_armazenamento
+from usuarios import ler_dados_usuario, listar_usuarios
+
+
+# Escolha digitada -> (ordem da coleção, decrescente)
+Ordens = Dict[str, Tuple[str, bool]]
+ORDENS_USUARIOS: Ordens = {"1": ("nome", False)}
+ORDENS_LIVROS: Ordens = {
+    "1": ("titulo", False),
+    "2": ("autor", False),
+    "3": ("ano", False),
+}
+ORDENS_EMPRESTIMOS: Ordens = {"1": ("data", False), "2": ("data", True)}
 
-ARQUIVO_USUARIOS = "usuarios.json"
-ARQUIVO_LIVROS = "livros.json"
-ARQUIVO_EMPRESTIMOS = "emprestimos.json"
+# Opções que leem as coleções e por isso esperam a carga em segundo plano
+# (o relatório de desempenho e o histórico não dependem dela)
+OPCOES_COM_DADOS = {"1", "2", "3", "4", "5", "6", "7", "8", "9", "11", "13"}
+OPCAO_SAIR = "10"
 
 
 def exibir_menu() -> str:
@@ -37,15 +63,25 @@ def exibir_menu() -> str:
     print("8. Listar empréstimos por usuário")
     print("9. Devolver livro")
     print("10. Sair")
+    print("11. Empréstimos atrasados")
+    print("12. Relatório de desempenho")
+    print("13. Estatísticas de circulação")
+    print("14. Histórico de devoluções")
     # Pede pro usuário escolher uma opção
     return input("Escolha uma opção: ").strip()
 
 
-def consultar_livros(lista_livros: List[Dict[str, int | str]]) -> None:
-    """Permite buscar livros por título ou autor e exibe os resultados."""
+def consultar_livros(
+    lista_livros: List[Dict[str, int | str]],
+    catalogo: Optional[CatalogoFederado] = None,
+) -> None:
+    """Permite buscar livros por título ou autor e exibe os resultados.
+
+    Com um catálogo federado, a busca vale para todas as filiais.
+    """
 
     # Se não tem livros cadastrados, mostra mensagem e para
-    if not lista_livros:
+    if catalogo is None and not lista_livros:
         print(" Nenhum livro cadastrado ainda.\n")
         return
 
@@ -58,6 +94,16 @@ def consultar_livros(lista_livros: List[Dict[str, int | str]]) -> None:
     # Pede o termo que vai ser procurado
     termo_busca = input("Digite o termo de busca: ").strip()
 
+    # Com filiais, procura em todas ao mesmo tempo
+    if catalogo is not None:
+        if escolha == "1":
+            listar_resultados_federados(catalogo.buscar_por_titulo(termo_busca))
+        elif escolha == "2":
+            listar_resultados_federados(catalogo.buscar_por_autor(termo_busca))
+        else:
+            print(" Opção de busca inválida.\n")
+        return
+
     # Se escolheu buscar por título
     if escolha == "1":
         resultados = buscar_livros_por_titulo(lista_livros, termo_busca)
@@ -79,7 +125,7 @@ def consultar_livros(lista_livros: List[Dict[str, int | str]]) -> None:
 
 
 def listar_emprestimos_de_usuario(
-    lista_emprestimos: List[Dict[str, str]]
+    lista_emprestimos: Iterable[Dict[str, str]]
 ) -> None:
     """Exibe os empréstimos ativos de um CPF específico."""
 
@@ -97,67 +143,231 @@ def listar_emprestimos_de_usuario(
     listar_emprestimos(resultados)
 
 
-def main() -> None:
+def listar_em_paginas(
+    colecao: Any, listar: Callable[..., None], pergunta: str, ordens: Ordens
+) -> None:
+    """Pergunta a ordem e mostra a coleção página por página."""
+
+    # Coleção vazia: a própria listagem mostra o aviso
+    if not colecao:
+        listar(colecao)
+        return
+
+    resposta = input(pergunta).strip()
+    # Qualquer outra resposta mantém a ordem de cadastro
+    ordem, decrescente = ordens.get(resposta, (None, False))
+    navegar(
+        len(colecao),
+        lambda inicio, quantidade: listar(
+            colecao, inicio, quantidade, ordem, decrescente
+        ),
+    )
+
+
+def consultar_historico(biblioteca: Biblioteca) -> None:
+    """Pede um período e mostra, em páginas, as devoluções feitas nele."""
+
+    # Pede o período (mês ou dia) e, se quiser, um CPF
+    inicio = input("Data inicial (AAAA-MM ou AAAA-MM-DD): ").strip()
+    fim = input("Data final (AAAA-MM ou AAAA-MM-DD): ").strip()
+    cpf = input("CPF do usuário (Enter: todos): ").strip() or None
+
+    # Só os arquivos dos meses do período são lidos
+    try:
+        registros = biblioteca.historico.consultar(inicio, fim, cpf)
+    except ValueError as erro:
+        print(f" {erro}\n")
+        return
+
+    # Sem devoluções no período, a própria listagem mostra o aviso
+    if not registros:
+        listar_historico(registros)
+        return
+    navegar(
+        len(registros),
+        lambda posicao, quantidade: listar_historico(registros, posicao, quantidade),
+    )
+
+
+def mostrar_resultado(resultado: Resultado) -> None:
+    """Mostra no console a mensagem de uma operação."""
+
+    print(f" {resultado.mensagem}\n")
+
+
+def executar_opcao(
+    opcao: str, biblioteca: Biblioteca, catalogo: Optional[CatalogoFederado] = None
+) -> bool:
+    """Executa uma opção do menu e diz se o programa deve continuar.
+
+    Com um catálogo federado, a consulta de livros procura em todas as filiais.
+    """
+
+    # Opção 1: Cadastrar novo usuário
+    if opcao == "1":
+        mostrar_resultado(biblioteca.cadastrar_usuario(*ler_dados_usuario()))
+    # Opção 2: Mostrar todos os usuários
+    elif opcao == "2":
+        listar_em_paginas(
+            biblioteca.usuarios,
+            listar_usuarios,
+            "Ordenar por 1. Nome (Enter: ordem de cadastro): ",
+            ORDENS_USUARIOS,
+        )
+    # Opção 3: Cadastrar novo livro
+    elif opcao == "3":
+        mostrar_resultado(biblioteca.cadastrar_livro(*ler_dados_livro()))
+    # Opção 4: Mostrar todos os livros
+    elif opcao == "4":
+        listar_em_paginas(
+            biblioteca.livros,
+            listar_livros,
+            "Ordenar por 1. Título, 2. Autor ou 3. Ano (Enter: ordem de cadastro): ",
+            ORDENS_LIVROS,
+        )
+    # Opção 5: Fazer empréstimo
+    elif opcao == "5":
+        cpf, titulo = ler_dados_emprestimo("Digite o título do livro: ")
+        mostrar_resultado(biblioteca.emprestar(cpf, titulo))
+    # Opção 6: Consultar/buscar livros
+    elif opcao == "6":
+        consultar_livros(biblioteca.livros, catalogo)
+    # Opção 7: Mostrar todos os empréstimos
+    elif opcao == "7":
+        listar_em_paginas(
+            biblioteca.emprestimos,
+            listar_emprestimos,
+            "Ordenar por 1. Data (mais antigos) ou 2. Data (mais recentes) "
+            "(Enter: ordem dos empréstimos): ",
+            ORDENS_EMPRESTIMOS,
+        )
+    # Opção 8: Mostrar empréstimos de um usuário específico
+    elif opcao == "8":
+        listar_emprestimos_de_usuario(biblioteca.emprestimos)
+    # Opção 9: Devolver livro
+    elif opcao == "9":
+        cpf, titulo = ler_dados_emprestimo("Digite o título do livro devolvido: ")
+        mostrar_resultado(biblioteca.devolver(cpf, titulo))
+    # Opção 10: Sair do programa
+    elif opcao == "10":
+        print(" Encerrando o programa...")
+        # Salva tudo antes de sair
+        biblioteca.salvar_tudo()
+        return False
+    # Opção 11: Mostrar empréstimos com a devolução atrasada
+    elif opcao == "11":
+        listar_emprestimos_atrasados(biblioteca.emprestimos)
+    # Opção 12: Mostrar o que a instrumentação mediu até agora
+    elif opcao == "12":
+        print("".join(instrumentacao.relatorio()))
+    # Opção 13: Mostrar os mais emprestados e os totais de circulação
+    elif opcao == "13":
+        mostrar_estatisticas(biblioteca.estatisticas, biblioteca.usuarios)
+    # Opção 14: Consultar os empréstimos devolvidos num período
+    elif opcao == "14":
+        consultar_historico(biblioteca)
+    # Se digitou opção inválida
+    else:
+        print(" Opção inválida! Tente novamente.\n")
+    return True
+
+
+def main(argumentos: Optional[List[str]] = None) -> None:
     """Executa o loop principal do sistema de biblioteca."""
 
-    # Carrega os dados salvos nos arquivos JSON
-    usuarios: List[Dict[str, str]] = carregar_dados(ARQUIVO_USUARIOS)
-    livros: List[Dict[str, int | str]] = carregar_dados(ARQUIVO_LIVROS)
-    emprestimos: List[Dict[str, str]] = carregar_dados(ARQUIVO_EMPRESTIMOS)
-
-    # Loop infinito do menu
-    while True:
-        # Mostra o menu e pega a opção escolhida
-        opcao = exibir_menu()
-
-        # Opção 1: Cadastrar novo usuário
-        if opcao == "1":
-            novo_usuario = cadastrar_usuario()
-            if novo_usuario:
-                usuarios.append(novo_usuario)
-                salvar_dados(usuarios, ARQUIVO_USUARIOS)
-        # Opção 2: Mostrar todos os usuários
-        elif opcao == "2":
-            listar_usuarios(usuarios)
-        # Opção 3: Cadastrar novo livro
-        elif opcao == "3":
-            novo_livro = cadastrar_livro()
-            if novo_livro:
-                livros.append(novo_livro)
-                salvar_dados(livros, ARQUIVO_LIVROS)
-        # Opção 4: Mostrar todos os livros
-        elif opcao == "4":
-            listar_livros(livros)
-        # Opção 5: Fazer empréstimo
-        elif opcao == "5":
-            if emprestar_livro(usuarios, livros, emprestimos):
-                salvar_dados(livros, ARQUIVO_LIVROS)
-                salvar_dados(emprestimos, ARQUIVO_EMPRESTIMOS)
-        # Opção 6: Consultar/buscar livros
-        elif opcao == "6":
-            consultar_livros(livros)
-        # Opção 7: Mostrar todos os empréstimos
-        elif opcao == "7":
-            listar_emprestimos(emprestimos)
-        # Opção 8: Mostrar empréstimos de um usuário específico
-        elif opcao == "8":
-            listar_emprestimos_de_usuario(emprestimos)
-        # Opção 9: Devolver livro
-        elif opcao == "9":
-            if devolver_livro(livros, emprestimos):
-                salvar_dados(livros, ARQUIVO_LIVROS)
-                salvar_dados(emprestimos, ARQUIVO_EMPRESTIMOS)
-        # Opção 10: Sair do programa
-        elif opcao == "10":
-            print(" Encerrando o programa...")
-            # Salva tudo antes de sair
-            salvar_dados(usuarios, ARQUIVO_USUARIOS)
-            salvar_dados(livros, ARQUIVO_LIVROS)
-            salvar_dados(emprestimos, ARQUIVO_EMPRESTIMOS)
-            break
-        # Se digitou opção inválida
+    # Lê as opções da linha de comando (tipo de armazenamento)
+    parser = argparse.ArgumentParser(description="Sistema de biblioteca")
+    parser.add_argument(
+        "--armazenamento",
+        choices=("diario", "json", "sqlite", "binario"),
+        default="diario",
+        help="onde guardar os dados (padrão: JSON com diário de alterações)",
+    )
+    parser.add_argument(
+        "--banco", default="biblioteca.db", help="arquivo do banco SQLite"
+    )
+    parser.add_argument(
+        "--carga-em-segundo-plano",
+        action="store_true",
+        help="mostra o menu enquanto os dados ainda estão sendo carregados",
+    )
+    parser.add_argument(
+        "--instrumentar",
+        action="store_true",
+        help="mede chamadas, latências e bytes lidos/gravados (opção 12 do menu)",
+    )
+    parser.add_argument(
+        "--perfil",
+        metavar="PREFIXO",
+        help="grava o perfil (cProfile) e a memória (tracemalloc) da sessão",
+    )
+    parser.add_argument(
+        "--filial",
+        action="append",
+        type=ler_filial,
+        metavar="NOME=PASTA",
+        help="consulta os livros também nesta filial (pode repetir)",
+    )
+    parser.add_argument(
+        "--processos-busca",
+        type=int,
+        help="processos da busca nas filiais (padrão: um por filial)",
+    )
+    opcoes = parser.parse_args(argumentos)
+    if opcoes.instrumentar:
+        instrumentacao.ativar()
+    perfil = (
+        instrumentacao.perfilar(opcoes.perfil) if opcoes.perfil else nullcontext()
+    )
+    with perfil:
+        executar_sessao(opcoes)
+
+
+def executar_sessao(opcoes: argparse.Namespace) -> None:
+    """Carrega os dados e mostra o menu até o usuário escolher sair."""
+
+    biblioteca = Biblioteca(criar_armazenamento(opcoes.armazenamento, opcoes.banco))
+    catalogo = None
+    try:
+        # A busca nas filiais inclui a pasta atual, com o nome "Local"
+        if opcoes.filial:
+            catalogo = CatalogoFederado(
+                [Filial("Local", os.getcwd()), *opcoes.filial],
+                opcoes.processos_busca,
+                opcoes.armazenamento,
+            )
+
+        # Carrega os dados salvos (agora ou enquanto o menu já aparece)
+        carregamento = biblioteca.carregamento()
+        if opcoes.carga_em_segundo_plano:
+            carregamento.iniciar()
         else:
-            print(" Opção inválida! Tente novamente.\n")
+            carregamento.carregar()
+
+        # Loop do menu até o usuário escolher sair
+        continuar = True
+        while continuar:
+            # Mostra o menu e pega a opção escolhida
+            opcao = exibir_menu()
+            # Conta a opção escolhida (só com --instrumentar)
+            instrumentacao.contar(f"menu.opcao_{opcao}")
+            # Antes da carga terminar nada foi alterado: sai sem regravar as
+            # coleções, que ainda estão pela metade
+            if opcao == OPCAO_SAIR and not carregamento.concluido:
+                print(" Encerrando o programa...")
+                break
+            if opcao in OPCOES_COM_DADOS or opcao == OPCAO_SAIR:
+                # Só as opções que usam os dados esperam a carga terminar
+                carregamento.aguardar()
+                # Traz o que outros terminais gravaram com o menu na tela
+                biblioteca.sincronizar()
+            # Cada operação da biblioteca já grava tudo de uma vez, no final
+            continuar = executar_opcao(opcao, biblioteca, catalogo)
+    finally:
+        # Fecha o banco e os processos da busca mesmo se algo falhar no meio
+        biblioteca.fechar()
+        if catalogo is not None:
+            catalogo.fechar()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,51 @@
+"""Normalização de textos para busca: sem acentos e sem maiúsculas.
+
+"José", "JOSE" e "jose" viram o mesmo texto, então o operador acha os
+títulos e autores em português digitando sem acento. A forma normalizada
+de cada título e autor é calculada uma vez, na indexação do acervo (veja
+``livros.Acervo``); textos repetidos reaproveitam o cache desta função.
+"""
+
+import unicodedata
+from functools import lru_cache
+from typing import Dict
+
+# Textos distintos guardados no cache (autores e títulos repetem muito)
+TAMANHO_CACHE = 1 << 16
+
+
+def _tabela_sem_acentos() -> Dict[int, str]:
+    """Monta a tabela que troca as letras latinas acentuadas pela letra base."""
+
+    tabela = {}
+    for codigo in range(0xC0, 0x250):
+        base = unicodedata.normalize("NFKD", chr(codigo))
+        base = "".join(
+            caractere for caractere in base if not unicodedata.combining(caractere)
+        )
+        if base.isascii() and base != chr(codigo):
+            tabela[codigo] = base
+    return tabela
+
+
+# Atalho para o caso comum (português): trocar letra por letra é bem mais
+# rápido que decompor o texto inteiro
+_SEM_ACENTOS = _tabela_sem_acentos()
+
+
+@lru_cache(maxsize=TAMANHO_CACHE)
+def normalizar(texto: str) -> str:
+    """Tira acentos (NFKD sem as marcas) e diferenças de caixa (casefold)."""
+
+    # Texto só com ASCII não tem acentos: basta passar para minúsculas
+    if texto.isascii():
+        return texto.lower()
+    dobrado = texto.casefold()
+    sem_acentos = dobrado.translate(_SEM_ACENTOS)
+    if sem_acentos.isascii():
+        return sem_acentos
+    # Outros alfabetos e símbolos compatíveis (ligaduras, largura total...)
+    decomposto = unicodedata.normalize("NFKD", dobrado)
+    return "".join(
+        caractere for caractere in decomposto if not unicodedata.combining(caractere)
+    )
@@ -0,0 +1,92 @@
+"""Listagens em páginas, montadas e escritas no console em blocos.
+
+Em vez de um ``print`` por registro, cada listagem monta só as linhas da
+página pedida e as escreve de uma vez. As ordens (por título, autor, data…)
+vêm dos índices ordenados das coleções (veja ``indices.IndiceOrdenado``),
+então trocar de página não reordena nada.
+"""
+
+import sys
+from itertools import islice
+from typing import Any, Callable, Iterable, List, Optional
+
+# Registros por página na navegação pelo menu
+TAMANHO_PAGINA = 20
+# Linhas juntadas em cada escrita no console
+LINHAS_POR_ESCRITA = 1000
+
+
+def pagina(
+    registros: Iterable[Any],
+    inicio: int = 0,
+    quantidade: Optional[int] = None,
+    ordem: Optional[str] = None,
+    decrescente: bool = False,
+) -> List[Any]:
+    """Devolve os registros de uma página, na ordem pedida.
+
+    Sem ``quantidade``, vai do ``inicio`` até o fim. Ordens só existem nas
+    coleções indexadas (``Acervo``, ``CadastroUsuarios``,
+    ``RegistroEmprestimos``); listas comuns saem na ordem em que estão.
+    """
+
+    if ordem is not None:
+        if not hasattr(registros, "ordenados"):
+            raise ValueError(f"Ordenação desconhecida: {ordem}")
+        return registros.ordenados(ordem, inicio, quantidade, decrescente)
+    if hasattr(registros, "pagina"):
+        return registros.pagina(inicio, quantidade)
+
+    fim = None if quantidade is None else inicio + quantidade
+    # Listas são fatiadas direto, sem percorrer os registros anteriores
+    if isinstance(registros, list):
+        return registros[inicio:fim]
+    return list(islice(registros, inicio, fim))
+
+
+def escrever_linhas(linhas: Iterable[str]) -> None:
+    """Escreve as linhas no console, juntando várias em cada escrita."""
+
+    saida = sys.stdout
+    bloco: List[str] = []
+    for linha in linhas:
+        bloco.append(linha)
+        if len(bloco) == LINHAS_POR_ESCRITA:
+            saida.write("\n".join(bloco) + "\n")
+            bloco.clear()
+    if bloco:
+        saida.write("\n".join(bloco) + "\n")
+    saida.flush()
+
+
+def navegar(
+    total: int,
+    mostrar_pagina: Callable[[int, int], None],
+    tamanho: int = TAMANHO_PAGINA,
+) -> None:
+    """Mostra uma listagem de ``total`` registros, página por página.
+
+    ``mostrar_pagina`` recebe o início e o tamanho da página. Entre uma
+    página e outra, o usuário pode seguir (Enter), pular para uma página
+    pelo número ou parar (``s``).
+    """
+
+    paginas = max(1, -(-total // tamanho))
+    numero = 1
+    while True:
+        mostrar_pagina((numero - 1) * tamanho, tamanho)
+        if paginas == 1:
+            return
+        resposta = input(
+            f" Página {numero} de {paginas}. Enter: próxima | número: ir para "
+            "a página | s: sair: "
+        ).strip().lower()
+        # Para quando o usuário pede ou quando passa da última página
+        if resposta == "s":
+            return
+        if resposta.isdigit():
+            numero = min(max(int(resposta), 1), paginas)
+        elif numero == paginas:
+            return
+        else:
+            numero += 1
@@ -1,9 +1,89 @@
-"""Funções utilitárias para carregar e salvar dados em JSON."""
+"""Funções utilitárias para carregar e salvar dados em JSON.
 
+Além do arquivo JSON completo (o "retrato" dos dados), cada arquivo pode ter
+um diário de alterações ao lado (``<arquivo>.diario``), em JSON Lines, onde
+cada cadastro, empréstimo ou devolução acrescenta uma única linha. Ao
+carregar, o retrato é lido e o diário é reaplicado por cima dele.
+
+Os retratos são gravados de forma atômica (arquivo temporário, ``fsync`` e
+troca de nome), então uma queda no meio da gravação nunca deixa um arquivo
+pela metade. Dentro de ``adiar_gravacoes()`` as gravações de uma mesma ação
+são acumuladas e feitas uma única vez no final.
+
+A leitura é feita em blocos (``iterar_registros``), um registro por vez, sem
+carregar o texto inteiro do arquivo na memória; ``CarregamentoEmSegundoPlano``
+usa isso para preencher as coleções enquanto o menu já está na tela.
+
+Vários processos (um por terminal) podem usar os mesmos arquivos: cada
+diário tem uma trava consultiva entre processos (``<arquivo>.trava``) e
+guarda até onde já leu o diário. ``Diario.sincronizar`` traz para a coleção
+só as linhas que outros processos acrescentaram desde então; a coleção só
+é relida inteira quando outro processo grava um retrato novo.
+"""
+
+import io
 import json
-from typing import Any, List
+import os
+import re
+import tempfile
+import threading
+from contextlib import ExitStack, contextmanager, nullcontext
+from typing import (
+    IO,
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from instrumentacao import contar_bytes, medido
+from registros import para_json
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+EXTENSAO_DIARIO = ".diario"
+EXTENSAO_TRAVA = ".trava"
+OPERACOES_DIARIO = ("adicionar", "remover", "atualizar")
+TAMANHO_BLOCO_LEITURA = 1 << 16
+_ESPACOS = re.compile(r"[ \t\r\n]*")
+_SEPARADOR = re.compile(r"[ \t\r\n]*,[ \t\r\n]*")
+
+
+class _Adiamento(threading.local):
+    """Gravações acumuladas enquanto ``adiar_gravacoes`` estiver ativo.
+
+    Cada thread tem as suas: o fim do bloco de uma thread não grava (nem
+    descarta) o que outra ainda está acumulando.
+    """
+
+    def __init__(self) -> None:
+        self.ativo = False
+        # Caminho -> última versão do retrato
+        self.retratos: Dict[str, Iterable[Any]] = {}
+        # Diário -> linhas ainda não gravadas nele
+        self.diarios: Dict["Diario", List[str]] = {}
+        # Caminho -> linhas a acrescentar em outros arquivos (o histórico)
+        self.linhas: Dict[str, List[str]] = {}
+        # Diário -> coleção a compactar no fim do bloco
+        self.compactacoes: Dict["Diario", Iterable[Any]] = {}
+        # Chave -> contextos mantidos abertos até o fim do bloco (transações)
+        self.contextos: Dict[Any, ExitStack] = {}
+
 
+_adiamento = _Adiamento()
 
+
+@medido("persistencia.carregar_dados")
 def carregar_dados(caminho_arquivo: str) -> List[Any]:
     """Lê um arquivo JSON e retorna uma lista de registros.
 
@@ -11,26 +91,842 @@ def carregar_dados(caminho_arquivo: str) -> List[Any]:
     """
 
     try:
-        # Tenta abrir o arquivo pra leitura
-        with open(caminho_arquivo, "r", encoding="utf-8") as arquivo:
-            # Lê o conteúdo JSON do arquivo
-            dados = json.load(arquivo)
+        # Lê os registros do arquivo em blocos, um de cada vez
+        dados = list(iterar_registros(caminho_arquivo))
     except (FileNotFoundError, json.JSONDecodeError):
-        # Se o arquivo não existir ou estiver com erro, devolve lista vazia
-        return []
+        # Se o arquivo não existir ou estiver com erro, começa sem dados
+        dados = []
 
-    # Se os dados forem uma lista, devolve ela
-    if isinstance(dados, list):
-        return dados
+    # Reaplica as alterações anotadas no diário depois do último retrato
+    return aplicar_diario(dados, caminho_arquivo)
+
+
+def iterar_dados(caminho_arquivo: str) -> Iterator[Any]:
+    """Devolve os registros do arquivo (com o diário reaplicado) um a um.
+
+    Sem alterações pendentes no diário, os registros saem direto da leitura
+    em blocos. Um arquivo que não existe não tem registros; um arquivo
+    corrompido levanta ``json.JSONDecodeError``, mesmo depois de alguns
+    registros, para uma carga pela metade nunca passar por completa.
+    """
+
+    cabecalho, alteracoes = _ler_diario(caminho_arquivo + EXTENSAO_DIARIO)
+    # Com alterações pendentes, reaplica o diário sobre a lista completa
+    if alteracoes and _diario_vale(cabecalho, caminho_arquivo):
+        dados = list(_iterar_retrato(caminho_arquivo))
+        yield from aplicar_diario(dados, caminho_arquivo)
+        return
+
+    yield from _iterar_retrato(caminho_arquivo)
+
+
+def _iterar_retrato(caminho_arquivo: str) -> Iterator[Any]:
+    """Lê o retrato JSON em blocos; um arquivo que não existe fica vazio."""
+
+    try:
+        yield from iterar_registros(caminho_arquivo)
+    except FileNotFoundError:
+        return
+
+
+def iterar_registros(
+    caminho_arquivo: str, tamanho_bloco: int = TAMANHO_BLOCO_LEITURA
+) -> Iterator[Any]:
+    """Lê um array JSON em blocos e devolve um elemento de cada vez.
+
+    Se o conteúdo não for um array, não devolve nada. Erros de sintaxe
+    levantam ``json.JSONDecodeError``, como ``json.load``.
+    """
+
+    decodificador = json.JSONDecoder()
+    with open(caminho_arquivo, "r", encoding="utf-8") as arquivo:
+        # Conta o arquivo inteiro como lido (a leitura só para antes num erro)
+        contar_bytes(
+            os.path.basename(caminho_arquivo), lidos=os.fstat(arquivo.fileno()).st_size
+        )
+        buffer = arquivo.read(tamanho_bloco)
+        fim_arquivo = not buffer
+        posicao = 0
+        # O que pode vir a seguir: "[" no início, depois valores e vírgulas
+        esperado = "inicio"
+
+        while True:
+            # Pula os espaços entre os elementos
+            posicao = _ESPACOS.match(buffer, posicao).end()
+
+            # Se o bloco acabou, lê o próximo (ou termina no fim do arquivo)
+            if posicao == len(buffer):
+                if fim_arquivo:
+                    if esperado in ("inicio", "fim"):
+                        return
+                    raise json.JSONDecodeError("Array não terminado", buffer, posicao)
+                bloco = arquivo.read(tamanho_bloco)
+                buffer, posicao, fim_arquivo = buffer[posicao:] + bloco, 0, not bloco
+                continue
+
+            caractere = buffer[posicao]
+            if esperado == "inicio":
+                # Arquivo que não é um array não tem registros
+                if caractere != "[":
+                    return
+                posicao += 1
+                esperado = "valor_ou_fim"
+            elif esperado == "fim":
+                raise json.JSONDecodeError("Conteúdo após o array", buffer, posicao)
+            elif caractere == "]" and esperado != "valor":
+                posicao += 1
+                esperado = "fim"
+            elif caractere == "," and esperado == "virgula_ou_fim":
+                posicao += 1
+                esperado = "valor"
+            elif esperado in ("valor", "valor_ou_fim"):
+                # Decodifica em sequência os valores inteiros que já estão no bloco
+                while True:
+                    try:
+                        valor, final = decodificador.raw_decode(buffer, posicao)
+                    except json.JSONDecodeError:
+                        # O valor pode só estar cortado no fim do bloco
+                        if fim_arquivo:
+                            raise
+                        final = None
+                    # Um valor que termina no fim do bloco pode continuar no
+                    # próximo (um número, por exemplo): lê mais e tenta de novo
+                    if final is None or (final == len(buffer) and not fim_arquivo):
+                        bloco = arquivo.read(tamanho_bloco)
+                        buffer, posicao = buffer[posicao:] + bloco, 0
+                        fim_arquivo = not bloco
+                        continue
+                    yield valor
+
+                    # Caminho rápido: vírgula e o próximo valor no mesmo bloco
+                    separador = _SEPARADOR.match(buffer, final)
+                    if separador is None:
+                        posicao, esperado = final, "virgula_ou_fim"
+                        break
+                    posicao = separador.end()
+                    if posicao == len(buffer):
+                        esperado = "valor"
+                        break
+            else:
+                raise json.JSONDecodeError("Separador inesperado", buffer, posicao)
+
+
+@medido("persistencia.salvar_dados")
+def salvar_dados(dados: Iterable[Any], caminho_arquivo: str) -> None:
+    """Salva uma coleção de registros em um arquivo JSON com indentação.
+
+    Dentro de ``adiar_gravacoes()``, só a última versão de cada arquivo é
+    gravada, quando o bloco termina.
+    """
+
+    # Se as gravações estão adiadas, só guarda a referência pra depois
+    if _adiamento.ativo:
+        _adiamento.retratos[caminho_arquivo] = dados
+        return
+
+    _gravar_atomico(dados, caminho_arquivo)
+
+
+@contextmanager
+def adiar_gravacoes() -> Iterator[None]:
+    """Acumula as gravações do bloco e faz cada uma só uma vez no final.
+
+    Blocos aninhados fazem parte do bloco mais externo. O bloco vale só
+    para a thread que o abriu; as outras continuam gravando na hora.
+    """
+
+    adiamento = _adiamento
+    # Se já existe um bloco ativo, as gravações ficam para o final dele
+    if adiamento.ativo:
+        yield
+        return
+
+    adiamento.ativo = True
+    try:
+        yield
+    finally:
+        retratos, diarios, linhas, compactacoes, contextos = (
+            adiamento.retratos,
+            adiamento.diarios,
+            adiamento.linhas,
+            adiamento.compactacoes,
+            adiamento.contextos,
+        )
+        adiamento.ativo = False
+        adiamento.retratos, adiamento.diarios = {}, {}
+        adiamento.linhas, adiamento.compactacoes = {}, {}
+        adiamento.contextos = {}
+        # As linhas avulsas (o histórico) vão primeiro: uma devolução chega
+        # ao histórico antes de sair do retrato ou do diário dos empréstimos
+        for caminho_arquivo, novas_linhas in linhas.items():
+            _acrescentar_linhas(caminho_arquivo, novas_linhas)
+        # Fecha os contextos do bloco (confirma as transações do SQLite)
+        for pilha in contextos.values():
+            pilha.close()
+        # Grava uma vez cada retrato e cada lote de linhas
+        for caminho_arquivo, dados in retratos.items():
+            _gravar_atomico(dados, caminho_arquivo)
+        for diario, novas_linhas in diarios.items():
+            # Com a trava do diário, como as gravações feitas na hora
+            with diario.trava:
+                _acrescentar_linhas(diario.caminho_diario, novas_linhas)
+        for diario, colecao in compactacoes.items():
+            with diario.trava:
+                diario._gravar_e_reiniciar(colecao)
+
+
+def manter_ate_o_fim(chave: Any, abrir: Callable[[], ContextManager[Any]]) -> bool:
+    """Mantém aberto até o fim de ``adiar_gravacoes`` o contexto de ``abrir()``.
+
+    O contexto é aberto na primeira chamada com a chave e fechado quando o
+    bloco termina, depois das linhas avulsas. Diz se há um bloco ativo
+    nesta thread; sem bloco, não abre nada.
+    """
 
-    # Se não for lista, devolve lista vazia
-    return []
+    adiamento = _adiamento
+    if not adiamento.ativo:
+        return False
+    if chave not in adiamento.contextos:
+        pilha = ExitStack()
+        pilha.enter_context(abrir())
+        adiamento.contextos[chave] = pilha
+    return True
 
 
-def salvar_dados(dados: List[Any], caminho_arquivo: str) -> None:
-    """Salva uma lista de registros em um arquivo JSON com indentação."""
+def _gravar_atomico(dados: Iterable[Any], caminho_arquivo: str) -> None:
+    """Grava o JSON num arquivo temporário e troca pelo definitivo."""
 
-    # Abre o arquivo pra escrita (cria se não existir, sobrescreve se existir)
-    with open(caminho_arquivo, "w", encoding="utf-8") as arquivo:
+    def escrever(arquivo: IO[bytes]) -> None:
         # Salva os dados em formato JSON bonito (com indentação de 2 espaços)
-        json.dump(dados, arquivo, ensure_ascii=False, indent=2)
\ No newline at end of file
+        texto = io.TextIOWrapper(arquivo, encoding="utf-8")
+        json.dump(list(dados), texto, ensure_ascii=False, indent=2, default=para_json)
+        texto.flush()
+        texto.detach()
+
+    gravar_arquivo_atomico(caminho_arquivo, escrever)
+
+
+@medido("persistencia.gravar_retrato")
+def gravar_arquivo_atomico(
+    caminho_arquivo: str, escrever: Callable[[IO[bytes]], None]
+) -> None:
+    """Grava um arquivo por meio de um temporário trocado pelo definitivo.
+
+    ``escrever`` recebe o temporário aberto em modo binário. O conteúdo vai
+    para o disco (``fsync``) antes da troca de nome, que é atômica: quem ler
+    o arquivo vê a versão antiga inteira ou a nova inteira.
+    """
+
+    diretorio = os.path.dirname(os.path.abspath(caminho_arquivo))
+    # O temporário fica na mesma pasta para a troca de nome ser atômica
+    descritor, caminho_temporario = tempfile.mkstemp(
+        prefix=f".{os.path.basename(caminho_arquivo)}.", suffix=".tmp", dir=diretorio
+    )
+    try:
+        with os.fdopen(descritor, "wb") as arquivo:
+            escrever(arquivo)
+            arquivo.flush()
+            contar_bytes(os.path.basename(caminho_arquivo), gravados=arquivo.tell())
+            os.fsync(arquivo.fileno())
+        os.replace(caminho_temporario, caminho_arquivo)
+    except BaseException:
+        # Se algo deu errado, não deixa o temporário para trás
+        if os.path.exists(caminho_temporario):
+            os.remove(caminho_temporario)
+        raise
+    _sincronizar_diretorio(diretorio)
+
+
+def _sincronizar_diretorio(diretorio: str) -> None:
+    """Garante que a troca de nome chegou ao disco (onde o sistema permite)."""
+
+    try:
+        descritor = os.open(diretorio, os.O_RDONLY)
+    except OSError:
+        # No Windows não é possível abrir pastas; a troca já é durável lá
+        return
+    try:
+        os.fsync(descritor)
+    except OSError:
+        pass
+    finally:
+        os.close(descritor)
+
+
+def acrescentar_linhas(caminho_arquivo: str, linhas: List[str]) -> None:
+    """Acrescenta linhas ao fim de um arquivo (em JSON Lines, por exemplo).
+
+    Dentro de ``adiar_gravacoes()``, as linhas do bloco são gravadas juntas
+    no final, como as do diário.
+    """
+
+    if _adiamento.ativo:
+        _adiamento.linhas.setdefault(caminho_arquivo, []).extend(linhas)
+        return
+    _acrescentar_linhas(caminho_arquivo, linhas)
+
+
+@medido("persistencia.acrescentar_linhas")
+def _acrescentar_linhas(caminho_diario: str, linhas: List[str]) -> None:
+    """Acrescenta linhas ao fim de um diário e as força para o disco."""
+
+    conteudo = "".join(linha + "\n" for linha in linhas).encode("utf-8")
+    with open(caminho_diario, "ab") as arquivo:
+        arquivo.write(conteudo)
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+    contar_bytes(os.path.basename(caminho_diario), gravados=len(conteudo))
+
+
+class TravaArquivo:
+    """Trava consultiva entre processos, ligada a um arquivo de dados.
+
+    Usa um arquivo ``<arquivo>.trava`` ao lado dos dados (``flock`` no Linux
+    e no macOS, ``msvcrt.locking`` no Windows). Também vale entre as threads
+    do mesmo processo e é reentrante: quem já está com ela pode entrar de
+    novo em blocos aninhados.
+    """
+
+    def __init__(self, caminho_arquivo: str) -> None:
+        self.caminho_trava = caminho_arquivo + EXTENSAO_TRAVA
+        self._trava_local = threading.RLock()
+        self._nivel = 0
+        self._arquivo: Optional[IO[bytes]] = None
+
+    def __enter__(self) -> "TravaArquivo":
+        self._trava_local.acquire()
+        try:
+            # Só a entrada mais externa trava o arquivo de verdade
+            if self._nivel == 0:
+                arquivo = open(self.caminho_trava, "a+b")
+                try:
+                    _travar_arquivo(arquivo)
+                except BaseException:
+                    arquivo.close()
+                    raise
+                self._arquivo = arquivo
+            self._nivel += 1
+        except BaseException:
+            self._trava_local.release()
+            raise
+        return self
+
+    def __exit__(self, *erro: Any) -> None:
+        try:
+            self._nivel -= 1
+            if self._nivel == 0:
+                _destravar_arquivo(self._arquivo)
+                self._arquivo.close()
+                self._arquivo = None
+        finally:
+            self._trava_local.release()
+
+
+def _travar_arquivo(arquivo: IO[bytes]) -> None:
+    """Espera até conseguir a trava exclusiva do arquivo."""
+
+    if fcntl is not None:
+        fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX)
+        return
+    arquivo.seek(0)
+    while True:
+        try:
+            msvcrt.locking(arquivo.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            # LK_LOCK desiste depois de uns 10 segundos; continua esperando
+            continue
+
+
+def _destravar_arquivo(arquivo: IO[bytes]) -> None:
+    """Libera a trava do arquivo."""
+
+    if fcntl is not None:
+        fcntl.flock(arquivo.fileno(), fcntl.LOCK_UN)
+        return
+    arquivo.seek(0)
+    msvcrt.locking(arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class Diario:
+    """Diário de alterações (somente acréscimo) de um arquivo de dados.
+
+    A primeira linha guarda os campos que identificam um registro e a
+    assinatura (tamanho e data) do retrato sobre o qual o diário foi
+    iniciado; se o retrato mudar, o diário antigo é ignorado na carga.
+    ``gravar_retrato`` grava o retrato na compactação (JSON, por padrão) e
+    ``carregar_retrato`` o lê de volta quando outro processo o regrava.
+
+    Cada linha leva a ``origem`` (o diário que a escreveu), e ``posicao``
+    diz até onde o arquivo já foi lido: assim ``sincronizar`` aplica na
+    coleção só o que outros processos anotaram, sem repetir o que é nosso.
+
+    Ordem das travas: primeiro as dos diários (na ordem das coleções da
+    ``Biblioteca``), depois as travas internas das coleções e as do estoque
+    dos livros. Quem está com uma trava interna nunca espera pela de um
+    diário; veja ``trava_do_diario``.
+    """
+
+    def __init__(
+        self,
+        caminho_arquivo: str,
+        campos_chave: Sequence[str],
+        limite_compactacao: int = 1000,
+        gravar_retrato: Optional[Callable[[Iterable[Any], str], None]] = None,
+        carregar_retrato: Optional[Callable[[str], List[Any]]] = None,
+    ) -> None:
+        self.caminho_arquivo = caminho_arquivo
+        self.gravar_retrato = gravar_retrato or _gravar_atomico
+        self.carregar_retrato = carregar_retrato or _carregar_retrato_json
+        self.caminho_diario = caminho_arquivo + EXTENSAO_DIARIO
+        self.campos_chave = tuple(campos_chave)
+        self.limite_compactacao = limite_compactacao
+        # Vale entre processos e entre threads (anotar pode compactar)
+        self.trava = TravaArquivo(caminho_arquivo)
+        # Identifica as linhas escritas por este diário
+        self.origem = os.urandom(8).hex()
+
+        with self.trava:
+            self._continuar()
+
+    def anotar(self, operacao: str, registro: Dict[str, Any], colecao: Iterable[Any]) -> None:
+        """Acrescenta uma alteração ao diário e compacta se passar do limite."""
+
+        if operacao not in OPERACOES_DIARIO:
+            raise ValueError(f"Operação de diário desconhecida: {operacao}")
+
+        with self.trava:
+            # Cada alteração vira uma linha JSON no fim do arquivo; escrita
+            # com a trava, a última linha tem o estado mais recente
+            linha = json.dumps(
+                {"op": operacao, "registro": registro, "origem": self.origem},
+                ensure_ascii=False,
+                default=para_json,
+            )
+            if self in _adiamento.compactacoes:
+                # O retrato do fim do bloco já vai incluir esta alteração
+                pass
+            elif _adiamento.ativo:
+                _adiamento.diarios.setdefault(self, []).append(linha)
+            else:
+                _acrescentar_linhas(self.caminho_diario, [linha])
+            self.anotacoes += 1
+
+            # Quando o diário cresce demais, grava um retrato novo e recomeça
+            if self.anotacoes >= self.limite_compactacao:
+                self.compactar(colecao)
+
+    def compactar(self, colecao: Iterable[Any]) -> None:
+        """Grava o retrato completo da coleção e esvazia o diário.
+
+        Dentro de ``adiar_gravacoes``, a compactação fica para o fim do
+        bloco, depois das linhas avulsas (o histórico): as linhas ainda não
+        gravadas deste diário são descartadas, pois vão estar no retrato.
+        """
+
+        with self.trava:
+            if _adiamento.ativo:
+                _adiamento.diarios.pop(self, None)
+                _adiamento.retratos.pop(self.caminho_arquivo, None)
+                _adiamento.compactacoes[self] = colecao
+                return
+            self._gravar_e_reiniciar(colecao)
+
+    def _gravar_e_reiniciar(self, colecao: Iterable[Any]) -> None:
+        """Grava o retrato e recomeça o diário (com a trava já obtida)."""
+
+        self.gravar_retrato(colecao, self.caminho_arquivo)
+        self._reiniciar()
+
+    @medido("persistencia.sincronizar")
+    def sincronizar(self, colecao: Any) -> bool:
+        """Traz para a coleção o que outros processos gravaram desde a última vez.
+
+        Normalmente só as linhas novas do diário são lidas e aplicadas; se
+        outro processo gravou um retrato novo, a coleção é recarregada. Diz
+        se a coleção mudou.
+        """
+
+        with self.trava:
+            # Retrato novo: o diário recomeçou e o que havia nele está no retrato
+            if _assinatura_arquivo(self.caminho_arquivo) != self.retrato:
+                dados = self.carregar_retrato(self.caminho_arquivo)
+                dados = aplicar_diario(dados, self.caminho_arquivo)
+                recarregar_colecao(colecao, dados)
+                self._continuar()
+                return True
+
+            alteracoes, self.posicao = _ler_linhas_novas(
+                self.caminho_diario, self.posicao
+            )
+            # As linhas deste diário já estão na coleção
+            alheias = [
+                alteracao
+                for alteracao in alteracoes
+                if alteracao.get("origem") != self.origem
+            ]
+            self.anotacoes += len(alheias)
+            aplicar_alteracoes(colecao, alheias, self.campos_chave)
+            return bool(alheias)
+
+    def marcar_sincronizado(self) -> None:
+        """Registra que a coleção já reflete o retrato e o diário atuais."""
+
+        self.retrato = _assinatura_arquivo(self.caminho_arquivo)
+        self.posicao = _tamanho_arquivo(self.caminho_diario)
+
+    def _continuar(self) -> None:
+        """Continua o diário, se ele vale para o retrato atual, ou começa um novo.
+
+        Um retrato gravado por fora (importação ou migração) deixa o diário
+        antigo sem valor: as próximas linhas iriam para um diário que a
+        carga ignora.
+        """
+
+        cabecalho, linhas = _ler_diario(self.caminho_diario)
+        if cabecalho is not None and _diario_vale(cabecalho, self.caminho_arquivo):
+            self.anotacoes = len(linhas)
+            self.marcar_sincronizado()
+        else:
+            self._reiniciar()
+
+    def _reiniciar(self) -> None:
+        """Recomeça o diário só com o cabeçalho do retrato atual."""
+
+        cabecalho = {
+            "campos_chave": list(self.campos_chave),
+            "retrato": _assinatura_arquivo(self.caminho_arquivo),
+        }
+        with open(self.caminho_diario, "w", encoding="utf-8") as arquivo:
+            arquivo.write(json.dumps(cabecalho, ensure_ascii=False) + "\n")
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        self.anotacoes = 0
+        self.marcar_sincronizado()
+
+
+def trava_do_diario(diario: Optional[Diario]) -> ContextManager[Any]:
+    """Devolve a trava do diário (ou um bloco vazio, sem diário).
+
+    Coleções com trava interna entram nesta antes da sua, para anotar no
+    diário sem inverter a ordem das travas.
+    """
+
+    return diario.trava if diario is not None else nullcontext()
+
+
+def aplicar_alteracoes(
+    colecao: Any, alteracoes: List[Dict[str, Any]], campos_chave: Sequence[str]
+) -> None:
+    """Aplica numa coleção em memória alterações lidas de um diário.
+
+    Os registros são localizados pelos campos da chave: nas coleções
+    indexadas, pelos índices delas (``localizar``); nas listas comuns, por
+    um mapa montado uma vez. As alterações não são anotadas de novo no
+    diário da coleção.
+    """
+
+    if not alteracoes:
+        return
+
+    def chave(registro: Any) -> Tuple[Any, ...]:
+        return tuple(registro[campo] for campo in campos_chave)
+
+    tipo = getattr(colecao, "TIPO_REGISTRO", None)
+    reindexar = getattr(colecao, "reindexar_registro", None)
+    localizar = getattr(colecao, "localizar", None)
+    # Chave -> registros de uma lista comum, montado só se alguma alteração
+    # precisar
+    por_chave: Optional[Dict[Tuple[Any, ...], List[Any]]] = None
+    diario, colecao.diario = colecao.diario, None
+    try:
+        for alteracao in alteracoes:
+            registro = alteracao["registro"]
+            if tipo is not None:
+                registro = tipo.de_dict(registro)
+            if alteracao["op"] == "adicionar":
+                colecao.append(registro)
+                if por_chave is not None:
+                    por_chave.setdefault(chave(registro), []).append(registro)
+                continue
+
+            if localizar is not None:
+                existente = localizar(registro)
+            else:
+                if por_chave is None:
+                    por_chave = {}
+                    for atual in colecao:
+                        por_chave.setdefault(chave(atual), []).append(atual)
+                existentes = por_chave.get(chave(registro))
+                existente = existentes[0] if existentes else None
+            if existente is None:
+                continue
+            if alteracao["op"] == "remover":
+                colecao.remove(existente)
+                if localizar is None:
+                    existentes.pop(0)
+            else:
+                # Atualiza no lugar: quem já tem o registro vê o valor novo
+                for campo in registro:
+                    existente[campo] = registro[campo]
+                if reindexar is not None:
+                    reindexar(existente)
+    finally:
+        colecao.diario = diario
+
+
+def recarregar_colecao(colecao: Any, registros: Iterable[Any]) -> None:
+    """Troca todo o conteúdo da coleção, sem anotar nada no diário dela."""
+
+    tipo = getattr(colecao, "TIPO_REGISTRO", None)
+    diario, colecao.diario = colecao.diario, None
+    try:
+        colecao.clear()
+        colecao.extend(
+            tipo.de_dict(registro) if tipo is not None else registro
+            for registro in registros
+        )
+    finally:
+        colecao.diario = diario
+
+
+def _carregar_retrato_json(caminho_arquivo: str) -> List[Any]:
+    """Lê o retrato JSON sem reaplicar o diário.
+
+    Um retrato corrompido levanta ``json.JSONDecodeError``: recarregar a
+    coleção vazia apagaria os registros na próxima compactação.
+    """
+
+    return list(_iterar_retrato(caminho_arquivo))
+
+
+def _tamanho_arquivo(caminho_arquivo: str) -> int:
+    """Devolve o tamanho do arquivo em bytes (zero se não existir)."""
+
+    try:
+        return os.path.getsize(caminho_arquivo)
+    except FileNotFoundError:
+        return 0
+
+
+def _ler_linhas_novas(
+    caminho_diario: str, posicao: int
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Lê as linhas completas do diário a partir da posição (em bytes).
+
+    Devolve as alterações lidas e a posição logo depois da última delas.
+    """
+
+    try:
+        with open(caminho_diario, "rb") as arquivo:
+            arquivo.seek(posicao)
+            conteudo = arquivo.read()
+    except FileNotFoundError:
+        return [], posicao
+    contar_bytes(os.path.basename(caminho_diario), lidos=len(conteudo))
+
+    # Uma linha ainda sem o "\n" final fica para a próxima leitura
+    completo = conteudo[: conteudo.rfind(b"\n") + 1]
+    alteracoes = [json.loads(linha) for linha in completo.splitlines() if linha.strip()]
+    return alteracoes, posicao + len(completo)
+
+
+class ArmazenamentoJson:
+    """Armazenamento padrão: um arquivo JSON por coleção, com diário opcional.
+
+    Todo armazenamento oferece ``carregar``, ``salvar``, ``abrir_diario`` e
+    ``travar``; o diário devolvido (ou None) é associado à coleção, que
+    passa a anotar nele cada alteração.
+    """
+
+    def __init__(self, usar_diario: bool = True) -> None:
+        self.usar_diario = usar_diario
+
+    def carregar(self, caminho_arquivo: str) -> List[Any]:
+        """Lê todos os registros da coleção."""
+
+        return carregar_dados(caminho_arquivo)
+
+    def iterar(self, caminho_arquivo: str) -> Iterator[Any]:
+        """Lê os registros da coleção um de cada vez."""
+
+        return iterar_dados(caminho_arquivo)
+
+    def salvar(self, dados: Iterable[Any], caminho_arquivo: str) -> None:
+        """Grava a coleção inteira."""
+
+        salvar_dados(dados, caminho_arquivo)
+
+    def abrir_diario(
+        self, caminho_arquivo: str, campos_chave: Sequence[str]
+    ) -> Optional[Diario]:
+        """Devolve o diário da coleção, se o modo diário estiver ligado."""
+
+        if not self.usar_diario:
+            return None
+        return Diario(caminho_arquivo, campos_chave)
+
+    def travar(self, caminho_arquivo: str) -> TravaArquivo:
+        """Devolve a trava entre processos da coleção (a mesma do diário).
+
+        Quem lê e regrava a coleção inteira por fora dos terminais fica com
+        ela da leitura até a gravação.
+        """
+
+        return TravaArquivo(caminho_arquivo)
+
+    def fechar(self) -> None:
+        """Nada a liberar: cada gravação já fecha o seu arquivo."""
+
+
+class CarregamentoEmSegundoPlano:
+    """Preenche as coleções a partir do armazenamento numa thread separada.
+
+    Cada coleção recebe seus registros aos poucos (convertidos para o
+    ``TIPO_REGISTRO`` dela, se houver) e, ao final, o diário do armazenamento.
+    Quem for usar os dados chama ``aguardar`` antes.
+    """
+
+    def __init__(
+        self,
+        armazenamento: Any,
+        colecoes: Dict[str, Any],
+        campos_chave: Dict[str, Sequence[str]],
+    ) -> None:
+        self.armazenamento = armazenamento
+        self.colecoes = colecoes
+        self.campos_chave = campos_chave
+        self._thread: Optional[threading.Thread] = None
+        self._erro: Optional[BaseException] = None
+
+    def iniciar(self) -> None:
+        """Começa a carga em segundo plano e volta imediatamente."""
+
+        self._thread = threading.Thread(
+            target=self._carregar_capturando_erro, name="carregamento", daemon=True
+        )
+        self._thread.start()
+
+    def carregar(self) -> None:
+        """Faz a carga completa agora, na thread atual."""
+
+        for caminho_arquivo, colecao in self.colecoes.items():
+            diario = self.armazenamento.abrir_diario(
+                caminho_arquivo, self.campos_chave[caminho_arquivo]
+            )
+            # Outros processos esperam a carga terminar; o que gravarem
+            # depois dela chega pelo ``sincronizar`` do diário
+            with trava_do_diario(diario):
+                registros = self.armazenamento.iterar(caminho_arquivo)
+                if colecao.TIPO_REGISTRO is not None:
+                    registros = map(colecao.TIPO_REGISTRO.de_dict, registros)
+                colecao.extend(registros)
+                if diario is not None:
+                    diario.marcar_sincronizado()
+            # O diário só entra depois, para a carga não ser anotada nele
+            colecao.diario = diario
+
+    @property
+    def concluido(self) -> bool:
+        """Diz se a carga já terminou (ou nem foi feita em segundo plano)."""
+
+        return self._thread is None or not self._thread.is_alive()
+
+    def aguardar(self) -> None:
+        """Espera a carga terminar; repassa o erro, se a carga falhou."""
+
+        if self._thread is not None:
+            if self._thread.is_alive():
+                print(" Aguarde, terminando de carregar os dados...")
+            self._thread.join()
+        if self._erro is not None:
+            raise self._erro
+
+    def _carregar_capturando_erro(self) -> None:
+        try:
+            self.carregar()
+        except BaseException as erro:
+            self._erro = erro
+
+
+def _assinatura_arquivo(caminho_arquivo: str) -> Optional[List[int]]:
+    """Devolve tamanho e data de modificação do arquivo, ou None se não existir."""
+
+    try:
+        estado = os.stat(caminho_arquivo)
+    except FileNotFoundError:
+        return None
+    return [estado.st_size, estado.st_mtime_ns]
+
+
+def _diario_vale(cabecalho: Dict[str, Any], caminho_arquivo: str) -> bool:
+    """Confere se o diário foi iniciado sobre o retrato que está no disco."""
+
+    return cabecalho.get("retrato") == _assinatura_arquivo(caminho_arquivo)
+
+
+def _ler_diario(
+    caminho_diario: str,
+) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Lê o cabeçalho e as alterações de um diário.
+
+    Uma última linha incompleta (queda no meio da escrita) é descartada.
+    """
+
+    try:
+        with open(caminho_diario, "r", encoding="utf-8") as arquivo:
+            contar_bytes(
+                os.path.basename(caminho_diario),
+                lidos=os.fstat(arquivo.fileno()).st_size,
+            )
+            linhas = arquivo.read().splitlines()
+    except FileNotFoundError:
+        return None, []
+
+    entradas: List[Dict[str, Any]] = []
+    for linha in linhas:
+        try:
+            entradas.append(json.loads(linha))
+        except json.JSONDecodeError:
+            # Só a última linha pode estar pela metade; o resto é ignorado
+            break
+
+    if not entradas or "campos_chave" not in entradas[0]:
+        return None, []
+    return entradas[0], entradas[1:]
+
+
+def aplicar_diario(dados: List[Any], caminho_arquivo: str) -> List[Any]:
+    """Reaplica sobre os dados as alterações do diário do arquivo."""
+
+    cabecalho, alteracoes = _ler_diario(caminho_arquivo + EXTENSAO_DIARIO)
+    # Sem diário (ou diário de um retrato antigo), os dados já estão prontos
+    if cabecalho is None or not _diario_vale(cabecalho, caminho_arquivo):
+        return dados
+    if not alteracoes:
+        return dados
+
+    campos = cabecalho["campos_chave"]
+
+    def chave(registro: Dict[str, Any]) -> Tuple[Any, ...]:
+        return tuple(registro.get(campo) for campo in campos)
+
+    # Posições ainda válidas de cada chave, para remover/atualizar sem varrer
+    registros: List[Any] = list(dados)
+    posicoes: Dict[Tuple[Any, ...], List[int]] = {}
+    for posicao, registro in enumerate(registros):
+        posicoes.setdefault(chave(registro), []).append(posicao)
+
+    for alteracao in alteracoes:
+        registro = alteracao["registro"]
+        existentes = posicoes.get(chave(registro))
+        if alteracao["op"] == "adicionar":
+            posicoes.setdefault(chave(registro), []).append(len(registros))
+            registros.append(registro)
+        elif alteracao["op"] == "remover" and existentes:
+            registros[existentes.pop(0)] = None
+        elif alteracao["op"] == "atualizar" and existentes:
+            registros[existentes[0]] = registro
+
+    # Descarta as posições marcadas como removidas
+    return [registro for registro in registros if registro is not None]
@@ -0,0 +1,224 @@
+"""Tipos compactos dos registros de livros, usuários e empréstimos.
+
+Cada registro usa ``__slots__`` (sem o dicionário interno de um objeto
+comum), guarda títulos, autores e CPFs internados (uma única cópia de cada
+texto repetido) e, nos empréstimos, a data como um inteiro. Para o resto do
+sistema eles continuam se comportando como os dicionários de antes:
+``livro["exemplares"] -= 1`` funciona, e a comparação com um dicionário de
+mesmo conteúdo dá verdadeiro. O formato JSON dos arquivos não muda:
+``para_dict`` e ``de_dict`` fazem a conversão na hora de gravar e carregar.
+"""
+
+import calendar
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, ClassVar, Dict, Iterator, Mapping, Optional
+
+# Datas são gravadas como "AAAA-MM-DD HH:MM:SS" (ISO 8601 com espaço)
+_EPOCA = datetime(1970, 1, 1)
+_UM_SEGUNDO = timedelta(seconds=1)
+
+# Prazo de devolução de um empréstimo, contado a partir da data em que foi feito
+PRAZO_EMPRESTIMO_DIAS = 14
+_PRAZO_EMPRESTIMO = PRAZO_EMPRESTIMO_DIAS * 24 * 60 * 60
+
+
+def agora() -> int:
+    """Devolve a data e hora local atual em segundos (sem fuso horário)."""
+
+    return calendar.timegm(time.localtime())
+
+
+def texto_para_momento(data: str) -> int:
+    """Converte uma data no formato dos arquivos em segundos (sem fuso).
+
+    Também aceita só a data ("AAAA-MM-DD"), que vira meia-noite.
+    """
+
+    # fromisoformat é bem mais rápido que strptime na carga de muitos registros
+    return (datetime.fromisoformat(data) - _EPOCA) // _UM_SEGUNDO
+
+
+def momento_para_texto(momento: int) -> str:
+    """Converte segundos (sem fuso) no formato de data dos arquivos."""
+
+    return (_EPOCA + timedelta(seconds=momento)).isoformat(" ")
+
+
+class Registro:
+    """Base dos registros: acesso por chave igual ao dos dicionários.
+
+    ``CAMPOS`` liga cada chave usada no JSON ao atributo correspondente.
+    """
+
+    __slots__ = ()
+    CAMPOS: ClassVar[Dict[str, str]] = {}
+
+    def __getitem__(self, campo: str) -> Any:
+        return getattr(self, self.CAMPOS[campo])
+
+    def __setitem__(self, campo: str, valor: Any) -> None:
+        setattr(self, self.CAMPOS[campo], valor)
+
+    def __contains__(self, campo: object) -> bool:
+        return campo in self.CAMPOS
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.CAMPOS)
+
+    def __len__(self) -> int:
+        return len(self.CAMPOS)
+
+    def __eq__(self, outro: object) -> bool:
+        if isinstance(outro, (Registro, Mapping)):
+            return self.para_dict() == dict(outro.items())
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def get(self, campo: str, padrao: Any = None) -> Any:
+        """Devolve o valor do campo ou o padrão, como ``dict.get``."""
+
+        if campo not in self.CAMPOS:
+            return padrao
+        return self[campo]
+
+    def keys(self) -> Iterator[str]:
+        """Devolve as chaves do registro no formato JSON."""
+
+        return iter(self.CAMPOS)
+
+    def items(self) -> Iterator[tuple]:
+        """Devolve os pares (chave, valor) do registro no formato JSON."""
+
+        return ((campo, self[campo]) for campo in self.CAMPOS)
+
+    def para_dict(self) -> Dict[str, Any]:
+        """Converte o registro no dicionário gravado nos arquivos."""
+
+        return {campo: self[campo] for campo in self.CAMPOS}
+
+    @classmethod
+    def de_dict(cls, dados: Mapping[str, Any]) -> "Registro":
+        """Cria o registro a partir do dicionário lido dos arquivos."""
+
+        return cls(**{atributo: dados[campo] for campo, atributo in cls.CAMPOS.items()})
+
+
+@dataclass(slots=True, eq=False)
+class Livro(Registro):
+    """Livro do acervo."""
+
+    CAMPOS: ClassVar[Dict[str, str]] = {
+        "título": "titulo",
+        "autor": "autor",
+        "ano": "ano",
+        "exemplares": "exemplares",
+    }
+
+    titulo: str
+    autor: str
+    ano: int
+    exemplares: int
+
+    def __post_init__(self) -> None:
+        # Títulos e autores se repetem muito (nos empréstimos, por exemplo)
+        self.titulo = sys.intern(self.titulo)
+        self.autor = sys.intern(self.autor)
+
+
+@dataclass(slots=True, eq=False)
+class Usuario(Registro):
+    """Usuário cadastrado."""
+
+    CAMPOS: ClassVar[Dict[str, str]] = {"nome": "nome", "cpf": "cpf"}
+
+    nome: str
+    cpf: str
+
+    def __post_init__(self) -> None:
+        # O mesmo CPF aparece em todos os empréstimos do usuário
+        self.cpf = sys.intern(self.cpf)
+
+
+@dataclass(slots=True, eq=False)
+class Emprestimo(Registro):
+    """Empréstimo ativo; as datas ficam guardadas em segundos (sem fuso).
+
+    Sem vencimento informado (como nos arquivos antigos), o empréstimo vence
+    ``PRAZO_EMPRESTIMO_DIAS`` dias depois de feito.
+    """
+
+    CAMPOS: ClassVar[Dict[str, str]] = {
+        "cpf_usuario": "cpf_usuario",
+        "titulo_livro": "titulo_livro",
+        "data_emprestimo": "data_emprestimo",
+        "data_vencimento": "data_vencimento",
+    }
+
+    cpf_usuario: str
+    titulo_livro: str
+    momento_emprestimo: int
+    momento_vencimento: Optional[int] = None
+
+    def __post_init__(self) -> None:
+        self.cpf_usuario = sys.intern(self.cpf_usuario)
+        self.titulo_livro = sys.intern(self.titulo_livro)
+        if self.momento_vencimento is None:
+            self.momento_vencimento = self.momento_emprestimo + _PRAZO_EMPRESTIMO
+
+    @property
+    def data_emprestimo(self) -> str:
+        """Data do empréstimo no formato dos arquivos."""
+
+        return momento_para_texto(self.momento_emprestimo)
+
+    @data_emprestimo.setter
+    def data_emprestimo(self, data: str) -> None:
+        self.momento_emprestimo = texto_para_momento(data)
+
+    @property
+    def data_vencimento(self) -> str:
+        """Data em que o livro deve ser devolvido, no formato dos arquivos."""
+
+        return momento_para_texto(self.momento_vencimento)
+
+    @data_vencimento.setter
+    def data_vencimento(self, data: str) -> None:
+        self.momento_vencimento = texto_para_momento(data)
+
+    @classmethod
+    def de_dict(cls, dados: Mapping[str, Any]) -> "Emprestimo":
+        """Cria o empréstimo a partir do dicionário lido dos arquivos."""
+
+        vencimento = dados.get("data_vencimento")
+        return cls(
+            dados["cpf_usuario"],
+            dados["titulo_livro"],
+            texto_para_momento(dados["data_emprestimo"]),
+            texto_para_momento(vencimento) if vencimento else None,
+        )
+
+
+def momento_vencimento(emprestimo: Mapping[str, Any]) -> int:
+    """Devolve quando o empréstimo vence, em segundos (sem fuso).
+
+    Aceita também os dicionários do formato antigo, sem ``data_vencimento``.
+    """
+
+    if isinstance(emprestimo, Emprestimo):
+        return emprestimo.momento_vencimento
+    vencimento = emprestimo.get("data_vencimento")
+    if vencimento:
+        return texto_para_momento(vencimento)
+    return texto_para_momento(emprestimo["data_emprestimo"]) + _PRAZO_EMPRESTIMO
+
+
+def para_json(registro: Any) -> Dict[str, Any]:
+    """Converte registros em dicionários para o ``json`` (use em ``default``)."""
+
+    if isinstance(registro, Registro):
+        return registro.para_dict()
+    raise TypeError(f"Objeto do tipo {type(registro).__name__} não é serializável")
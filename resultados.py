@@ -0,0 +1,20 @@
+"""Resultado das operações do sistema, para uso sem console."""
+
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(frozen=True)
+class Resultado:
+    """Diz se uma operação deu certo, com a mensagem para o usuário.
+
+    ``registro`` traz o registro criado ou alterado, quando houver. Em
+    testes de verdade (``if resultado:``) vale o mesmo que ``sucesso``.
+    """
+
+    sucesso: bool
+    mensagem: str
+    registro: Any = None
+
+    def __bool__(self) -> bool:
+        return self.sucesso
@@ -0,0 +1,265 @@
+"""Camada de serviço da biblioteca, sem nenhuma entrada ou saída no console.
+
+A ``Biblioteca`` junta as coleções, o histórico de devoluções (veja
+``historico``) e o armazenamento: cada operação recebe os dados já
+informados, devolve um ``Resultado`` e grava no armazenamento só o que
+mudou. O menu de ``main.py`` apenas lê o teclado,
+chama estas operações e mostra as mensagens; testes de carga e outros
+programas podem usar a mesma ``Biblioteca`` diretamente.
+
+Cada operação roda numa ``sessao``: com os arquivos travados, a coleção
+recebe antes o que outros terminais gravaram, então dois processos nunca
+emprestam o mesmo exemplar nem apagam o empréstimo um do outro.
+"""
+
+from contextlib import ExitStack, contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from emprestimos import (
+    RegistroEmprestimos,
+    devolver_lote,
+    emprestar_lote,
+    realizar_devolucao,
+    realizar_emprestimo,
+)
+from estatisticas import EstatisticasCirculacao
+from historico import HistoricoEmprestimos
+from instrumentacao import medido
+from livros import Acervo, registrar_livro
+from persistencia import (
+    ArmazenamentoJson,
+    CarregamentoEmSegundoPlano,
+    adiar_gravacoes,
+)
+from resultados import Resultado
+from usuarios import CadastroUsuarios, registrar_usuario
+
+ARQUIVO_USUARIOS = "usuarios.json"
+ARQUIVO_LIVROS = "livros.json"
+ARQUIVO_EMPRESTIMOS = "emprestimos.json"
+ARQUIVO_ESTATISTICAS = "estatisticas.json"
+
+# Campos que identificam um registro de cada coleção nos diários
+CAMPOS_CHAVE = {
+    ARQUIVO_USUARIOS: ("cpf",),
+    ARQUIVO_LIVROS: ("título",),
+    ARQUIVO_EMPRESTIMOS: ("cpf_usuario", "titulo_livro", "data_emprestimo"),
+    ARQUIVO_ESTATISTICAS: ("tipo", "chave"),
+}
+
+
+def criar_armazenamento(tipo: str, caminho_banco: str) -> Any:
+    """Cria o armazenamento escolhido na linha de comando.
+
+    - ``diario``: arquivos JSON mais um diário de alterações (padrão);
+    - ``json``: arquivos JSON regravados inteiros a cada alteração;
+    - ``sqlite``: tabelas num banco SQLite, alterando só as linhas envolvidas;
+    - ``binario``: retratos binários por coluna (carga rápida) mais o diário.
+    """
+
+    if tipo == "sqlite":
+        # Só importa o SQLite quando ele é escolhido
+        from armazenamento_sqlite import ArmazenamentoSqlite
+
+        return ArmazenamentoSqlite(caminho_banco)
+    if tipo == "binario":
+        from snapshot_binario import ArmazenamentoBinario
+
+        return ArmazenamentoBinario()
+    return ArmazenamentoJson(usar_diario=tipo == "diario")
+
+
+def salvar_colecao(
+    colecao: Iterable[Any], caminho_arquivo: str, armazenamento: Any
+) -> None:
+    """Grava a coleção inteira, a menos que ela já anote tudo num diário."""
+
+    if colecao.diario is None:
+        armazenamento.salvar(colecao, caminho_arquivo)
+
+
+def salvar_tudo(colecoes: Dict[str, Any], armazenamento: Any) -> None:
+    """Grava o retrato completo de cada coleção (e esvazia os diários)."""
+
+    for caminho_arquivo, colecao in colecoes.items():
+        if colecao.diario is None:
+            armazenamento.salvar(colecao, caminho_arquivo)
+        else:
+            colecao.diario.compactar(colecao)
+
+
+class Biblioteca:
+    """Coleções da biblioteca e o armazenamento onde elas são gravadas."""
+
+    def __init__(
+        self,
+        armazenamento: Any,
+        usuarios: Optional[CadastroUsuarios] = None,
+        livros: Optional[Acervo] = None,
+        emprestimos: Optional[RegistroEmprestimos] = None,
+        estatisticas: Optional[EstatisticasCirculacao] = None,
+        historico: Optional[HistoricoEmprestimos] = None,
+    ) -> None:
+        self.armazenamento = armazenamento
+        self.usuarios = usuarios if usuarios is not None else CadastroUsuarios()
+        self.livros = livros if livros is not None else Acervo()
+        self.emprestimos = (
+            emprestimos if emprestimos is not None else RegistroEmprestimos()
+        )
+        self.estatisticas = (
+            estatisticas if estatisticas is not None else EstatisticasCirculacao()
+        )
+        # Os empréstimos devolvidos ficam em arquivos próprios, um por mês
+        self.historico = historico if historico is not None else HistoricoEmprestimos()
+
+    @property
+    def colecoes(self) -> Dict[str, Any]:
+        """Cada coleção ligada ao arquivo onde ela é guardada."""
+
+        return {
+            ARQUIVO_USUARIOS: self.usuarios,
+            ARQUIVO_LIVROS: self.livros,
+            ARQUIVO_EMPRESTIMOS: self.emprestimos,
+            ARQUIVO_ESTATISTICAS: self.estatisticas,
+        }
+
+    def carregamento(self) -> CarregamentoEmSegundoPlano:
+        """Prepara a carga dos dados salvos para dentro das coleções."""
+
+        return CarregamentoEmSegundoPlano(
+            self.armazenamento, self.colecoes, CAMPOS_CHAVE
+        )
+
+    @contextmanager
+    def sessao(self) -> Iterator[None]:
+        """Trava as coleções e junta as gravações do bloco numa só.
+
+        Antes do bloco, traz o que outros processos gravaram; a gravação
+        acontece no final, antes de liberar os arquivos. Sessões podem ser
+        aninhadas. Coleções sem diário (armazenamento ``json``) não são
+        coordenadas entre processos.
+        """
+
+        with ExitStack() as pilha:
+            # Sempre na mesma ordem, para dois processos não se travarem
+            for colecao in self.colecoes.values():
+                if colecao.diario is not None:
+                    pilha.enter_context(colecao.diario.trava)
+                    colecao.diario.sincronizar(colecao)
+            pilha.enter_context(adiar_gravacoes())
+            yield
+
+    @medido("biblioteca.sincronizar")
+    def sincronizar(self) -> None:
+        """Traz para as coleções o que outros processos gravaram."""
+
+        with self.sessao():
+            pass
+
+    @medido("biblioteca.cadastrar_usuario")
+    def cadastrar_usuario(self, nome: str, cpf: str) -> Resultado:
+        """Valida e cadastra um usuário."""
+
+        with self.sessao():
+            resultado = registrar_usuario(self.usuarios, nome, cpf)
+            if resultado:
+                self._salvar(ARQUIVO_USUARIOS)
+        return resultado
+
+    @medido("biblioteca.cadastrar_livro")
+    def cadastrar_livro(
+        self, titulo: str, autor: str, ano: str, exemplares: str
+    ) -> Resultado:
+        """Valida e cadastra um livro."""
+
+        with self.sessao():
+            resultado = registrar_livro(self.livros, titulo, autor, ano, exemplares)
+            if resultado:
+                self._salvar(ARQUIVO_LIVROS)
+        return resultado
+
+    @medido("biblioteca.emprestar")
+    def emprestar(self, cpf: str, titulo: str) -> Resultado:
+        """Empresta um exemplar do livro ao usuário."""
+
+        with self.sessao():
+            resultado = realizar_emprestimo(
+                self.usuarios, self.livros, self.emprestimos, cpf, titulo
+            )
+            if resultado:
+                self._contar_emprestimos([resultado])
+                self._salvar(ARQUIVO_LIVROS, ARQUIVO_EMPRESTIMOS, ARQUIVO_ESTATISTICAS)
+        return resultado
+
+    @medido("biblioteca.devolver")
+    def devolver(self, cpf: str, titulo: str) -> Resultado:
+        """Encerra o empréstimo e devolve o exemplar ao acervo."""
+
+        with self.sessao():
+            resultado = realizar_devolucao(self.livros, self.emprestimos, cpf, titulo)
+            if resultado:
+                self._registrar_devolucoes([resultado])
+                self._salvar(ARQUIVO_LIVROS, ARQUIVO_EMPRESTIMOS, ARQUIVO_ESTATISTICAS)
+        return resultado
+
+    @medido("biblioteca.emprestar_lote")
+    def emprestar_lote(self, pedidos: Iterable[Tuple[str, str]]) -> List[Resultado]:
+        """Faz vários empréstimos de uma vez, a partir de pares (CPF, título)."""
+
+        with self.sessao():
+            resultados = emprestar_lote(
+                self.usuarios, self.livros, self.emprestimos, pedidos
+            )
+            if any(resultados):
+                self._contar_emprestimos(resultados)
+                self._salvar(ARQUIVO_LIVROS, ARQUIVO_EMPRESTIMOS, ARQUIVO_ESTATISTICAS)
+        return resultados
+
+    @medido("biblioteca.devolver_lote")
+    def devolver_lote(self, pedidos: Iterable[Tuple[str, str]]) -> List[Resultado]:
+        """Faz várias devoluções de uma vez, a partir de pares (CPF, título)."""
+
+        with self.sessao():
+            resultados = devolver_lote(self.livros, self.emprestimos, pedidos)
+            if any(resultados):
+                self._registrar_devolucoes(resultados)
+                self._salvar(ARQUIVO_LIVROS, ARQUIVO_EMPRESTIMOS, ARQUIVO_ESTATISTICAS)
+        return resultados
+
+    @medido("biblioteca.salvar_tudo")
+    def salvar_tudo(self) -> None:
+        """Grava o retrato completo de todas as coleções."""
+
+        with self.sessao():
+            salvar_tudo(self.colecoes, self.armazenamento)
+
+    def fechar(self) -> None:
+        """Libera o armazenamento."""
+
+        self.armazenamento.fechar()
+
+    def _contar_emprestimos(self, resultados: Iterable[Resultado]) -> None:
+        """Soma nas estatísticas os empréstimos feitos com sucesso."""
+
+        for resultado in resultados:
+            if resultado:
+                emprestimo = resultado.registro
+                livro = self.livros.buscar_por_titulo(emprestimo["titulo_livro"])
+                self.estatisticas.registrar_emprestimo(emprestimo, livro)
+
+    def _registrar_devolucoes(self, resultados: Iterable[Resultado]) -> None:
+        """Arquiva as devoluções feitas com sucesso e as soma nas estatísticas."""
+
+        for resultado in resultados:
+            if resultado:
+                emprestimo = resultado.registro
+                self.historico.arquivar(emprestimo)
+                livro = self.livros.buscar_por_titulo(emprestimo["titulo_livro"])
+                self.estatisticas.registrar_devolucao(emprestimo, livro)
+
+    def _salvar(self, *caminhos: str) -> None:
+        """Grava as coleções alteradas por uma operação."""
+
+        colecoes = self.colecoes
+        for caminho_arquivo in caminhos:
+            salvar_colecao(colecoes[caminho_arquivo], caminho_arquivo, self.armazenamento)
@@ -0,0 +1,353 @@
+"""Servidor HTTP/JSON da biblioteca, feito só com a biblioteca padrão.
+
+Vários operadores podem usar o sistema ao mesmo tempo: o ``asyncio`` cuida
+das conexões e as operações da ``Biblioteca`` rodam numa thread de
+trabalho própria, para que a gravação em disco (com ``fsync``) não trave o
+atendimento das outras conexões. Rotas::
+
+    GET  /usuarios                       lista os usuários
+    POST /usuarios       {"nome", "cpf"}
+    GET  /livros                         lista os livros
+    POST /livros         {"titulo", "autor", "ano", "exemplares"}
+    GET  /livros/busca?titulo=...        (ou ?autor=...)
+    GET  /emprestimos[?cpf=...]          todos ou só os de um usuário
+    GET  /emprestimos/atrasados          vencidos, do mais atrasado
+    GET  /estatisticas                   totais e o topo de cada contador
+    GET  /historico?inicio=...&fim=...   devolvidos no período [&cpf=...]
+    POST /emprestimos    {"cpf", "titulo"}
+    POST /devolucoes     {"cpf", "titulo"}
+
+As operações respondem ``{"sucesso", "mensagem", "registro"}``, com status
+200 (ou 201, quando criam um registro) e 409 quando são recusadas.
+
+Uso::
+
+    python servidor.py --porta 8080 --armazenamento sqlite
+"""
+
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from emprestimos import emprestimos_atrasados, emprestimos_por_usuario
+from estatisticas import TIPOS_RANKING
+from livros import buscar_livros_por_autor, buscar_livros_por_titulo
+from registros import para_json
+from resultados import Resultado
+from servicos import Biblioteca, criar_armazenamento
+
+# Limites de uma requisição, para um cliente não esgotar a memória
+TAMANHO_MAXIMO_CORPO = 1 << 20
+QUANTIDADE_MAXIMA_CABECALHOS = 100
+
+Resposta = Tuple[int, Any]
+Consulta = Dict[str, str]
+
+
+class ErroRequisicao(Exception):
+    """Requisição inválida; vira uma resposta com o status informado."""
+
+    def __init__(self, status: int, mensagem: str) -> None:
+        super().__init__(mensagem)
+        self.status = status
+
+
+class ServidorBiblioteca:
+    """Atende as rotas HTTP usando uma ``Biblioteca`` já carregada."""
+
+    def __init__(self, biblioteca: Biblioteca) -> None:
+        self.biblioteca = biblioteca
+        # Uma thread só: as coleções não são feitas para vários escritores
+        self._trabalhador = ThreadPoolExecutor(1, thread_name_prefix="biblioteca")
+        self._rotas: Dict[Tuple[str, str], Callable[..., Resposta]] = {
+            ("GET", "/usuarios"): self._listar_usuarios,
+            ("POST", "/usuarios"): self._cadastrar_usuario,
+            ("GET", "/livros"): self._listar_livros,
+            ("POST", "/livros"): self._cadastrar_livro,
+            ("GET", "/livros/busca"): self._buscar_livros,
+            ("GET", "/emprestimos"): self._listar_emprestimos,
+            ("GET", "/emprestimos/atrasados"): self._listar_atrasados,
+            ("GET", "/estatisticas"): self._estatisticas,
+            ("GET", "/historico"): self._consultar_historico,
+            ("POST", "/emprestimos"): self._emprestar,
+            ("POST", "/devolucoes"): self._devolver,
+        }
+
+    async def iniciar(
+        self, host: str = "127.0.0.1", porta: int = 8080
+    ) -> asyncio.Server:
+        """Abre a porta e começa a aceitar conexões."""
+
+        return await asyncio.start_server(self._atender_conexao, host, porta)
+
+    def fechar(self) -> None:
+        """Espera as operações em andamento e libera a thread de trabalho."""
+
+        self._trabalhador.shutdown(wait=True)
+
+    async def _atender_conexao(
+        self, leitor: asyncio.StreamReader, escritor: asyncio.StreamWriter
+    ) -> None:
+        """Responde às requisições de uma conexão até o cliente encerrar."""
+
+        try:
+            manter_conexao = True
+            while manter_conexao:
+                try:
+                    requisicao = await _ler_requisicao(leitor)
+                except ErroRequisicao as erro:
+                    status, conteudo = erro.status, {"mensagem": str(erro)}
+                    manter_conexao = False
+                else:
+                    if requisicao is None:
+                        break
+                    metodo, caminho, consulta, corpo, manter_conexao = requisicao
+                    status, conteudo = await self._responder(
+                        metodo, caminho, consulta, corpo
+                    )
+                escritor.write(_montar_resposta(status, conteudo, manter_conexao))
+                await escritor.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # Cliente saiu no meio da conversa: não há a quem responder
+            pass
+        finally:
+            escritor.close()
+
+    async def _responder(
+        self, metodo: str, caminho: str, consulta: Consulta, corpo: bytes
+    ) -> Resposta:
+        """Encontra a rota e executa a operação na thread de trabalho."""
+
+        rota = self._rotas.get((metodo, caminho))
+        if rota is None:
+            if any(caminho == rota_caminho for _, rota_caminho in self._rotas):
+                return HTTPStatus.METHOD_NOT_ALLOWED, {
+                    "mensagem": "Método não permitido."
+                }
+            return HTTPStatus.NOT_FOUND, {"mensagem": "Rota não encontrada."}
+
+        try:
+            dados = json.loads(corpo) if corpo else {}
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST, {"mensagem": "Corpo não é um JSON válido."}
+        if not isinstance(dados, dict):
+            return HTTPStatus.BAD_REQUEST, {
+                "mensagem": "O corpo deve ser um objeto JSON."
+            }
+
+        laco = asyncio.get_running_loop()
+        return await laco.run_in_executor(
+            self._trabalhador, self._executar, rota, consulta, dados
+        )
+
+    def _executar(
+        self, rota: Callable[..., Resposta], consulta: Consulta, dados: Dict[str, Any]
+    ) -> Resposta:
+        """Roda a rota com os dados em dia com outros processos."""
+
+        with self.biblioteca.sessao():
+            return rota(consulta, dados)
+
+    def _listar_usuarios(self, consulta: Consulta, dados: Dict[str, Any]) -> Resposta:
+        return HTTPStatus.OK, list(self.biblioteca.usuarios)
+
+    def _cadastrar_usuario(self, consulta: Consulta, dados: Dict[str, Any]) -> Resposta:
+        return _resposta_da_operacao(
+            self.biblioteca.cadastrar_usuario(
+                _campo(dados, "nome"), _campo(dados, "cpf")
+            ),
+            HTTPStatus.CREATED,
+        )
+
+    def _listar_livros(self, consulta: Consulta, dados: Dict[str, Any]) -> Resposta:
+        return HTTPStatus.OK, list(self.biblioteca.livros)
+
+    def _cadastrar_livro(self, consulta: Consulta, dados: Dict[str, Any]) -> Resposta:
+        return _resposta_da_operacao(
+            self.biblioteca.cadastrar_livro(
+                _campo(dados, "titulo", "título"),
+                _campo(dados, "autor"),
+                _campo(dados, "ano"),
+                _campo(dados, "exemplares"),
+            ),
+            HTTPStatus.CREATED,
+        )
+
+    def _buscar_livros(self, consulta: Consulta, dados: Dict[str, Any]) -> Resposta:
+        if "autor" in consulta:
+            return HTTPStatus.OK, buscar_livros_por_autor(
+                self.biblioteca.livros, consulta["autor"]
+            )
+        return HTTPStatus.OK, buscar_livros_por_titulo(
+            self.biblioteca.livros, consulta.get("titulo", "")
+        )
+
+    def _listar_emprestimos(self, consulta: Consulta, dados: Dict[str, Any]) -> Resposta:
+        if "cpf" in consulta:
+            return HTTPStatus.OK, emprestimos_por_usuario(
+                self.biblioteca.emprestimos, consulta["cpf"]
+            )
+        return HTTPStatus.OK, list(self.biblioteca.emprestimos)
+
+    def _listar_atrasados(self, consulta: Consulta, dados: Dict[str, Any]) -> Resposta:
+        return HTTPStatus.OK, emprestimos_atrasados(self.biblioteca.emprestimos)
+
+    def _estatisticas(self, consulta: Consulta, dados: Dict[str, Any]) -> Resposta:
+        estatisticas = self.biblioteca.estatisticas
+        conteudo = {"geral": estatisticas.geral()}
+        for tipo in TIPOS_RANKING:
+            conteudo[tipo] = estatisticas.mais_emprestados(tipo)
+        return HTTPStatus.OK, conteudo
+
+    def _consultar_historico(
+        self, consulta: Consulta, dados: Dict[str, Any]
+    ) -> Resposta:
+        try:
+            registros = self.biblioteca.historico.consultar(
+                consulta.get("inicio", ""), consulta.get("fim", ""), consulta.get("cpf")
+            )
+        except ValueError as erro:
+            return HTTPStatus.BAD_REQUEST, {"mensagem": str(erro)}
+        return HTTPStatus.OK, registros
+
+    def _emprestar(self, consulta: Consulta, dados: Dict[str, Any]) -> Resposta:
+        return _resposta_da_operacao(
+            self.biblioteca.emprestar(
+                _campo(dados, "cpf"), _campo(dados, "titulo", "título")
+            ),
+            HTTPStatus.CREATED,
+        )
+
+    def _devolver(self, consulta: Consulta, dados: Dict[str, Any]) -> Resposta:
+        return _resposta_da_operacao(
+            self.biblioteca.devolver(
+                _campo(dados, "cpf"), _campo(dados, "titulo", "título")
+            ),
+            HTTPStatus.OK,
+        )
+
+
+def _campo(dados: Dict[str, Any], *nomes: str) -> str:
+    """Devolve como texto o primeiro campo presente entre os nomes aceitos."""
+
+    for nome in nomes:
+        if dados.get(nome) is not None:
+            return str(dados[nome])
+    return ""
+
+
+def _resposta_da_operacao(resultado: Resultado, status_sucesso: int) -> Resposta:
+    """Converte o resultado de uma operação na resposta HTTP."""
+
+    status = status_sucesso if resultado.sucesso else HTTPStatus.CONFLICT
+    return status, {
+        "sucesso": resultado.sucesso,
+        "mensagem": resultado.mensagem,
+        "registro": resultado.registro,
+    }
+
+
+async def _ler_requisicao(
+    leitor: asyncio.StreamReader,
+) -> Optional[Tuple[str, str, Consulta, bytes, bool]]:
+    """Lê uma requisição HTTP/1.1; devolve ``None`` se a conexão terminou."""
+
+    linha = await leitor.readline()
+    if not linha.strip():
+        return None
+    try:
+        metodo, alvo, versao = linha.decode("latin-1").split()
+    except ValueError:
+        raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "Linha de requisição inválida.")
+
+    cabecalhos: Dict[str, str] = {}
+    while True:
+        linha = await leitor.readline()
+        if linha in (b"\r\n", b"\n", b""):
+            break
+        if len(cabecalhos) >= QUANTIDADE_MAXIMA_CABECALHOS:
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "Cabeçalhos demais.")
+        nome, _, valor = linha.decode("latin-1").partition(":")
+        cabecalhos[nome.strip().lower()] = valor.strip()
+
+    try:
+        tamanho = int(cabecalhos.get("content-length", "0"))
+    except ValueError:
+        raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "Content-Length inválido.")
+    if not 0 <= tamanho <= TAMANHO_MAXIMO_CORPO:
+        raise ErroRequisicao(
+            HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Corpo da requisição grande demais."
+        )
+    corpo = await leitor.readexactly(tamanho) if tamanho else b""
+
+    # HTTP/1.1 mantém a conexão aberta, a menos que o cliente peça o contrário
+    conexao = cabecalhos.get("connection", "").lower()
+    if versao == "HTTP/1.1":
+        manter_conexao = conexao != "close"
+    else:
+        manter_conexao = conexao == "keep-alive"
+
+    partes = urlsplit(alvo)
+    consulta = {nome: valores[0] for nome, valores in parse_qs(partes.query).items()}
+    caminho = partes.path.rstrip("/") or "/"
+    return metodo.upper(), caminho, consulta, corpo, manter_conexao
+
+
+def _montar_resposta(status: int, conteudo: Any, manter_conexao: bool) -> bytes:
+    """Monta a resposta HTTP com o conteúdo em JSON."""
+
+    corpo = json.dumps(conteudo, ensure_ascii=False, default=para_json).encode("utf-8")
+    status = HTTPStatus(status)
+    cabecalho = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        "Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(corpo)}\r\n"
+        f"Connection: {'keep-alive' if manter_conexao else 'close'}\r\n\r\n"
+    )
+    return cabecalho.encode("latin-1") + corpo
+
+
+async def servir(biblioteca: Biblioteca, host: str, porta: int) -> None:
+    """Atende requisições até o processo ser interrompido."""
+
+    servidor = ServidorBiblioteca(biblioteca)
+    conexoes = await servidor.iniciar(host, porta)
+    print(f" Servidor da biblioteca em http://{host}:{porta}")
+    try:
+        async with conexoes:
+            await conexoes.serve_forever()
+    finally:
+        servidor.fechar()
+
+
+def main(argumentos: Optional[List[str]] = None) -> None:
+    """Carrega os dados e sobe o servidor HTTP da biblioteca."""
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8080)
+    parser.add_argument(
+        "--armazenamento",
+        choices=("diario", "json", "sqlite", "binario"),
+        default="diario",
+    )
+    parser.add_argument("--banco", default="biblioteca.db")
+    opcoes = parser.parse_args(argumentos)
+
+    biblioteca = Biblioteca(criar_armazenamento(opcoes.armazenamento, opcoes.banco))
+    biblioteca.carregamento().carregar()
+    try:
+        asyncio.run(servir(biblioteca, opcoes.host, opcoes.porta))
+    except KeyboardInterrupt:
+        print(" Encerrando o servidor...")
+    finally:
+        biblioteca.salvar_tudo()
+        biblioteca.fechar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""Retrato binário compacto das coleções, para carregar rápido na partida.
+
+O arquivo guarda os registros por coluna: cada campo vira um bloco só com
+os valores daquele campo (inteiros num ``array`` de 64 bits, textos em
+UTF-8 separados por ``\\0``), precedido por um cabeçalho JSON pequeno que
+diz onde cada bloco começa. Na carga o arquivo é mapeado na memória
+(``mmap``) e cada coluna é decodificada de uma vez só, em código C, em vez
+de interpretar o JSON caractere a caractere.
+
+O JSON continua sendo o formato de troca: este módulo também pode ser
+executado como script para converter entre os dois::
+
+    python snapshot_binario.py              # JSON -> binário
+    python snapshot_binario.py --exportar   # binário -> JSON
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from instrumentacao import contar_bytes
+from persistencia import (
+    Diario,
+    TravaArquivo,
+    aplicar_diario,
+    gravar_arquivo_atomico,
+    iterar_dados,
+    salvar_dados,
+)
+from registros import para_json
+
+MAGICO = b"BIBSNAP1"
+EXTENSAO_BINARIA = ".bin"
+SEPARADOR_TEXTO = "\0"
+# Mágico, tamanho do cabeçalho JSON (4 bytes, little-endian)
+_PREAMBULO = struct.Struct("<8sI")
+
+
+def salvar_snapshot(dados: Iterable[Any], caminho_arquivo: str) -> None:
+    """Grava os registros no formato binário por colunas (de forma atômica)."""
+
+    registros = [
+        registro if isinstance(registro, dict) else para_json(registro)
+        for registro in dados
+    ]
+    campos = list(registros[0]) if registros else []
+
+    # Só dá para separar em colunas se todos os registros têm os mesmos campos
+    if any(list(registro) != campos for registro in registros):
+        colunas = [("", "json", _codificar_json(registros))]
+    else:
+        colunas = [
+            (campo, *_codificar_coluna([registro[campo] for registro in registros]))
+            for campo in campos
+        ]
+
+    # O cabeçalho diz o tipo, o início e o tamanho de cada coluna
+    descricao = []
+    inicio = 0
+    for campo, tipo, conteudo in colunas:
+        descricao.append(
+            {"campo": campo, "tipo": tipo, "inicio": inicio, "tamanho": len(conteudo)}
+        )
+        inicio += len(conteudo)
+    cabecalho = json.dumps(
+        {"quantidade": len(registros), "colunas": descricao}, ensure_ascii=False
+    ).encode("utf-8")
+
+    def escrever(arquivo: IO[bytes]) -> None:
+        arquivo.write(_PREAMBULO.pack(MAGICO, len(cabecalho)))
+        arquivo.write(cabecalho)
+        for _, _, conteudo in colunas:
+            arquivo.write(conteudo)
+
+    gravar_arquivo_atomico(caminho_arquivo, escrever)
+
+
+def carregar_snapshot(caminho_arquivo: str) -> List[Dict[str, Any]]:
+    """Lê um retrato binário e devolve a lista de registros (dicionários).
+
+    Um arquivo que não existe (ou vazio) não tem registros. Um retrato
+    corrompido levanta ``ValueError``, como o JSON corrompido na carga: uma
+    coleção vazia no lugar dele apagaria os registros na próxima gravação.
+    """
+
+    try:
+        with open(caminho_arquivo, "rb") as arquivo:
+            # Arquivo vazio não pode ser mapeado
+            if not arquivo.read(1):
+                return []
+            with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                contar_bytes(os.path.basename(caminho_arquivo), lidos=len(mapa))
+                return _decodificar(mapa)
+    except FileNotFoundError:
+        return []
+    except (struct.error, KeyError, TypeError) as erro:
+        raise ValueError(f"Retrato binário corrompido: {caminho_arquivo}") from erro
+
+
+def _decodificar(mapa: mmap.mmap) -> List[Dict[str, Any]]:
+    """Monta os registros a partir do conteúdo mapeado do arquivo.
+
+    Confere o mágico, o cabeçalho e o tamanho de cada coluna, que precisa
+    ter exatamente ``quantidade`` valores.
+    """
+
+    magico, tamanho_cabecalho = _PREAMBULO.unpack_from(mapa, 0)
+    if magico != MAGICO:
+        raise ValueError("Arquivo não é um retrato binário da biblioteca")
+    inicio_dados = _PREAMBULO.size + tamanho_cabecalho
+    if inicio_dados > len(mapa):
+        raise ValueError("Retrato binário sem o cabeçalho completo")
+    cabecalho = json.loads(mapa[_PREAMBULO.size : inicio_dados].decode("utf-8"))
+    quantidade = cabecalho["quantidade"]
+    if quantidade == 0:
+        return []
+
+    campos = []
+    valores = []
+    for coluna in cabecalho["colunas"]:
+        inicio = inicio_dados + coluna["inicio"]
+        conteudo = mapa[inicio : inicio + coluna["tamanho"]]
+        # Um arquivo cortado deixa a última coluna menor do que o cabeçalho diz
+        if len(conteudo) != coluna["tamanho"]:
+            raise ValueError(f"Coluna {coluna['campo']!r} incompleta no retrato")
+        decodificados = _decodificar_coluna(coluna["tipo"], conteudo)
+        if len(decodificados) != quantidade:
+            raise ValueError(
+                f"Coluna {coluna['campo']!r} com {len(decodificados)} valores, "
+                f"esperados {quantidade}"
+            )
+        if coluna["tipo"] == "json" and not coluna["campo"]:
+            # Registros com campos diferentes ficam guardados inteiros
+            return decodificados
+        campos.append(coluna["campo"])
+        valores.append(decodificados)
+
+    # Junta as colunas de volta em um dicionário por registro
+    return [dict(zip(campos, linha)) for linha in zip(*valores)]
+
+
+def _codificar_coluna(valores: List[Any]) -> tuple:
+    """Escolhe a forma mais compacta de guardar os valores de um campo."""
+
+    if all(type(valor) is int for valor in valores):
+        try:
+            inteiros = array("q", valores)
+        except OverflowError:
+            return "json", _codificar_json(valores)
+        # Os inteiros são gravados sempre em little-endian
+        if sys.byteorder != "little":
+            inteiros.byteswap()
+        return "inteiro", inteiros.tobytes()
+
+    if all(
+        type(valor) is str and SEPARADOR_TEXTO not in valor for valor in valores
+    ):
+        return "texto", SEPARADOR_TEXTO.join(valores).encode("utf-8")
+
+    return "json", _codificar_json(valores)
+
+
+def _decodificar_coluna(tipo: str, conteudo: bytes) -> List[Any]:
+    """Desfaz ``_codificar_coluna``."""
+
+    if tipo == "inteiro":
+        inteiros = array("q")
+        inteiros.frombytes(conteudo)
+        if sys.byteorder != "little":
+            inteiros.byteswap()
+        return inteiros.tolist()
+    if tipo == "texto":
+        return conteudo.decode("utf-8").split(SEPARADOR_TEXTO)
+    return json.loads(conteudo.decode("utf-8"))
+
+
+def _codificar_json(valores: Any) -> bytes:
+    """Guarda valores quaisquer como JSON compacto."""
+
+    return json.dumps(
+        valores, ensure_ascii=False, separators=(",", ":"), default=para_json
+    ).encode("utf-8")
+
+
+class ArmazenamentoBinario:
+    """Guarda cada coleção num retrato binário (``<arquivo>.bin``) com diário.
+
+    O diário é o mesmo do armazenamento JSON; só o retrato muda de formato.
+    """
+
+    def carregar(self, caminho_arquivo: str) -> List[Any]:
+        """Lê todos os registros da coleção."""
+
+        caminho_binario = caminho_arquivo + EXTENSAO_BINARIA
+        return aplicar_diario(carregar_snapshot(caminho_binario), caminho_binario)
+
+    def iterar(self, caminho_arquivo: str) -> Iterator[Any]:
+        """Lê os registros da coleção (o retrato é decodificado de uma vez)."""
+
+        return iter(self.carregar(caminho_arquivo))
+
+    def salvar(self, dados: Iterable[Any], caminho_arquivo: str) -> None:
+        """Grava a coleção inteira no retrato binário."""
+
+        salvar_snapshot(dados, caminho_arquivo + EXTENSAO_BINARIA)
+
+    def abrir_diario(
+        self, caminho_arquivo: str, campos_chave: Sequence[str]
+    ) -> Diario:
+        """Devolve o diário da coleção, que compacta no formato binário."""
+
+        return Diario(
+            caminho_arquivo + EXTENSAO_BINARIA,
+            campos_chave,
+            gravar_retrato=salvar_snapshot,
+            carregar_retrato=carregar_snapshot,
+        )
+
+    def travar(self, caminho_arquivo: str) -> TravaArquivo:
+        """Devolve a trava entre processos da coleção (a mesma do diário)."""
+
+        return TravaArquivo(caminho_arquivo + EXTENSAO_BINARIA)
+
+    def fechar(self) -> None:
+        """Nada a liberar: cada gravação já fecha o seu arquivo."""
+
+
+def main(argumentos: Optional[List[str]] = None) -> None:
+    """Converte os arquivos JSON em retratos binários (ou o contrário)."""
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--exportar",
+        action="store_true",
+        help="grava os retratos binários de volta nos arquivos JSON",
+    )
+    parser.add_argument(
+        "arquivos",
+        nargs="*",
+        default=[
+            "usuarios.json",
+            "livros.json",
+            "emprestimos.json",
+            "estatisticas.json",
+        ],
+        help="arquivos JSON das coleções",
+    )
+    opcoes = parser.parse_args(argumentos)
+
+    armazenamento = ArmazenamentoBinario()
+    for caminho_arquivo in opcoes.arquivos:
+        # Os dois formatos ficam travados da leitura até a gravação, para
+        # nada que um terminal aberto anotar nesse meio tempo se perder
+        with TravaArquivo(caminho_arquivo), armazenamento.travar(caminho_arquivo):
+            # Origem corrompida: para antes de gravar um destino vazio
+            try:
+                if opcoes.exportar:
+                    dados = armazenamento.carregar(caminho_arquivo)
+                else:
+                    dados = list(iterar_dados(caminho_arquivo))
+            except ValueError as erro:
+                parser.exit(
+                    1,
+                    f" {caminho_arquivo} está corrompido ({erro}); "
+                    "conversão interrompida.\n",
+                )
+            if opcoes.exportar:
+                salvar_dados(dados, caminho_arquivo)
+            else:
+                armazenamento.salvar(dados, caminho_arquivo)
+        print(f" {caminho_arquivo}: {len(dados)} registros convertidos.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,87 @@
 """Testes automatizados para o sistema de biblioteca."""
 
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List
 
 import pytest
 
-from emprestimos import devolver_livro, emprestar_livro, emprestimos_por_usuario
+import importacao
+import instrumentacao
+import persistencia
+import main
+import snapshot_binario
+from armazenamento_sqlite import ArmazenamentoSqlite, migrar_json_para_sqlite
+from benchmarks.carga_servidor import ClienteHttp
+from benchmarks import filiais as benchmark_filiais
+from benchmarks.dados_sinteticos import (
+    cpf_valido,
+    gerar_emprestimos,
+    gerar_livros,
+    gerar_usuarios,
+)
+from benchmarks.medicao import (
+    carregar_resultados,
+    comparar_resultados,
+    salvar_resultados,
+)
+from benchmarks.nucleo import executar
+from emprestimos import (
+    RegistroEmprestimos,
+    devolver_livro,
+    devolver_lote,
+    emprestar_livro,
+    emprestar_lote,
+    emprestimos_atrasados,
+    emprestimos_por_usuario,
+    realizar_devolucao,
+    realizar_emprestimo,
+)
+from filiais import CatalogoFederado, Filial, ler_filial
+from historico import HistoricoEmprestimos
+from importacao import importar_livros, importar_usuarios, ler_registros
 from livros import (
+    Acervo,
     buscar_livros_por_autor,
     buscar_livros_por_titulo,
     cadastrar_livro,
+    decrementar_exemplares_livro,
+    encontrar_livro_por_titulo,
+    listar_livros,
+    sugerir_titulos,
+    trava_do_titulo,
+)
+from normalizacao import normalizar
+from persistencia import (
+    ArmazenamentoJson,
+    CarregamentoEmSegundoPlano,
+    Diario,
+    adiar_gravacoes,
+    aplicar_alteracoes,
+    carregar_dados,
+    iterar_registros,
+    salvar_dados,
+)
+from registros import (
+    PRAZO_EMPRESTIMO_DIAS,
+    Emprestimo,
+    Livro,
+    texto_para_momento,
+)
+from servicos import ARQUIVO_EMPRESTIMOS, ARQUIVO_LIVROS, Biblioteca
+from servidor import ServidorBiblioteca
+from snapshot_binario import ArmazenamentoBinario, carregar_snapshot, salvar_snapshot
+from usuarios import (
+    CadastroUsuarios,
+    cadastrar_usuario,
+    encontrar_usuario_por_cpf,
+    registrar_usuario,
 )
-from usuarios import cadastrar_usuario
 
 
 def criar_iterador_entradas(valores: List[str]):
@@ -167,4 +238,1181 @@ def test_emprestimos_por_usuario() -> None:
     resultados = emprestimos_por_usuario(emprestimos, "111")
 
     assert len(resultados) == 2
-    assert all(emprestimo["cpf_usuario"] == "111" for emprestimo in resultados)
\ No newline at end of file
+    assert all(emprestimo["cpf_usuario"] == "111" for emprestimo in resultados)
+
+
+def test_acervo_indexa_titulos_adicionados() -> None:
+    acervo = Acervo(
+        [{"título": "Dom Casmurro", "autor": "Machado", "ano": 1899, "exemplares": 1}]
+    )
+    novo = {"título": "Iracema", "autor": "Alencar", "ano": 1865, "exemplares": 2}
+    acervo.append(novo)
+
+    assert encontrar_livro_por_titulo(acervo, "iracema") is novo
+    assert encontrar_livro_por_titulo(acervo, "DOM CASMURRO")["ano"] == 1899
+
+    acervo.remove(novo)
+
+    assert encontrar_livro_por_titulo(acervo, "Iracema") is None
+
+
+def test_cadastrar_usuario_com_cpf_repetido(monkeypatch: pytest.MonkeyPatch) -> None:
+    usuarios = CadastroUsuarios([{"nome": "Ana Maria", "cpf": "12345678901"}])
+    entradas = ["outra pessoa", "12345678901"]
+    monkeypatch.setattr("builtins.input", criar_iterador_entradas(entradas))
+
+    usuario = cadastrar_usuario(usuarios)
+
+    assert usuario is None
+    assert usuarios.adicionar({"nome": "Outra Pessoa", "cpf": "12345678901"}) is False
+    assert encontrar_usuario_por_cpf(usuarios, "12345678901")["nome"] == "Ana Maria"
+
+
+def test_busca_indexada_igual_a_busca_linear() -> None:
+    livros: List[Dict[str, int | str]] = [
+        {"título": "Python Básico", "autor": "Ana Souza", "ano": 2020, "exemplares": 1},
+        {"título": "Python Avançado", "autor": "João Lima", "ano": 2021, "exemplares": 2},
+        {"título": "Algoritmos", "autor": "Ana Lima", "ano": 2019, "exemplares": 1},
+    ]
+    acervo = Acervo(livros)
+    acervo.append(
+        {"título": "Estruturas Em Python", "autor": "Rui", "ano": 2022, "exemplares": 1}
+    )
+    livros = list(acervo)
+
+    for termo in ["python", "PY", "o", "lima", "ana l", "ritmo", "xyz", "  "]:
+        assert buscar_livros_por_titulo(acervo, termo) == buscar_livros_por_titulo(
+            livros, termo
+        )
+        assert buscar_livros_por_autor(acervo, termo) == buscar_livros_por_autor(
+            livros, termo
+        )
+
+
+def test_registro_emprestimos_devolucao_indexada(monkeypatch: pytest.MonkeyPatch) -> None:
+    livros = Acervo(
+        [{"título": "Livro Teste", "autor": "Autor", "ano": 2020, "exemplares": 0}]
+    )
+    emprestimos = RegistroEmprestimos(
+        [
+            {"cpf_usuario": "111", "titulo_livro": "A", "data_emprestimo": "2025-10-01"},
+            {
+                "cpf_usuario": "12345678901",
+                "titulo_livro": "Livro Teste",
+                "data_emprestimo": "2025-10-02",
+            },
+            {"cpf_usuario": "111", "titulo_livro": "C", "data_emprestimo": "2025-10-03"},
+        ]
+    )
+
+    entradas = ["12345678901", "livro teste"]
+    monkeypatch.setattr("builtins.input", criar_iterador_entradas(entradas))
+
+    assert devolver_livro(livros, emprestimos) is True
+    assert livros[0]["exemplares"] == 1
+    assert [emprestimo["titulo_livro"] for emprestimo in emprestimos] == ["A", "C"]
+    assert len(emprestimos_por_usuario(emprestimos, "111")) == 2
+    assert emprestimos_por_usuario(emprestimos, "12345678901") == []
+
+
+def test_diario_reaplica_alteracoes_na_carga(tmp_path) -> None:
+    caminho = str(tmp_path / "livros.json")
+    salvar_dados(
+        [{"título": "Livro A", "autor": "Autor", "ano": 2020, "exemplares": 2}], caminho
+    )
+    livros = Acervo(carregar_dados(caminho))
+    livros.diario = Diario(caminho, ("título",))
+
+    livros.append({"título": "Livro B", "autor": "Autor", "ano": 2021, "exemplares": 1})
+    decrementar_exemplares_livro("Livro A", livros)
+    livros.remove(livros[1])
+
+    assert carregar_dados(caminho) == [
+        {"título": "Livro A", "autor": "Autor", "ano": 2020, "exemplares": 1}
+    ]
+
+    # Depois de compactar, o retrato já tem tudo e o diário recomeça vazio
+    livros.diario.compactar(livros)
+
+    assert carregar_dados(caminho) == list(livros)
+    assert Diario(caminho, ("título",)).anotacoes == 0
+
+
+def test_gravacoes_adiadas_sao_feitas_uma_vez_no_final(tmp_path) -> None:
+    caminho = str(tmp_path / "usuarios.json")
+    usuarios = [{"nome": "Ana Maria", "cpf": "12345678901"}]
+
+    with adiar_gravacoes():
+        salvar_dados(usuarios, caminho)
+        usuarios.append({"nome": "Rui Lima", "cpf": "10987654321"})
+        salvar_dados(usuarios, caminho)
+        # Nada foi gravado ainda
+        assert carregar_dados(caminho) == []
+
+    assert carregar_dados(caminho) == usuarios
+    # Não sobra nenhum arquivo temporário na pasta
+    assert [arquivo.name for arquivo in tmp_path.iterdir()] == ["usuarios.json"]
+
+
+def test_armazenamento_sqlite_altera_so_a_linha_envolvida(tmp_path) -> None:
+    caminho_livros = str(tmp_path / "livros.json")
+    caminho_banco = str(tmp_path / "biblioteca.db")
+    salvar_dados(
+        [
+            {"título": "Livro A", "autor": "Autor", "ano": 2020, "exemplares": 2},
+            {"título": "Livro B", "autor": "Autor", "ano": 2021, "exemplares": 1},
+        ],
+        caminho_livros,
+    )
+
+    assert migrar_json_para_sqlite([caminho_livros], caminho_banco) == {
+        caminho_livros: 2
+    }
+
+    armazenamento = ArmazenamentoSqlite(caminho_banco)
+    livros = Acervo(armazenamento.carregar(caminho_livros))
+    livros.diario = armazenamento.abrir_diario(caminho_livros, ("título",))
+    decrementar_exemplares_livro("Livro A", livros)
+    livros.remove(livros[1])
+    armazenamento.fechar()
+
+    reaberto = ArmazenamentoSqlite(caminho_banco)
+    assert reaberto.carregar(caminho_livros) == [
+        {"título": "Livro A", "autor": "Autor", "ano": 2020, "exemplares": 1}
+    ]
+    reaberto.fechar()
+
+    # Um JSON corrompido interrompe a migração sem esvaziar a tabela
+    with open(caminho_livros, "r+b") as arquivo:
+        arquivo.truncate(os.path.getsize(caminho_livros) - 5)
+    with pytest.raises(ValueError):
+        migrar_json_para_sqlite([caminho_livros], caminho_banco)
+    reaberto = ArmazenamentoSqlite(caminho_banco)
+    assert len(reaberto.carregar(caminho_livros)) == 1
+    reaberto.fechar()
+
+
+def test_armazenamento_sqlite_confirma_um_lote_numa_transacao(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    biblioteca = Biblioteca(ArmazenamentoSqlite(str(tmp_path / "biblioteca.db")))
+    biblioteca.carregamento().carregar()
+    assert biblioteca.cadastrar_usuario("Ana Maria", "12345678901")
+    assert biblioteca.cadastrar_livro("Livro Teste", "Autor", "2020", "5")
+
+    comandos: List[str] = []
+    biblioteca.armazenamento.conexao.set_trace_callback(comandos.append)
+    pedidos = [("12345678901", "Livro Teste")] * 3
+    assert all(biblioteca.emprestar_lote(pedidos))
+    # Empréstimos, estoque e estatísticas: muitas linhas, uma confirmação
+    assert sum(comando.startswith("INSERT") for comando in comandos) > 3
+    assert comandos.count("COMMIT") == 1
+    biblioteca.fechar()
+
+    reaberto = ArmazenamentoSqlite(str(tmp_path / "biblioteca.db"))
+    assert len(reaberto.carregar(ARQUIVO_EMPRESTIMOS)) == 3
+    assert reaberto.carregar(ARQUIVO_LIVROS)[0]["exemplares"] == 2
+    reaberto.fechar()
+
+
+def test_iterar_registros_le_em_blocos_pequenos(tmp_path) -> None:
+    caminho = str(tmp_path / "emprestimos.json")
+    emprestimos = [
+        {"cpf_usuario": str(numero) * 11, "titulo_livro": f"Livro {numero}", "ano": 12345}
+        for numero in range(10)
+    ]
+    salvar_dados(emprestimos, caminho)
+
+    # Blocos de 7 caracteres cortam registros e números no meio
+    assert list(iterar_registros(caminho, tamanho_bloco=7)) == emprestimos
+
+    (tmp_path / "quebrado.json").write_text('[{"a": 1}, {"b": ', encoding="utf-8")
+    assert carregar_dados(str(tmp_path / "quebrado.json")) == []
+
+
+def test_carregamento_em_segundo_plano_liga_diario_no_final(tmp_path) -> None:
+    caminho = str(tmp_path / "usuarios.json")
+    salvar_dados([{"nome": "Ana Maria", "cpf": "12345678901"}], caminho)
+    usuarios = CadastroUsuarios()
+
+    carregamento = CarregamentoEmSegundoPlano(
+        ArmazenamentoJson(), {caminho: usuarios}, {caminho: ("cpf",)}
+    )
+    carregamento.iniciar()
+    carregamento.aguardar()
+
+    assert carregamento.concluido
+    assert encontrar_usuario_por_cpf(usuarios, "12345678901")["nome"] == "Ana Maria"
+    assert usuarios.diario.anotacoes == 0
+
+
+def test_carregamento_de_arquivo_corrompido_falha_em_vez_de_truncar(
+    tmp_path,
+) -> None:
+    caminho = str(tmp_path / "usuarios.json")
+    # O primeiro registro é válido; o arquivo se corrompe depois dele
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        arquivo.write('[{"nome": "Ana Maria", "cpf": "12345678901"}, {"nome": ')
+    usuarios = CadastroUsuarios()
+
+    carregamento = CarregamentoEmSegundoPlano(
+        ArmazenamentoJson(), {caminho: usuarios}, {caminho: ("cpf",)}
+    )
+    carregamento.iniciar()
+    with pytest.raises(json.JSONDecodeError):
+        carregamento.aguardar()
+    # Sem diário, a coleção pela metade nunca é compactada por cima do arquivo
+    assert usuarios.diario is None
+    with pytest.raises(json.JSONDecodeError):
+        list(ArmazenamentoJson().iterar(caminho))
+
+
+def test_snapshot_binario_corrompido_falha_em_vez_de_esvaziar(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    livros = [
+        {"título": "Iracema", "autor": "José De Alencar", "ano": 1865, "exemplares": 1},
+        {"título": "O Cortiço", "autor": "Aluísio Azevedo", "ano": 1890, "exemplares": 2},
+    ]
+    salvar_snapshot(livros, "livros.json.bin")
+    conteudo = (tmp_path / "livros.json.bin").read_bytes()
+
+    # Arquivo cortado no fim: a carga falha e nada é regravado por cima
+    (tmp_path / "livros.json.bin").write_bytes(conteudo[:-3])
+    biblioteca = Biblioteca(ArmazenamentoBinario())
+    with pytest.raises(ValueError):
+        biblioteca.carregamento().carregar()
+    assert (tmp_path / "livros.json.bin").read_bytes() == conteudo[:-3]
+
+    # Colunas com menos valores do que o cabeçalho diz também são recusadas
+    a_mais = conteudo.replace(b'"quantidade": 2', b'"quantidade": 3', 1)
+    assert a_mais != conteudo
+    (tmp_path / "livros.json.bin").write_bytes(a_mais)
+    with pytest.raises(ValueError):
+        carregar_snapshot("livros.json.bin")
+    (tmp_path / "livros.json.bin").write_bytes(b"XXXXXXXX" + conteudo[8:])
+    with pytest.raises(ValueError):
+        carregar_snapshot("livros.json.bin")
+
+    # A conversão de um JSON corrompido para antes de gravar o binário
+    salvar_snapshot(livros, "livros.json.bin")
+    (tmp_path / "livros.json").write_text('[{"título": "Ira', encoding="utf-8")
+    with pytest.raises(SystemExit):
+        snapshot_binario.main(["livros.json"])
+    assert carregar_snapshot("livros.json.bin") == livros
+
+    # Só o arquivo inexistente ou vazio vale como coleção vazia
+    assert carregar_snapshot("nao_existe.bin") == []
+    (tmp_path / "vazio.bin").write_bytes(b"")
+    assert carregar_snapshot("vazio.bin") == []
+
+
+def test_registros_compactos_mantem_formato_json(tmp_path) -> None:
+    emprestimo = Emprestimo.de_dict(
+        {
+            "cpf_usuario": "12345678901",
+            "titulo_livro": "Livro Teste",
+            "data_emprestimo": "2025-10-29 10:00:00",
+        }
+    )
+    livro = Livro("Livro Teste", "Autor", 2020, 1)
+    livro["exemplares"] -= 1
+
+    assert isinstance(emprestimo.momento_emprestimo, int)
+    assert emprestimo["data_emprestimo"] == "2025-10-29 10:00:00"
+    assert emprestimo.titulo_livro is livro.titulo
+    assert not hasattr(livro, "__dict__")
+
+    caminho = str(tmp_path / "emprestimos.json")
+    salvar_dados(RegistroEmprestimos([emprestimo]), caminho)
+    assert carregar_dados(caminho) == [emprestimo.para_dict()]
+
+
+def test_snapshot_binario_ida_e_volta(tmp_path) -> None:
+    caminho = str(tmp_path / "livros.json")
+    livros = [
+        Livro("Memórias Póstumas", "Machado De Assis", 1881, 2),
+        {"título": "Iracema", "autor": "José De Alencar", "ano": 1865, "exemplares": 0},
+    ]
+    armazenamento = ArmazenamentoBinario()
+    armazenamento.salvar(livros, caminho)
+
+    acervo = Acervo(armazenamento.carregar(caminho))
+    acervo.diario = armazenamento.abrir_diario(caminho, ("título",))
+    decrementar_exemplares_livro("Memórias Póstumas", acervo)
+
+    assert armazenamento.carregar(caminho) == [
+        {"título": "Memórias Póstumas", "autor": "Machado De Assis", "ano": 1881, "exemplares": 1},
+        livros[1],
+    ]
+
+    # Registros com campos diferentes também são guardados
+    misturados = [{"a": 1}, {"b": "x\0y"}]
+    salvar_snapshot(misturados, str(tmp_path / "misturados.bin"))
+    assert carregar_snapshot(str(tmp_path / "misturados.bin")) == misturados
+
+
+def test_importacao_em_lote_reaproveita_validacoes(tmp_path) -> None:
+    arquivo = tmp_path / "catalogo.csv"
+    arquivo.write_text(
+        "título,autor,ano,exemplares\n"
+        "dom casmurro,machado de assis,1899,2\n"
+        "iracema,josé de alencar,ano ruim,1\n"
+        "DOM CASMURRO,machado de assis,1899,3\n"
+        "o cortiço,aluísio azevedo,1890,1\n",
+        encoding="utf-8",
+    )
+    livros: List[Dict[str, int | str]] = [
+        {"título": "O Cortiço", "autor": "Aluísio Azevedo", "ano": 1890, "exemplares": 1}
+    ]
+
+    resumo = importar_livros(livros, ler_registros(str(arquivo)))
+
+    assert (resumo.incluidos, resumo.mesclados, resumo.recusados) == (1, 2, 1)
+    assert livros[0]["exemplares"] == 2
+    assert livros[1] == {
+        "título": "Dom Casmurro",
+        "autor": "Machado De Assis",
+        "ano": 1899,
+        "exemplares": 5,
+    }
+
+    usuarios = tmp_path / "usuarios.jsonl"
+    usuarios.write_text(
+        '{"nome": "ana maria", "cpf": "12345678901"}\n'
+        '{"nome": "rui", "cpf": 12345678901}\n',
+        encoding="utf-8",
+    )
+    lista_usuarios: List[Dict[str, str]] = []
+    resumo = importar_usuarios(lista_usuarios, ler_registros(str(usuarios)))
+
+    assert (resumo.incluidos, resumo.recusados) == (1, 1)
+    assert lista_usuarios == [{"nome": "Ana Maria", "cpf": "12345678901"}]
+
+
+def test_emprestimos_e_devolucoes_em_lote() -> None:
+    usuarios = [
+        {"nome": "Ana Maria", "cpf": "12345678901"},
+        {"nome": "Rui Lima", "cpf": "10987654321"},
+    ]
+    livros = [{"título": "Livro Teste", "autor": "Autor", "ano": 2020, "exemplares": 1}]
+    emprestimos: List[Dict[str, str]] = []
+
+    resultados = emprestar_lote(
+        usuarios,
+        livros,
+        emprestimos,
+        [
+            ("12345678901", "livro teste"),
+            ("10987654321", "Livro Teste"),
+            ("00000000000", "Livro Teste"),
+            ("10987654321", "Outro Livro"),
+        ],
+    )
+
+    # O único exemplar fica com o primeiro pedido; os outros são recusados
+    assert [resultado.sucesso for resultado in resultados] == [True, False, False, False]
+    assert resultados[1].mensagem == "Não há exemplares disponíveis para empréstimo!"
+    assert resultados[0].registro is emprestimos[0]
+    assert livros[0]["exemplares"] == 0
+
+    resultados = devolver_lote(
+        livros, emprestimos, [("10987654321", "Livro Teste"), ("12345678901", "LIVRO TESTE")]
+    )
+
+    assert [bool(resultado) for resultado in resultados] == [False, True]
+    assert emprestimos == []
+    assert livros[0]["exemplares"] == 1
+
+
+def test_biblioteca_opera_sem_console(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    # Qualquer leitura do teclado faz o teste falhar
+    monkeypatch.setattr("builtins.input", lambda _: pytest.fail("usou o console"))
+    biblioteca = Biblioteca(ArmazenamentoJson(usar_diario=False))
+
+    assert biblioteca.cadastrar_usuario("ana maria", "12345678901")
+    recusado = biblioteca.cadastrar_usuario("Rui Lima", "12345678901")
+    assert recusado.mensagem == "CPF já cadastrado! Cada usuário deve ter um CPF único."
+    assert biblioteca.cadastrar_livro("livro teste", "autor", "2020", "1")
+
+    resultado = biblioteca.emprestar("12345678901", "LIVRO TESTE")
+    assert resultado.mensagem == "Empréstimo realizado com sucesso para Ana Maria!"
+    assert not biblioteca.emprestar("12345678901", "Livro Teste")
+    assert carregar_dados(ARQUIVO_LIVROS)[0]["exemplares"] == 0
+    assert len(carregar_dados(ARQUIVO_EMPRESTIMOS)) == 1
+
+    assert biblioteca.devolver("12345678901", "livro teste")
+    assert carregar_dados(ARQUIVO_EMPRESTIMOS) == []
+
+
+def test_servidor_nao_empresta_o_ultimo_exemplar_duas_vezes(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    biblioteca = Biblioteca(ArmazenamentoJson())
+    biblioteca.cadastrar_usuario("Ana Maria", "12345678901")
+    biblioteca.cadastrar_usuario("Rui Lima", "10987654321")
+    biblioteca.cadastrar_livro("Livro Teste", "Autor", "2020", "1")
+
+    async def disputar():
+        servidor = ServidorBiblioteca(biblioteca)
+        conexoes = await servidor.iniciar("127.0.0.1", 0)
+        porta = conexoes.sockets[0].getsockname()[1]
+        clientes = [ClienteHttp("127.0.0.1", porta) for _ in range(3)]
+        try:
+            return await asyncio.gather(
+                *(
+                    cliente.requisitar(
+                        "POST", "/emprestimos", {"cpf": cpf, "titulo": "livro teste"}
+                    )
+                    for cliente, cpf in zip(clientes, ("12345678901", "10987654321"))
+                ),
+                clientes[2].requisitar("GET", "/rota/inexistente"),
+            )
+        finally:
+            for cliente in clientes:
+                await cliente.fechar()
+            conexoes.close()
+            servidor.fechar()
+
+    *emprestimos, inexistente = asyncio.run(disputar())
+
+    assert sorted(status for status, _ in emprestimos) == [201, 409]
+    assert inexistente[0] == 404
+    assert biblioteca.livros[0]["exemplares"] == 0
+    assert len(biblioteca.emprestimos) == 1
+
+
+class LivroLento(Livro):
+    """Livro que cede a vez a outra thread a cada leitura de campo."""
+
+    __slots__ = ()
+
+    def __getitem__(self, campo: str):
+        time.sleep(0)
+        return super().__getitem__(campo)
+
+
+def test_emprestimos_simultaneos_nao_vendem_exemplares_a_mais() -> None:
+    usuarios = CadastroUsuarios(
+        {"nome": "Leitor", "cpf": f"{numero:011d}"} for numero in range(200)
+    )
+    # Entre conferir o estoque e diminuir, outra thread sempre pode entrar
+    livros = Acervo(
+        LivroLento(f"Livro {numero}", "Autor", 2020, 3) for numero in range(4)
+    )
+    emprestimos = RegistroEmprestimos()
+    pedidos = [
+        (usuario["cpf"], f"Livro {numero % 4}") for numero, usuario in enumerate(usuarios)
+    ]
+    largada = threading.Barrier(8)
+
+    def emprestar(pedido):
+        return realizar_emprestimo(usuarios, livros, emprestimos, *pedido).sucesso
+
+    def devolver(pedido):
+        return realizar_devolucao(livros, emprestimos, *pedido).sucesso
+
+    with ThreadPoolExecutor(8, initializer=largada.wait) as executor:
+        emprestados = sum(executor.map(emprestar, pedidos))
+        # Cada pedido de devolução vem duas vezes: só uma pode valer
+        devolvidos = sum(executor.map(devolver, pedidos + pedidos))
+
+    assert emprestados == 4 * 3
+    assert devolvidos == emprestados
+    assert [livro["exemplares"] for livro in livros] == [3, 3, 3, 3]
+    assert len(emprestimos) == 0
+
+
+def test_gravacoes_adiadas_sao_separadas_por_thread(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    caminho = str(tmp_path / "livros.json")
+    diario = Diario(caminho, ("título",))
+    gravar_linhas = persistencia._acrescentar_linhas
+
+    # As linhas adiadas vão para o diário com a trava dele
+    def acrescentar_conferindo_trava(caminho_diario: str, linhas: List[str]) -> None:
+        assert diario.trava._nivel > 0
+        gravar_linhas(caminho_diario, linhas)
+
+    monkeypatch.setattr(
+        persistencia, "_acrescentar_linhas", acrescentar_conferindo_trava
+    )
+    bloco_aberto = threading.Event()
+    pode_terminar = threading.Event()
+
+    def outra_thread() -> None:
+        with adiar_gravacoes():
+            diario.anotar("adicionar", {"título": "A"}, [])
+            bloco_aberto.set()
+            pode_terminar.wait(5)
+            diario.anotar("adicionar", {"título": "C"}, [])
+
+    def titulos() -> List[str]:
+        return [livro["título"] for livro in carregar_dados(caminho)]
+
+    thread = threading.Thread(target=outra_thread)
+    thread.start()
+    bloco_aberto.wait(5)
+    # O bloco desta thread grava só o que é dela, sem mexer no da outra
+    with adiar_gravacoes():
+        diario.anotar("adicionar", {"título": "B"}, [])
+    assert titulos() == ["B"]
+    pode_terminar.set()
+    thread.join()
+    assert titulos() == ["B", "A", "C"]
+
+
+def test_travas_internas_so_sao_pegas_depois_da_do_diario(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    biblioteca = Biblioteca(ArmazenamentoJson())
+    biblioteca.carregamento().carregar()
+    assert biblioteca.cadastrar_usuario("Ana Maria", "12345678901")
+    assert biblioteca.cadastrar_livro("Livro Teste", "Autor", "2020", "2")
+
+    # Ninguém anota no diário segurando a trava do estoque do livro
+    estoque_travado: List[bool] = []
+    anotar = Diario.anotar
+
+    def anotar_conferindo(self, operacao, registro, colecao) -> None:
+        estoque_travado.append(trava_do_titulo("Livro Teste").locked())
+        anotar(self, operacao, registro, colecao)
+
+    monkeypatch.setattr(Diario, "anotar", anotar_conferindo)
+
+    # E as travas internas só entram com a do diário já obtida
+    class TravaConferida:
+        def __init__(self, trava, diario) -> None:
+            self.trava, self.diario = trava, diario
+
+        def __enter__(self) -> None:
+            assert self.diario.trava._nivel > 0
+            self.trava.acquire()
+
+        def __exit__(self, *erro) -> None:
+            self.trava.release()
+
+    for colecao in (biblioteca.emprestimos, biblioteca.estatisticas):
+        colecao._trava = TravaConferida(colecao._trava, colecao.diario)
+
+    # Fora de uma sessão, ninguém pegou as travas dos diários antes
+    pedidos = [("12345678901", "Livro Teste")] * 2
+    resultados = emprestar_lote(
+        biblioteca.usuarios, biblioteca.livros, biblioteca.emprestimos, pedidos
+    )
+    assert all(resultados)
+    livro = biblioteca.livros.buscar_por_titulo("Livro Teste")
+    biblioteca.estatisticas.registrar_emprestimo(resultados[0].registro, livro)
+    assert all(devolver_lote(biblioteca.livros, biblioteca.emprestimos, pedidos))
+    assert livro["exemplares"] == 2
+    assert estoque_travado and not any(estoque_travado)
+
+
+def test_dois_processos_compartilham_os_mesmos_arquivos(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    # Cada biblioteca faz o papel de um terminal diferente
+    primeira = Biblioteca(ArmazenamentoJson())
+    primeira.carregamento().carregar()
+    assert primeira.cadastrar_usuario("Ana Maria", "12345678901")
+    assert primeira.cadastrar_livro("Livro Teste", "Autor", "2020", "1")
+    segunda = Biblioteca(ArmazenamentoJson())
+    segunda.carregamento().carregar()
+
+    # A primeira leva o último exemplar; a segunda fica sabendo antes de tentar
+    assert primeira.emprestar("12345678901", "Livro Teste")
+    assert not segunda.emprestar("12345678901", "Livro Teste")
+    assert segunda.livros[0]["exemplares"] == 0
+    assert len(segunda.emprestimos) == 1
+
+    # O que a segunda grava chega à primeira, sem repetir o que ela mesma fez
+    assert segunda.cadastrar_usuario("Rui Lima", "10987654321")
+    primeira.sincronizar()
+    assert [usuario["cpf"] for usuario in primeira.usuarios] == [
+        "12345678901",
+        "10987654321",
+    ]
+    assert len(primeira.emprestimos) == 1
+
+    # Depois que a primeira compacta, a segunda recarrega o retrato novo
+    assert primeira.devolver("12345678901", "Livro Teste")
+    primeira.salvar_tudo()
+    assert segunda.emprestar("10987654321", "livro teste")
+    assert [
+        emprestimo["cpf_usuario"] for emprestimo in segunda.emprestimos
+    ] == ["10987654321"]
+    primeira.sincronizar()
+    assert len(primeira.emprestimos) == 1
+    assert primeira.livros[0]["exemplares"] == 0
+
+
+def test_sincronizar_localiza_pelos_indices_sem_reindexar(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    livros = [
+        Livro(f"Livro {numero}", f"Autor {numero % 7}", 2000 + numero, 1)
+        for numero in range(300)
+    ]
+    acervo = Acervo(livros)
+    acervo.append(Livro("Livro 5", "Outro Autor", 1999, 3))
+    acervo.ordenados("ano")
+    emprestimos = RegistroEmprestimos(
+        [Emprestimo("12345678901", "Livro 1", texto_para_momento("2025-03-01"))]
+    )
+
+    # Atualizações e remoções vindas de outro terminal não refazem os índices
+    def reindexar() -> None:
+        raise AssertionError("índices refeitos do zero")
+
+    monkeypatch.setattr(acervo, "_reindexar", reindexar)
+    aplicar_alteracoes(
+        acervo,
+        [
+            {"op": "atualizar", "registro": {**livros[2].para_dict(), "exemplares": 0}},
+            {"op": "remover", "registro": livros[5].para_dict()},
+            {"op": "remover", "registro": livros[7].para_dict()},
+        ],
+        ("título",),
+    )
+    aplicar_alteracoes(
+        emprestimos,
+        [{"op": "remover", "registro": next(iter(emprestimos)).para_dict()}],
+        ("cpf_usuario", "titulo_livro", "data_emprestimo"),
+    )
+
+    assert livros[2]["exemplares"] == 0
+    assert len(emprestimos) == 0
+    # O repetido passa a ser o achado pelo título; o removido some das buscas
+    assert encontrar_livro_por_titulo(acervo, "livro 5")["autor"] == "Outro Autor"
+    assert encontrar_livro_por_titulo(acervo, "Livro 7") is None
+    assert acervo.ordenados("ano", 0, 2) == [acervo[-1], livros[0]]
+    restantes = list(acervo)
+    for termo in ["livro 7", "autor 5", "o 1", "5"]:
+        assert buscar_livros_por_titulo(acervo, termo) == buscar_livros_por_titulo(
+            restantes, termo
+        )
+        assert buscar_livros_por_autor(acervo, termo) == buscar_livros_por_autor(
+            restantes, termo
+        )
+
+    # Com muitas remoções os índices são refeitos, e as buscas continuam certas
+    monkeypatch.undo()
+    for livro in restantes[::2]:
+        acervo.remove(livro)
+    restantes = list(acervo)
+    assert len(restantes) == 149
+    assert buscar_livros_por_titulo(acervo, "livro 1") == buscar_livros_por_titulo(
+        restantes, "livro 1"
+    )
+    assert acervo.ordenados("ano") == sorted(restantes, key=lambda livro: livro["ano"])
+
+
+def test_importacao_trava_a_colecao_e_terminal_aberto_continua_gravando(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    fcntl = pytest.importorskip("fcntl")
+    monkeypatch.chdir(tmp_path)
+    terminal = Biblioteca(ArmazenamentoJson())
+    terminal.carregamento().carregar()
+    assert terminal.cadastrar_livro("Dom Casmurro", "Machado", "1899", "1")
+    (tmp_path / "catalogo.csv").write_text(
+        "título,autor,ano,exemplares\niracema,josé de alencar,1865,2\n",
+        encoding="utf-8",
+    )
+
+    # Na gravação do lote, a trava da coleção continua com a importação
+    salvar = ArmazenamentoJson.salvar
+
+    def salvar_conferindo_trava(self, dados, caminho_arquivo: str) -> None:
+        with open(caminho_arquivo + ".trava", "a+b") as arquivo:
+            with pytest.raises(BlockingIOError):
+                fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        salvar(self, dados, caminho_arquivo)
+
+    monkeypatch.setattr(ArmazenamentoJson, "salvar", salvar_conferindo_trava)
+    importacao.main(["livros", "catalogo.csv"])
+    monkeypatch.undo()
+    monkeypatch.chdir(tmp_path)
+
+    # O terminal recebe o retrato novo e o que ele grava depois não se perde
+    assert terminal.cadastrar_livro("Helena", "Machado", "1876", "1")
+    assert [livro["título"] for livro in terminal.livros] == [
+        "Dom Casmurro",
+        "Iracema",
+        "Helena",
+    ]
+    outro = Biblioteca(ArmazenamentoJson())
+    outro.carregamento().carregar()
+    assert list(outro.livros) == list(terminal.livros)
+
+
+def test_importacao_para_se_a_colecao_estiver_corrompida(
+    tmp_path, monkeypatch: pytest.MonkeyPatch, capsys
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    salvar_dados(
+        [
+            {"título": "Iracema", "autor": "José", "ano": 1865, "exemplares": 1},
+            {"título": "Helena", "autor": "Machado", "ano": 1876, "exemplares": 1},
+        ],
+        "livros.json",
+    )
+    cortado = (tmp_path / "livros.json").read_bytes()[:-10]
+    (tmp_path / "livros.json").write_bytes(cortado)
+    (tmp_path / "catalogo.csv").write_text(
+        "título,autor,ano,exemplares\ndom casmurro,machado,1899,2\n",
+        encoding="utf-8",
+    )
+
+    for tipo in ("json", "diario"):
+        with pytest.raises(SystemExit) as saida:
+            importacao.main(["livros", "catalogo.csv", "--armazenamento", tipo])
+        assert saida.value.code == 1
+        assert "corrompido" in capsys.readouterr().err
+        assert (tmp_path / "livros.json").read_bytes() == cortado
+
+
+def test_listagem_em_paginas_usa_ordens_mantidas(capsys) -> None:
+    acervo = Acervo(
+        [
+            Livro("Cem Anos", "Gabriel", 1967, 1),
+            Livro("Aurora", "Zilda", 2001, 1),
+            Livro("Brás Cubas", "Machado", 1881, 1),
+        ]
+    )
+    assert [livro["ano"] for livro in acervo.ordenados("ano")] == [1881, 1967, 2001]
+
+    # Depois de montada, a ordem recebe os novos e perde os removidos
+    acervo.append(Livro("Abc", "Ana", 1990, 1))
+    acervo.remove(acervo[0])
+    assert [livro["título"] for livro in acervo.ordenados("titulo", 1, 2)] == [
+        "Aurora",
+        "Brás Cubas",
+    ]
+    assert [livro["autor"] for livro in acervo.ordenados("autor", 0, 2, True)] == [
+        "Zilda",
+        "Machado",
+    ]
+    with pytest.raises(ValueError):
+        acervo.ordenados("exemplares")
+
+    listar_livros(acervo, inicio=2, quantidade=5, ordem="titulo")
+    linhas = capsys.readouterr().out.splitlines()
+    assert linhas[2] == (
+        "3. Título: Brás Cubas | Autor: Machado | Ano: 1881 | Exemplares: 1"
+    )
+    assert len(linhas) == 5
+
+    registro = RegistroEmprestimos()
+    emprestimos = [
+        Emprestimo("1", "Aurora", texto_para_momento(data))
+        for data in ("2024-03-01", "2024-01-01", "2024-02-01")
+    ]
+    registro.extend(emprestimos)
+    assert registro.ordenados("data") == [
+        emprestimos[1],
+        emprestimos[2],
+        emprestimos[0],
+    ]
+    registro.remover(emprestimos[1])
+    registro.append(Emprestimo("2", "Abc", texto_para_momento("2023-12-31")))
+    recentes = registro.ordenados("data", 0, 2, decrescente=True)
+    assert recentes == [emprestimos[0], emprestimos[2]]
+    assert registro.pagina(1, 1) == [emprestimos[2]]
+
+
+def test_emprestimos_atrasados_saem_do_heap_de_vencimentos() -> None:
+    dia = 24 * 60 * 60
+    inicio = texto_para_momento("2025-01-01")
+    registro = RegistroEmprestimos()
+    emprestimos = [
+        Emprestimo(f"{numero:011d}", "Livro", inicio + numero * dia)
+        for numero in range(100)
+    ]
+    registro.extend(reversed(emprestimos))
+    # Empréstimos do formato antigo vencem depois do prazo padrão
+    antigo = {
+        "cpf_usuario": "1",
+        "titulo_livro": "Velho",
+        "data_emprestimo": "2024-12-01",
+    }
+    registro.append(antigo)
+    assert emprestimos[0]["data_vencimento"] == "2025-01-15 00:00:00"
+
+    momento = inicio + (PRAZO_EMPRESTIMO_DIAS + 3) * dia + 1
+    assert registro.vencidos(momento) == [antigo, *emprestimos[:4]]
+    for emprestimo in emprestimos[:70]:
+        registro.remover(emprestimo)
+    assert registro.vencidos(momento) == [antigo]
+    registro.remover(antigo)
+    assert registro.proximo_vencimento() is emprestimos[70]
+    assert emprestimos_atrasados(list(registro), momento + 2 * dia) == []
+    assert emprestimos_atrasados(registro, momento + 100 * dia) == emprestimos[70:]
+
+
+def test_busca_ignora_acentos_e_maiusculas() -> None:
+    livros = [
+        Livro("Memórias Póstumas De Brás Cubas", "Machado De Assis", 1881, 1),
+        Livro("O Cortiço", "Aluísio Azevedo", 1890, 1),
+        Livro("Vidas Secas", "Graciliano Ramos", 1938, 1),
+    ]
+    acervo = Acervo(livros)
+
+    for lista in (acervo, livros):
+        assert buscar_livros_por_titulo(lista, "bras cubas") == [livros[0]]
+        assert buscar_livros_por_titulo(lista, "CORTICO") == [livros[1]]
+        assert buscar_livros_por_autor(lista, "aluisio") == [livros[1]]
+        assert buscar_livros_por_autor(lista, " ASSÍS ") == [livros[0]]
+    assert normalizar("Ação ﬁnal Straße") == "acao final strasse"
+
+
+def test_titulo_com_erro_de_digitacao_recebe_sugestoes() -> None:
+    livros = [
+        Livro("Dom Casmurro", "Machado De Assis", 1899, 1),
+        Livro("Memórias Póstumas De Brás Cubas", "Machado De Assis", 1881, 1),
+        Livro("O Cortiço", "Aluísio Azevedo", 1890, 1),
+    ]
+    acervo = Acervo(livros)
+    usuarios = CadastroUsuarios([{"nome": "Ana", "cpf": "12345678901"}])
+
+    for lista in (acervo, livros):
+        assert sugerir_titulos(lista, "dom casmuro") == ["Dom Casmurro"]
+        assert sugerir_titulos(lista, "memorias postumas") == [
+            "Memórias Póstumas De Brás Cubas"
+        ]
+        assert sugerir_titulos(lista, "xyz") == []
+
+    resultado = realizar_emprestimo(
+        usuarios, acervo, RegistroEmprestimos(), "12345678901", "O Corticu"
+    )
+    assert not resultado
+    assert resultado.mensagem.endswith("Você quis dizer: 'O Cortiço'?")
+    resultado = realizar_devolucao(
+        acervo, RegistroEmprestimos(), "12345678901", "Cortico"
+    )
+    assert resultado.mensagem.endswith("Você quis dizer: 'O Cortiço'?")
+
+
+def test_gerador_sintetico_e_suite_de_benchmarks(tmp_path) -> None:
+    usuarios = gerar_usuarios(500, semente=7)
+    livros = gerar_livros(300, semente=7)
+    emprestimos = gerar_emprestimos(usuarios, livros, 2000, semente=7)
+
+    # Reproduzível, com CPFs válidos e distintos e nomes aceitos no cadastro
+    assert gerar_usuarios(500, semente=7) == usuarios
+    assert all(cpf_valido(usuario["cpf"]) for usuario in usuarios)
+    assert len({usuario["cpf"] for usuario in usuarios}) == 500
+    cadastro = CadastroUsuarios()
+    assert all(registrar_usuario(cadastro, **usuario) for usuario in usuarios)
+    assert len({livro["título"] for livro in livros}) == 300
+    # Popularidade desigual: o título mais emprestado passa muito da média
+    contagem = Counter(emprestimo["titulo_livro"] for emprestimo in emprestimos)
+    assert contagem.most_common(1)[0][1] > 20 * len(emprestimos) / len(livros)
+
+    resultados = executar(
+        [200], quantidade=20, operacoes=("emprestar", "buscar_titulo")
+    )
+    assert [resultado["operacao"] for resultado in resultados] == [
+        "emprestar",
+        "buscar_titulo",
+    ]
+    assert all(resultado["p99_ms"] >= resultado["p50_ms"] for resultado in resultados)
+    caminho = salvar_resultados(resultados, str(tmp_path), "nucleo")
+    assert len(comparar_resultados(resultados, carregar_resultados(caminho))) == 2
+
+
+def test_instrumentacao_mede_a_sessao_do_menu(
+    tmp_path, monkeypatch: pytest.MonkeyPatch, capsys
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    entradas = ["1", "Ana", "12345678901", "3", "Dom Casmurro", "Machado", "1899"]
+    entradas += ["2", "6", "2", "machado", "12", "10"]
+    monkeypatch.setattr("builtins.input", criar_iterador_entradas(entradas))
+    try:
+        main.main(["--instrumentar", "--perfil", str(tmp_path / "sessao")])
+        metricas = instrumentacao.desativar()
+    finally:
+        instrumentacao.desativar()
+
+    saida = capsys.readouterr().out
+    assert "=== Relatório de desempenho ===" in saida
+    assert metricas.eventos["menu.opcao_6"] == 1
+    assert metricas.latencias["biblioteca.cadastrar_usuario"].chamadas == 1
+    assert metricas.latencias["livros.buscar_livros_por_autor"].chamadas == 1
+    assert metricas.bytes_gravados["usuarios.json.diario"] > 0
+    assert metricas.bytes_gravados["usuarios.json"] > 0
+    for extensao in (".prof", ".perfil.txt", ".memoria.txt"):
+        assert (tmp_path / f"sessao{extensao}").stat().st_size > 0
+
+    # Desligada, nada é registrado
+    assert buscar_livros_por_autor([], "ana") == []
+    assert instrumentacao.metricas_ativas() is None
+    assert instrumentacao.relatorio()[0].startswith(" Instrumentação desligada")
+
+
+def test_estatisticas_de_circulacao_mantidas_e_gravadas(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    primeira = Biblioteca(ArmazenamentoJson())
+    primeira.carregamento().carregar()
+    assert primeira.cadastrar_usuario("Ana Maria", "12345678901")
+    assert primeira.cadastrar_usuario("Rui Lima", "10987654321")
+    assert primeira.cadastrar_livro("Dom Casmurro", "Machado", "1899", "2")
+    assert primeira.cadastrar_livro("Iracema", "Alencar", "1865", "1")
+    segunda = Biblioteca(ArmazenamentoJson())
+    segunda.carregamento().carregar()
+
+    # Os dois terminais somam nos mesmos contadores
+    assert primeira.emprestar("12345678901", "Iracema")
+    assert primeira.devolver("12345678901", "Iracema")
+    assert all(
+        segunda.emprestar_lote(
+            [("12345678901", "Dom Casmurro"), ("10987654321", "Dom Casmurro")]
+        )
+    )
+    assert segunda.emprestar("10987654321", "Iracema")
+    primeira.sincronizar()
+
+    for biblioteca in (primeira, segunda):
+        estatisticas = biblioteca.estatisticas
+        assert estatisticas.geral()["emprestimos"] == 4
+        assert estatisticas.geral()["devolucoes"] == 1
+        titulos = estatisticas.mais_emprestados("titulo")
+        assert [
+            (contador["chave"], contador["emprestimos"]) for contador in titulos
+        ] == [("Dom Casmurro", 2), ("Iracema", 2)]
+        assert estatisticas.mais_emprestados("usuario")[0]["chave"] == "10987654321"
+        assert estatisticas.contador("ano", 1865)["devolucoes"] == 1
+
+    # Um terminal novo lê os contadores gravados, sem recontar nada
+    terceira = Biblioteca(ArmazenamentoJson())
+    terceira.carregamento().carregar()
+    assert terceira.estatisticas.contador("autor", "Machado")["emprestimos"] == 2
+    assert [
+        contador["chave"] for contador in terceira.estatisticas.mais_emprestados("ano")
+    ] == ["1865", "1899"]
+
+
+def test_historico_separa_devolucoes_por_mes(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    historico = HistoricoEmprestimos(str(tmp_path / "historico"))
+    devolucoes = ["2025-01-31 23:59:59", "2025-02-01 00:00:00", "2025-03-15 10:00:00"]
+    for numero, data in enumerate(devolucoes):
+        emprestimo = Emprestimo(
+            f"1234567890{numero}", "Livro Teste", texto_para_momento("2025-01-10")
+        )
+        historico.arquivar(emprestimo, texto_para_momento(data))
+
+    # Um arquivo por mês, e a consulta só abre os meses do período
+    assert len(list((tmp_path / "historico").iterdir())) == 3
+    assert historico.particoes("2025-02-01", "2025-02-28") == [
+        historico.caminho_particao("2025-02")
+    ]
+    fevereiro = historico.consultar("2025-02-01", "2025-02-28")
+    assert [registro["data_devolucao"] for registro in fevereiro] == [devolucoes[1]]
+    assert fevereiro[0]["data_vencimento"] == "2025-01-24 00:00:00"
+    # O fim vale até o último instante do dia ou do mês
+    assert len(historico.consultar("2025-01-31", "2025-03")) == 3
+    assert historico.consultar("2025-01", "2025-03", cpf="12345678902") == [
+        {**fevereiro[0], "cpf_usuario": "12345678902", "data_devolucao": devolucoes[2]}
+    ]
+    assert historico.consultar("2024-01", "2024-12") == []
+    with pytest.raises(ValueError):
+        historico.consultar("15/03/2025", "2025-03")
+    # Mês ou dia que não existem são recusados (antes, "2025-13" travava)
+    for inicio, fim in (("2025-13", "2026-01"), ("2025-00", "2025-01")):
+        with pytest.raises(ValueError):
+            historico.consultar(inicio, fim)
+    with pytest.raises(ValueError):
+        historico.consultar("2025-02-30", "2025-03")
+    assert historico.particoes("2024-11", "2025-13") == [
+        historico.caminho_particao(mes) for mes in ("2025-01", "2025-02", "2025-03")
+    ]
+
+    # A biblioteca arquiva cada devolução feita pelo menu
+    monkeypatch.chdir(tmp_path)
+    biblioteca = Biblioteca(ArmazenamentoJson())
+    biblioteca.carregamento().carregar()
+    assert biblioteca.cadastrar_usuario("Ana Maria", "12345678901")
+    assert biblioteca.cadastrar_livro("Livro Teste", "Autor", "2020", "1")
+    assert biblioteca.emprestar("12345678901", "Livro Teste")
+    assert biblioteca.devolver("12345678901", "Livro Teste")
+    assert len(biblioteca.emprestimos) == 0
+    hoje = time.strftime("%Y-%m-%d")
+    arquivados = biblioteca.historico.consultar(hoje, hoje)
+    assert [registro["cpf_usuario"] for registro in arquivados] == ["12345678901"]
+
+
+def test_menu_so_espera_a_carga_nas_opcoes_que_usam_os_dados(
+    tmp_path, monkeypatch: pytest.MonkeyPatch, capsys
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    salvar_dados([{"nome": "Ana Maria", "cpf": "12345678901"}], "usuarios.json")
+    antes = (tmp_path / "usuarios.json").read_bytes()
+
+    # A carga fica presa até o fim do teste
+    liberar = threading.Event()
+    iterar = ArmazenamentoJson.iterar
+
+    def iterar_devagar(self, caminho_arquivo: str):
+        liberar.wait(5)
+        return iterar(self, caminho_arquivo)
+
+    def salvar_tudo(self) -> None:
+        raise AssertionError("regravou coleções carregadas pela metade")
+
+    # Guarda a carga para esperar a thread antes de sair da pasta do teste
+    carregamentos: List[CarregamentoEmSegundoPlano] = []
+    criar_carregamento = Biblioteca.carregamento
+
+    def carregamento(self) -> CarregamentoEmSegundoPlano:
+        carregamentos.append(criar_carregamento(self))
+        return carregamentos[-1]
+
+    monkeypatch.setattr(ArmazenamentoJson, "iterar", iterar_devagar)
+    monkeypatch.setattr(Biblioteca, "salvar_tudo", salvar_tudo)
+    monkeypatch.setattr(Biblioteca, "carregamento", carregamento)
+    entradas = ["12", "14", "2025-01", "2025-01", "", "10"]
+    monkeypatch.setattr("builtins.input", criar_iterador_entradas(entradas))
+    try:
+        main.main(["--carga-em-segundo-plano"])
+        saida = capsys.readouterr().out
+    finally:
+        liberar.set()
+        for carga in carregamentos:
+            carga.aguardar()
+
+    assert "Aguarde" not in saida
+    assert "Encerrando o programa" in saida
+    assert (tmp_path / "usuarios.json").read_bytes() == antes
+
+
+def test_sessao_do_menu_fecha_o_armazenamento_mesmo_com_erro(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    fechados: List[Biblioteca] = []
+    fechar = Biblioteca.fechar
+
+    def fechar_anotando(self) -> None:
+        fechados.append(self)
+        fechar(self)
+
+    monkeypatch.setattr(Biblioteca, "fechar", fechar_anotando)
+    # As entradas acabam antes de escolher Sair: o input levanta um erro
+    monkeypatch.setattr("builtins.input", criar_iterador_entradas(["99"]))
+    with pytest.raises(IndexError):
+        main.main(["--armazenamento", "sqlite"])
+    assert len(fechados) == 1
+
+
+def test_historico_chega_ao_disco_antes_da_remocao_do_emprestimo(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    biblioteca = Biblioteca(ArmazenamentoJson())
+    biblioteca.carregamento().carregar()
+    assert biblioteca.cadastrar_usuario("Ana Maria", "12345678901")
+    assert biblioteca.cadastrar_livro("Livro Teste", "Autor", "2020", "3")
+    for _ in range(3):
+        assert biblioteca.emprestar("12345678901", "Livro Teste")
+
+    gravados: List[str] = []
+    acrescentar = persistencia._acrescentar_linhas
+    gravar = persistencia.gravar_arquivo_atomico
+
+    def acrescentar_anotando(caminho: str, linhas: List[str]) -> None:
+        gravados.append(caminho)
+        acrescentar(caminho, linhas)
+
+    def gravar_anotando(caminho: str, escrever) -> None:
+        gravados.append(caminho)
+        gravar(caminho, escrever)
+
+    monkeypatch.setattr(persistencia, "_acrescentar_linhas", acrescentar_anotando)
+    monkeypatch.setattr(persistencia, "gravar_arquivo_atomico", gravar_anotando)
+
+    def primeira_gravacao_dos_emprestimos() -> int:
+        return next(
+            posicao
+            for posicao, caminho in enumerate(gravados)
+            if os.path.basename(caminho).startswith(ARQUIVO_EMPRESTIMOS)
+        )
+
+    # Pelo diário: a linha do histórico vem antes da remoção
+    assert biblioteca.devolver("12345678901", "Livro Teste")
+    assert os.path.dirname(gravados[0]).endswith("historico")
+    assert primeira_gravacao_dos_emprestimos() > 0
+
+    # E também quando a devolução força a compactação no meio do bloco
+    gravados.clear()
+    biblioteca.emprestimos.diario.limite_compactacao = 1
+    resultados = biblioteca.devolver_lote([("12345678901", "Livro Teste")] * 2)
+    assert all(resultados)
+    assert os.path.dirname(gravados[0]).endswith("historico")
+    assert primeira_gravacao_dos_emprestimos() > 0
+    hoje = time.strftime("%Y-%m-%d")
+    assert len(biblioteca.historico.consultar(hoje, hoje)) == 3
+
+
+def test_busca_federada_junta_filiais_em_processos(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    livros_das_filiais = {
+        "norte": [("Dom Casmurro", "Machado", "2"), ("Iracema", "Alencar", "1")],
+        "sul": [
+            ("Memórias Póstumas", "Machado", "1"),
+            ("Dom Casmurro", "Machado", "1"),
+        ],
+    }
+    bibliotecas = {}
+    for nome, livros in livros_das_filiais.items():
+        (tmp_path / nome).mkdir()
+        monkeypatch.chdir(tmp_path / nome)
+        biblioteca = bibliotecas[nome] = Biblioteca(ArmazenamentoJson())
+        biblioteca.carregamento().carregar()
+        for titulo, autor, exemplares in livros:
+            assert biblioteca.cadastrar_livro(titulo, autor, "1900", exemplares)
+    assert biblioteca.cadastrar_usuario("Ana Maria", "12345678901")
+    assert biblioteca.emprestar("12345678901", "Dom Casmurro")
+
+    filiais = [
+        ler_filial(f"Norte={tmp_path / 'norte'}"),
+        Filial("Sul", str(tmp_path / "sul")),
+    ]
+    with CatalogoFederado(filiais, processos=2) as catalogo:
+        encontrados = catalogo.buscar_por_autor("machado")
+        assert [
+            (livro["título"], livro["filial"], livro["disponivel"])
+            for livro in encontrados
+        ] == [
+            ("Dom Casmurro", "Norte", True),
+            ("Dom Casmurro", "Sul", False),
+            ("Memórias Póstumas", "Sul", True),
+        ]
+        assert catalogo.buscar_por_titulo("  ") == []
+
+        # O que a filial grava depois chega ao processo de busca dela
+        monkeypatch.chdir(tmp_path / "norte")
+        assert bibliotecas["norte"].cadastrar_livro("Helena", "Machado", "1876", "1")
+        assert [livro["filial"] for livro in catalogo.buscar_por_titulo("helena")] == [
+            "Norte"
+        ]
+    with pytest.raises(ValueError):
+        ler_filial("sem pasta")
+
+    resultados = benchmark_filiais.executar(2, 200, [1, 2], consultas=5)
+    assert [resultado["processos"] for resultado in resultados] == [1, 2]
+    assert resultados[0]["ganho"] == 1.0
+    assert (
+        resultados[1]["resultados_por_busca"] == resultados[0]["resultados_por_busca"]
+    )
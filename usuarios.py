@@ -1,56 +1,190 @@
 """Operações relacionadas aos usuários do sistema."""
 
-from typing import Dict, List, Optional
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Tuple
 
+from indices import ListaIndexada
+from instrumentacao import medido
+from normalizacao import normalizar
+from paginacao import escrever_linhas, pagina
+from registros import Usuario
+from resultados import Resultado
 
-def cadastrar_usuario() -> Optional[Dict[str, str]]:
-    """Solicita dados pelo console e devolve um novo usuário válido."""
+
+class CadastroUsuarios(ListaIndexada):
+    """Lista de usuários com índice por CPF para busca em O(1).
+
+    A listagem pode sair ordenada por nome.
+    """
+
+    TIPO_REGISTRO = Usuario
+    ORDENACOES = {"nome": lambda usuario: normalizar(usuario["nome"])}
+
+    def __init__(self, usuarios: Iterable[Dict[str, str]] = ()) -> None:
+        super().__init__(usuarios)
+
+    def _limpar_indices(self) -> None:
+        # Índice: CPF -> primeiro usuário com esse CPF
+        self._por_cpf: Dict[str, Dict[str, str]] = {}
+        # CPF -> quantos usuários a mais têm esse CPF
+        self._repetidos: Dict[str, int] = {}
+
+    def _indexar(self, usuario: Dict[str, str]) -> None:
+        # Mantém o primeiro usuário cadastrado, igual à busca linear
+        cpf = usuario["cpf"]
+        if self._por_cpf.setdefault(cpf, usuario) is not usuario:
+            self._repetidos[cpf] = self._repetidos.get(cpf, 0) + 1
+
+    def _desindexar(self, usuario: Dict[str, str], posicao: int) -> None:
+        cpf = usuario["cpf"]
+        repetidos = self._repetidos.get(cpf, 0)
+        if not repetidos:
+            del self._por_cpf[cpf]
+            return
+        self._repetidos[cpf] = repetidos - 1
+        if not self._repetidos[cpf]:
+            del self._repetidos[cpf]
+        # Saiu o primeiro com esse CPF: o seguinte passa a ser achado
+        if self._por_cpf[cpf] is usuario:
+            self._por_cpf[cpf] = next(outro for outro in self if outro["cpf"] == cpf)
+
+    def buscar_por_cpf(self, cpf: str) -> Optional[Dict[str, str]]:
+        """Devolve o usuário com o CPF informado, se existir."""
+
+        return self._por_cpf.get(cpf)
+
+    def localizar(self, usuario: Dict[str, str]) -> Optional[Dict[str, str]]:
+        """Devolve o usuário cadastrado com o mesmo CPF (a chave no diário)."""
+
+        return self._por_cpf.get(usuario["cpf"])
+
+    def adicionar(self, usuario: Dict[str, str]) -> bool:
+        """Adiciona o usuário se o CPF ainda não estiver cadastrado."""
+
+        # Recusa CPFs repetidos
+        if usuario["cpf"] in self._por_cpf:
+            return False
+        self.append(usuario)
+        return True
+
+
+def cadastrar_usuario(
+    lista_usuarios: Optional[List[Dict[str, str]]] = None,
+) -> Optional[Usuario]:
+    """Solicita dados pelo console e devolve um novo usuário válido.
+
+    Se a lista de usuários for informada, recusa CPFs já cadastrados.
+    """
+
+    nome, cpf = ler_dados_usuario()
+
+    # Valida e formata os dados digitados
+    try:
+        novo_usuario = montar_usuario(nome, cpf, lista_usuarios)
+    except ValueError as erro:
+        print(f" {erro}")
+        return None
+
+    print(f" Usuário {novo_usuario['nome']} cadastrado com sucesso!\n")
+    return novo_usuario
+
+
+def ler_dados_usuario() -> Tuple[str, str]:
+    """Pede pelo console o nome e o CPF de um novo usuário."""
 
     # Pede pro usuário digitar o nome completo
     nome = input("Digite seu nome completo: ").strip()
     # Pede pro usuário digitar o CPF (só números)
     cpf = input("Digite seu CPF (somente números): ").strip()
+    return nome, cpf
+
+
+def registrar_usuario(
+    lista_usuarios: List[Dict[str, str]], nome: str, cpf: str
+) -> Resultado:
+    """Valida e inclui um usuário na lista, sem usar o console."""
+
+    try:
+        usuario = montar_usuario(nome, cpf, lista_usuarios)
+    except ValueError as erro:
+        return Resultado(False, str(erro))
+
+    lista_usuarios.append(usuario)
+    return Resultado(True, f"Usuário {usuario['nome']} cadastrado com sucesso!", usuario)
+
+
+def montar_usuario(
+    nome: str, cpf: str, lista_usuarios: Optional[List[Dict[str, str]]] = None
+) -> Usuario:
+    """Valida e formata os dados de um usuário, sem usar o console.
+
+    Levanta ``ValueError`` com a mensagem para o usuário se algo for inválido.
+    Se a lista de usuários for informada, recusa CPFs já cadastrados.
+    """
+
+    cpf = cpf.strip()
 
     # Verifica se o CPF tem exatamente 11 números
     if not cpf.isdigit() or len(cpf) != 11:
-        print(" CPF inválido! Deve conter exatamente 11 números.")
-        return None
+        raise ValueError("CPF inválido! Deve conter exatamente 11 números.")
+
+    # Verifica se o CPF já pertence a outro usuário
+    if lista_usuarios is not None and encontrar_usuario_por_cpf(lista_usuarios, cpf):
+        raise ValueError("CPF já cadastrado! Cada usuário deve ter um CPF único.")
 
     # Verifica se o nome tem apenas letras (sem números ou símbolos)
     if not all(parte.isalpha() for parte in nome.split()):
-        print(" Nome inválido! Digite apenas letras (sem números ou símbolos).")
-        return None
+        raise ValueError("Nome inválido! Digite apenas letras (sem números ou símbolos).")
 
     # Deixa o nome bonito com primeira letra maiúscula (ex: "maria silva" -> "Maria Silva")
     nome_formatado = " ".join(parte.capitalize() for parte in nome.split())
 
-    # Cria um dicionário com os dados do usuário
-    novo_usuario = {"nome": nome_formatado, "cpf": cpf}
-    print(f" Usuário {nome_formatado} cadastrado com sucesso!\n")
-    return novo_usuario
+    # Cria o registro com os dados do usuário
+    return Usuario(nome_formatado, cpf)
 
 
-def listar_usuarios(lista_usuarios: List[Dict[str, str]]) -> None:
-    """Mostra todos os usuários cadastrados no console."""
+@medido("usuarios.listar_usuarios")
+def listar_usuarios(
+    lista_usuarios: List[Dict[str, str]],
+    inicio: int = 0,
+    quantidade: Optional[int] = None,
+    ordem: Optional[str] = None,
+    decrescente: bool = False,
+) -> None:
+    """Mostra os usuários cadastrados no console (todos ou uma página).
+
+    ``ordem`` pode ser ``"nome"``; sem ela, saem na ordem de cadastro.
+    """
 
     # Se a lista estiver vazia, mostra mensagem e sai
     if not lista_usuarios:
         print(" Nenhum usuário cadastrado ainda.\n")
         return
 
-    # Mostra o cabeçalho da listagem
-    print("\n=== Lista de Usuários Cadastrados ===")
-    # Percorre a lista de usuários e mostra cada um com seu número
-    for indice, usuario in enumerate(lista_usuarios, start=1):
-        print(f"{indice}. Nome: {usuario['nome']} | CPF: {usuario['cpf']}")
-    print("=====================================\n")
+    # Pega só a página pedida e escreve as linhas em blocos, não uma a uma
+    usuarios = pagina(lista_usuarios, inicio, quantidade, ordem, decrescente)
+    escrever_linhas(
+        chain(
+            ["\n=== Lista de Usuários Cadastrados ==="],
+            (
+                f"{indice}. Nome: {usuario['nome']} | CPF: {usuario['cpf']}"
+                for indice, usuario in enumerate(usuarios, start=inicio + 1)
+            ),
+            ["=====================================\n"],
+        )
+    )
 
 
+@medido("usuarios.encontrar_usuario_por_cpf")
 def encontrar_usuario_por_cpf(
     lista_usuarios: List[Dict[str, str]], cpf: str
 ) -> Optional[Dict[str, str]]:
     """Procura um usuário pelo CPF e devolve o registro, se existir."""
 
+    # Se for um cadastro indexado, a busca é direta no índice
+    if isinstance(lista_usuarios, CadastroUsuarios):
+        return lista_usuarios.buscar_por_cpf(cpf)
+
     # Percorre todos os usuários da lista
     for usuario in lista_usuarios:
         # Se achar um com CPF igual, devolve ele